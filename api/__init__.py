@@ -1,8 +1,45 @@
+import asyncio
 import os
-from google.maps.routing_v2 import RoutesClient
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from google.maps.routing_v2 import RoutesAsyncClient, RoutesClient
 
 CLIENT_OPTIONS = {
     "api_key": os.environ.get("BACKEND_MAPS_API", "none"),
     "quota_project_id": os.environ.get("PROJECT_ID", "none"),
 }
-GoogleMapsRouteClient = RoutesClient(client_options=CLIENT_OPTIONS)
+
+# Clients are created on first use, the planner worker processes import this package and never
+# call the API
+_client: RoutesClient | None = None
+_clientLock = Lock()
+
+
+def getGoogleMapsRouteClient() -> RoutesClient:
+    """
+    Returns the RoutesClient of the process, creating it on first use.
+    """
+    global _client
+    with _clientLock:
+        if _client is None:
+            _client = RoutesClient(client_options=CLIENT_OPTIONS)
+        return _client
+
+
+# grpc.aio channels are bound to the event loop that creates them, one client per loop. Clients
+# are not closed, the app is served by uvicorn so there is a single loop (runserver would create
+# one per request)
+_asyncClients: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def getGoogleMapsRouteAsyncClient() -> RoutesAsyncClient:
+    """
+    Returns the RoutesAsyncClient of the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _asyncClients.get(loop)
+    if client is None:
+        client = RoutesAsyncClient(client_options=CLIENT_OPTIONS)
+        _asyncClients[loop] = client
+    return client
@@ -0,0 +1,98 @@
+"""
+Benchmark of the graph between the candidate chargers that computeChargersRoute feeds to the
+shortest path search.
+
+Compares the dense geopy graph (a geodesic distance per ordered pair) and the sparse graph
+built from a haversine matrix, both followed by the dijkstra search, with the A* search of the
+CSR shortest path engine.
+
+Usage:
+    python -m api.benchmarks.chargers_graph [--sizes 50 200 1000] [--repeat 1]
+"""
+
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import distance
+
+from api.service.dijkstra import buildDistanceGraph, dijkstra
+from api.service.shortestpath import sparseShortestPath
+
+ORIGIN = (40.4168, -3.7038)
+DESTINATION = (41.3874, 2.1686)
+AUTONOMY = 100
+
+
+def candidatePoints(size: int, seed: int = 0) -> dict:
+    """
+    Returns 'size' chargers scattered along the trip plus its origin and destination.
+    """
+    rng = np.random.default_rng(seed)
+    t = rng.random(size)[:, None]
+    coords = np.array(ORIGIN) + t * (np.array(DESTINATION) - np.array(ORIGIN))
+    coords += rng.normal(0, 0.15, (size, 2))
+    return {
+        "origin": ORIGIN,
+        **{i: tuple(c) for i, c in enumerate(coords.tolist())},
+        "destination": DESTINATION,
+    }
+
+
+def densePath(points: dict) -> list:
+    """
+    The path as computeChargersRoute first computed it.
+    """
+    graph = {}
+    for key1, value1 in points.items():
+        graph[key1] = {}
+        for key2, value2 in points.items():
+            graph[key1][key2] = distance(value1, value2).kilometers
+    return dijkstra(graph, "origin", "destination", AUTONOMY)
+
+
+def sparsePath(points: dict) -> list:
+    graph = buildDistanceGraph(points, AUTONOMY)
+    return dijkstra(graph, "origin", "destination", AUTONOMY)
+
+
+def csrPath(points: dict) -> list:
+    return sparseShortestPath(points, "origin", "destination", AUTONOMY)
+
+
+def measure(search, points: dict, repeat: int) -> tuple[float, list]:
+    """
+    Returns the best time in seconds of building the graph and searching the path.
+    """
+    best = float("inf")
+    path = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path = search(points)
+        best = min(best, time.perf_counter() - start)
+    return best, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    print(
+        f"{'candidates':>10} {'dense (s)':>10} {'sparse (s)':>11} {'csr a* (s)':>11}"
+        f" {'speedup':>8} {'same hops':>10}"
+    )
+    for size in args.sizes:
+        points = candidatePoints(size)
+        dense, denseHops = measure(densePath, points, args.repeat)
+        sparse, sparseHops = measure(sparsePath, points, args.repeat)
+        csr, csrHops = measure(csrPath, points, args.repeat)
+        print(
+            f"{size:>10} {dense:>10.4f} {sparse:>11.4f} {csr:>11.4f} {dense / csr:>7.0f}x"
+            f" {str(len(denseHops) == len(sparseHops) == len(csrHops)):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
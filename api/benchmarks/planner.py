@@ -0,0 +1,259 @@
+"""
+Benchmark suite of the charging stops planner, run with `python manage.py benchmarkplanner`.
+
+Every case times one stage of the planner on a charger set of a given size and an autonomy:
+- kPowerFinder: the candidate chargers search.
+- computeChargersRoute: the whole charger path, candidates search and shortest path included.
+- dijkstra: the dict based dijkstra over the haversine graph of the candidates, the search the
+  planner used before the CSR engine.
+
+Charger sets are reproducible, they are generated from a seed:
+- synthetic: chargers scattered along the Madrid - Barcelona corridor.
+- fixture: the sample chargers of api.benchmarks.samples (Barcelona area) resampled with some
+  jitter, so larger sets keep the density pattern of real chargers.
+
+The known road legs between the chargers of a set are loaded once before timing it, so the
+timings of computeChargersRoute leave out the database.
+
+Results are plain dicts that serialize to JSON. A run can be compared with a previous one (the
+baseline) and cases whose median time grew more than the tolerance are reported as regressions.
+"""
+
+import platform
+import statistics
+import time
+from typing import Callable
+
+import numpy as np
+from django.utils import timezone
+
+from api.benchmarks.samples import SAMPLE_POINTS
+from api.models import RoadLeg
+from api.service.dijkstra import buildDistanceGraph, dijkstra
+from api.service.kPowerFinder import kPowerFinder
+from api.service.providers import NoRouteFound
+from api.service.route import computeChargersRoute
+
+BENCHMARKS = ["kPowerFinder", "computeChargersRoute", "dijkstra"]
+DATASETS = ["synthetic", "fixture"]
+SIZES = [100, 1000, 10000, 100000]
+AUTONOMIES = [80, 150, 300]
+
+CORRIDOR = ((40.4168, -3.7038), (41.3874, 2.1686))
+
+
+def syntheticPoints(size: int, seed: int = 0) -> dict:
+    """
+    Returns 'size' chargers scattered along the Madrid - Barcelona corridor plus the origin and
+    destination of the trip.
+    """
+    origin, destination = np.array(CORRIDOR[0]), np.array(CORRIDOR[1])
+    rng = np.random.default_rng(seed)
+    coords = origin + rng.random(size)[:, None] * (destination - origin)
+    coords += rng.normal(0, 0.15, (size, 2))
+    return {
+        "origin": CORRIDOR[0],
+        **dict(enumerate(map(tuple, coords.tolist()))),
+        "destination": CORRIDOR[1],
+    }
+
+
+def fixturePoints(size: int, seed: int = 0) -> dict:
+    """
+    Returns 'size' chargers drawn from the sample chargers with a jitter of about 2 km, plus the
+    origin and destination of the sample trip.
+    """
+    chargers = np.array(
+        [coords for key, coords in SAMPLE_POINTS.items() if key not in ("origin", "destination")]
+    )
+    rng = np.random.default_rng(seed)
+    coords = chargers[rng.integers(len(chargers), size=size)]
+    coords += rng.normal(0, 0.02, (size, 2))
+    return {
+        "origin": SAMPLE_POINTS["origin"],
+        **dict(enumerate(map(tuple, coords.tolist()))),
+        "destination": SAMPLE_POINTS["destination"],
+    }
+
+
+DATASET_BUILDERS: dict[str, Callable[[int, int], dict]] = {
+    "synthetic": syntheticPoints,
+    "fixture": fixturePoints,
+}
+
+
+def loadLegDistances(points: dict) -> dict:
+    """
+    Returns the road distance in kilometers of the known legs between the points.
+    """
+    labels = {
+        RoadLeg.pointKey({"charger": label, "latitude": lat, "longitude": lon}): label
+        for label, (lat, lon) in points.items()
+    }
+    return {
+        (labels[origin], labels[destination]): distance / 1000
+        for origin, destination, distance in RoadLeg.fresh().values_list(
+            "origin", "destination", "distance"
+        )
+        if origin in labels and destination in labels
+    }
+
+
+def runKPowerFinder(points: dict, autonomy: int, legDistances: dict) -> dict:
+    return {"candidates": len(kPowerFinder(autonomy, points))}
+
+
+def runComputeChargersRoute(points: dict, autonomy: int, legDistances: dict) -> dict:
+    return {"hops": len(computeChargersRoute(points, autonomy, legDistances)) - 1}
+
+
+def runDijkstra(points: dict, autonomy: int, legDistances: dict) -> dict:
+    candidates = dict(kPowerFinder(autonomy, points))
+    candidates["origin"] = points["origin"]
+    candidates["destination"] = points["destination"]
+    path = dijkstra(buildDistanceGraph(candidates, autonomy), "origin", "destination", autonomy)
+    # an unreachable destination is a path of its own
+    if path[0] != "origin":
+        raise NoRouteFound()
+    return {"hops": len(path) - 1}
+
+
+BENCHMARK_RUNNERS: dict[str, Callable[[dict, int, dict], dict]] = {
+    "kPowerFinder": runKPowerFinder,
+    "computeChargersRoute": runComputeChargersRoute,
+    "dijkstra": runDijkstra,
+}
+
+
+def caseName(benchmark: str, dataset: str, size: int, autonomy: int) -> str:
+    return f"{benchmark}/{dataset}/{size}/{autonomy}"
+
+
+def timeCase(
+    benchmark: str,
+    points: dict,
+    autonomy: int,
+    repeat: int,
+    maxCandidates: int,
+    legDistances: dict | None = None,
+) -> dict:
+    """
+    Runs a case 'repeat' times and returns its timings in seconds, with the road distances of
+    'legDistances' (see loadLegDistances).
+
+    The status of the case is 'ok', 'unreachable' if the planner finds no route (the time to
+    find out is still measured) or 'skipped' when the stages after the candidates search would
+    get more than 'maxCandidates' points, as the graph between them grows with the square of
+    its size.
+    """
+    if benchmark != "kPowerFinder":
+        try:
+            candidates = len(kPowerFinder(autonomy, points))
+        except ValueError:
+            candidates = 0
+        if candidates > maxCandidates:
+            return {"status": "skipped", "candidates": candidates}
+
+    runner = BENCHMARK_RUNNERS[benchmark]
+    times = []
+    result = {}
+    status = "ok"
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = runner(points, autonomy, legDistances or {})
+        except (ValueError, NoRouteFound):
+            status = "unreachable"
+        times.append(time.perf_counter() - start)
+
+    return {
+        "status": status,
+        **result,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+    }
+
+
+def runSuite(
+    benchmarks: list[str] = BENCHMARKS,
+    datasets: list[str] = DATASETS,
+    sizes: list[int] = SIZES,
+    autonomies: list[int] = AUTONOMIES,
+    repeat: int = 5,
+    seed: int = 0,
+    maxCandidates: int = 1000,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Runs every combination of benchmark, dataset, size and autonomy.
+
+    Returns:
+        dict: The 'meta' of the run (environment and parameters) and the 'results' of every case.
+    """
+    results = []
+    for dataset in datasets:
+        for size in sizes:
+            points = DATASET_BUILDERS[dataset](size, seed)
+            legDistances = loadLegDistances(points) if "computeChargersRoute" in benchmarks else {}
+            for autonomy in autonomies:
+                for benchmark in benchmarks:
+                    case = {
+                        "name": caseName(benchmark, dataset, size, autonomy),
+                        "benchmark": benchmark,
+                        "dataset": dataset,
+                        "size": size,
+                        "autonomy": autonomy,
+                        **timeCase(
+                            benchmark, points, autonomy, repeat, maxCandidates, legDistances
+                        ),
+                    }
+                    results.append(case)
+                    if progress is not None:
+                        progress(case)
+
+    return {
+        "meta": {
+            "createdAt": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "seed": seed,
+            "maxCandidates": maxCandidates,
+        },
+        "results": results,
+    }
+
+
+def findRegressions(report: dict, baseline: dict, tolerance: float, minDelta: float) -> list[dict]:
+    """
+    Returns the cases of the report slower than in the baseline.
+
+    A case regressed if its median time is more than 'tolerance' (a fraction) above the baseline
+    one and the difference is larger than 'minDelta' seconds, which keeps the noise of the
+    fastest cases out. Cases missing or not measured in either run are not compared.
+
+    Args:
+        report (dict): The run to check, as returned by runSuite.
+        baseline (dict): A previous run.
+        tolerance (float): The allowed slowdown, 0.25 allows a median 25% slower.
+        minDelta (float): The slowdown in seconds that is never a regression.
+    """
+    previous = {case["name"]: case for case in baseline["results"] if "median" in case}
+    regressions = []
+    for case in report["results"]:
+        before = previous.get(case["name"])
+        if before is None or "median" not in case:
+            continue
+        limit = max(before["median"] * (1 + tolerance), before["median"] + minDelta)
+        if case["median"] > limit:
+            regressions.append(
+                {
+                    "name": case["name"],
+                    "baseline": before["median"],
+                    "median": case["median"],
+                    "ratio": case["median"] / before["median"],
+                }
+            )
+    return regressions
@@ -0,0 +1,114 @@
+"""
+Sample chargers of the Barcelona area and a trip from Tarragona to the north of Girona, the base
+of the fixture charger sets of the planner benchmarks.
+"""
+
+ORIGIN = (41.11364, 1.22503)
+WAYPOINTS = {
+    "69": (41.38553, 2.19359),
+    "92": (41.39245, 2.12909),
+    "93": (41.42596, 2.18416),
+    "110": (41.374657, 2.160033),
+    "115": (41.429405, 2.158544),
+    "147": (41.39661, 2.200294),
+    "165": (41.388134, 2.107238),
+    "183": (41.446396, 1.973947),
+    "221": (41.42767, 2.17721),
+    "233": (41.390976, 2.196397),
+    "235": (41.482746, 2.051307),
+    "289": (41.43698, 2.191159),
+    "306": (41.392723, 2.146466),
+    "307": (41.395523, 2.153667),
+    "330": (41.40716, 2.138525),
+    "336": (41.40681, 2.133584),
+    "353": (41.394066, 2.108034),
+    "361": (41.38495, 2.11611),
+    "366": (41.401306, 2.13352),
+    "376": (41.37711, 2.119567),
+    "380": (41.397346, 2.119925),
+    "393": (41.405376, 2.143079),
+    "444": (41.4424, 2.197355),
+    "445": (41.35291, 2.088723),
+    "466": (41.38216, 2.184037),
+    "484": (41.454933, 2.226736),
+    "505": (41.40297, 2.189897),
+    "506": (41.40837, 2.202957),
+    "511": (41.419018, 2.178893),
+    "570": (41.41357, 2.143069),
+    "579": (41.38109, 2.142061),
+    "580": (41.389957, 2.128359),
+    "584": (41.405376, 2.149945),
+    "587": (41.3945, 2.152312),
+    "589": (41.40177, 2.150899),
+    "648": (41.403248, 2.152312),
+    "688": (41.3828, 2.19435),
+    "706": (41.41613, 2.18056),
+    "708": (41.38687, 2.19763),
+    "761": (41.44475, 2.174366),
+    "769": (41.37216, 2.15668),
+    "793": (41.44219, 2.1777),
+    "797": (41.406513, 2.200808),
+    "821": (41.39792, 2.1255),
+    "828": (41.381737, 2.17007),
+    "833": (41.387524, 2.131688),
+    "861": (41.4098, 2.154),
+    "896": (41.42006, 2.201705),
+    "914": (41.40476, 2.18961),
+    "915": (41.434628, 2.148196),
+    "943": (41.42686, 2.14359),
+    "944": (41.510914, 2.133097),
+    "963": (41.44156, 2.200143),
+    "979": (41.419113, 2.001132),
+    "1007": (41.353497, 2.122741),
+    "1034": (41.394184, 2.123801),
+    "1062": (41.37951, 2.162065),
+    "1102": (41.39388, 2.18155),
+    "1107": (41.29726, 2.008494),
+    "1110": (41.39991, 2.12341),
+    "1119": (41.40512, 2.20753),
+    "1124": (41.400993, 2.185633),
+    "1128": (41.4022, 2.2046),
+    "1130": (41.446304, 1.974044),
+    "1139": (41.39384, 2.156069),
+    "1146": (41.39441, 2.114755),
+    "1147": (41.393227, 2.145783),
+    "1163": (41.44926, 2.190651),
+    "1171": (41.40585, 2.16264),
+    "1191": (41.40572, 2.19278),
+    "1218": (41.409256, 2.168206),
+    "1263": (41.384617, 2.122279),
+    "1267": (41.398552, 2.186638),
+    "1269": (41.375282, 2.130336),
+    "1277": (41.372803, 2.154058),
+    "1280": (41.4045, 2.1972),
+    "1305": (41.359947, 2.133299),
+    "1320": (41.38208, 2.191611),
+    "1322": (41.31811, 2.07489),
+    "1334": (41.43052, 2.18798),
+    "1371": (41.42367, 2.179258),
+    "1393": (41.411564, 2.218659),
+    "1397": (41.394295, 2.169688),
+    "1407": (41.396866, 2.170576),
+    "1425": (41.459743, 2.175609),
+    "1428": (41.41993, 2.181425),
+    "1445": (41.37592, 2.188999),
+    "1470": (41.37445, 2.072167),
+    "1481": (41.49244, 2.185111),
+    "1521": (41.40645, 2.15223),
+    "1566": (41.3962, 2.158994),
+    "1639": (41.1211, 1.2720202),
+    "1724": (41.405136, 2.177452),
+    "1725": (41.392338, 2.132172),
+    "1738": (41.37643, 2.178412),
+    "1747": (41.40683, 2.21849),
+    "1756": (41.413143, 2.221153),
+    "1758": (41.38028, 2.18729),
+    "1765": (41.387108, 2.17143),
+    "1786": (41.389233, 2.161352),
+}
+DESTINATION = (42.18049, 2.48195)
+SAMPLE_POINTS = {
+    "origin": ORIGIN,
+    "destination": DESTINATION,
+    **WAYPOINTS,
+}
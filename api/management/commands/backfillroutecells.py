@@ -0,0 +1,39 @@
+from itertools import islice
+
+from api.models import RouteCell
+from common.models.route import Route
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores the geohash cells of the origin and destination of every route for the location "
+        "search. Run it once to backfill the existing routes and after changing "
+        "ROUTE_CELL_PRECISION."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Routes stored at once")
+
+    def handle(self, *args, **options):
+        batchSize = options["batch_size"]
+        routes = (
+            Route.objects.order_by("id")
+            .only(
+                "id", "originLat", "originLon", "destinationLat", "destinationLon", "departureTime"
+            )
+            .iterator(chunk_size=batchSize)
+        )
+
+        stored = 0
+        while batch := list(islice(routes, batchSize)):
+            stored += RouteCell.store(batch, batchSize)
+        removed, _ = RouteCell.objects.exclude(routeId__in=Route.objects.values("id")).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Cells of {stored} routes stored with precision {settings.ROUTE_CELL_PRECISION}, "
+                f"{removed} of deleted routes removed"
+            )
+        )
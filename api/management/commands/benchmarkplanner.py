@@ -0,0 +1,91 @@
+import json
+
+from api.benchmarks.planner import (
+    AUTONOMIES,
+    BENCHMARKS,
+    DATASETS,
+    SIZES,
+    findRegressions,
+    runSuite,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the charging stops planner (kPowerFinder, computeChargersRoute and dijkstra) "
+        "and writes the timings as JSON. With --baseline the run fails if any case is slower than "
+        "in the baseline run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+        parser.add_argument("--datasets", nargs="+", choices=DATASETS, default=DATASETS)
+        parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+        parser.add_argument("--autonomies", nargs="+", type=int, default=AUTONOMIES)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs of every case")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the charger sets")
+        parser.add_argument(
+            "--max-candidates",
+            type=int,
+            default=1000,
+            help="Skip the path stages of cases with more candidates than this",
+        )
+        parser.add_argument("--output", help="JSON file to write the results to, stdout if unset")
+        parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown of the median time over the baseline, as a fraction",
+        )
+        parser.add_argument(
+            "--min-delta",
+            type=float,
+            default=0.005,
+            help="Slowdown in seconds that is never reported as a regression",
+        )
+
+    def progress(self, case: dict):
+        timing = f"{case['median']:.4f}s" if "median" in case else "-"
+        self.stderr.write(f"{case['name']:<45} {case['status']:<12} {timing}")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+
+        report = runSuite(
+            benchmarks=options["benchmarks"],
+            datasets=options["datasets"],
+            sizes=options["sizes"],
+            autonomies=options["autonomies"],
+            repeat=options["repeat"],
+            seed=options["seed"],
+            maxCandidates=options["max_candidates"],
+            progress=self.progress,
+        )
+
+        if baseline is not None:
+            report["regressions"] = findRegressions(
+                report, baseline, options["tolerance"], options["min_delta"]
+            )
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        regressions = report.get("regressions", [])
+        for regression in regressions:
+            self.stderr.write(
+                self.style.ERROR(
+                    f"{regression['name']}: {regression['median']:.4f}s, "
+                    f"{regression['ratio']:.2f}x the baseline {regression['baseline']:.4f}s"
+                )
+            )
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark cases regressed")
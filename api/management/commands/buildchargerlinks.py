@@ -0,0 +1,22 @@
+from api.service.chargers import bumpChargerDataset
+from api.service.reachability import rebuildChargerLinks
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the reachability graph of the chargers, the pairs of chargers at most "
+        "CHARGER_LINK_MAX_KM apart. Run it before switching CHARGER_PLANNER_MODE to links and "
+        "after changing CHARGER_LINK_MAX_KM."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE("Building charger links..."))
+        links = rebuildChargerLinks()
+        bumpChargerDataset()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{links} links between chargers at most {settings.CHARGER_LINK_MAX_KM} km apart"
+            )
+        )
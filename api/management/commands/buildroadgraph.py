@@ -0,0 +1,75 @@
+import csv
+
+import numpy as np
+from api.service.roadgraph import RoadGraph
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the road graph used by the local routing provider from a preprocessed OSM extract. "
+        "Nodes file columns: id,lat,lon. Edges file columns: source,target,length,time "
+        "(meters and seconds)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("nodes", help="CSV file with the nodes of the graph")
+        parser.add_argument("edges", help="CSV file with the directed edges of the graph")
+        parser.add_argument(
+            "--output", default=str(settings.ROUTE_GRAPH_PATH), help="Path of the .npz graph"
+        )
+        parser.add_argument(
+            "--bidirectional",
+            action="store_true",
+            help="Add the reverse of every edge, for extracts that only list each road once",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE("Reading nodes..."))
+        nodeIndex: dict[str, int] = {}
+        lat: list[float] = []
+        lon: list[float] = []
+        with open(options["nodes"], newline="") as file:
+            for row in csv.DictReader(file):
+                nodeIndex[row["id"]] = len(lat)
+                lat.append(float(row["lat"]))
+                lon.append(float(row["lon"]))
+
+        self.stdout.write(self.style.NOTICE("Reading edges..."))
+        sources: list[int] = []
+        targets: list[int] = []
+        lengths: list[float] = []
+        times: list[float] = []
+        with open(options["edges"], newline="") as file:
+            for row in csv.DictReader(file):
+                source, target = nodeIndex[row["source"]], nodeIndex[row["target"]]
+                length, time = float(row["length"]), float(row["time"])
+                sources.append(source)
+                targets.append(target)
+                lengths.append(length)
+                times.append(time)
+                if options["bidirectional"]:
+                    sources.append(target)
+                    targets.append(source)
+                    lengths.append(length)
+                    times.append(time)
+
+        # Sort the edges by source node to build the CSR adjacency
+        order = np.argsort(np.asarray(sources), kind="stable")
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.asarray(sources), minlength=len(lat)), out=indptr[1:])
+        graph = RoadGraph(
+            lat,
+            lon,
+            indptr,
+            np.asarray(targets)[order],
+            np.asarray(lengths)[order],
+            np.asarray(times)[order],
+        )
+        graph.save(options["output"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Road graph with {len(lat)} nodes and {len(sources)} edges saved to {options['output']}"
+            )
+        )
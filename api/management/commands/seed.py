@@ -2,6 +2,12 @@ from time import sleep
 from requests import get, RequestException
 from django.core.management.base import BaseCommand
 from common.models.charger import LocationCharger, ChargerVelocity, ChargerLocationType
+from api.service.chargers import bumpChargerDataset, rebuildChargerMasks
+from api.service.reachability import (
+    chargerLinksEnabled,
+    chargerLinksPaused,
+    rebuildChargerLinks,
+)
 import logging
 import os
 
@@ -38,13 +44,19 @@ class Command(BaseCommand):
             except RequestException as error:
                 self.logFatal(error)
                 self.print("Error while trying to fetch data from the API")
+                if chargerLinksEnabled():
+                    rebuildChargerLinks()
+                rebuildChargerMasks()
+                bumpChargerDataset()
                 return
 
             data = response.json()
             if len(data) <= 0:
                 break
             else:
-                saveData(self, data, accepted_types)
+                # links and masks are rebuilt once all chargers are saved
+                with chargerLinksPaused():
+                    saveData(self, data, accepted_types)
                 offset += limit
                 t += 0.5
                 sleep(0.5)
@@ -52,11 +64,20 @@ class Command(BaseCommand):
                     self.logFatal("Timeout while trying to fetch data from the API")
                     break
             del data
+        if chargerLinksEnabled():
+            rebuildChargerLinks()
+        rebuildChargerMasks()
+        bumpChargerDataset()
         self.print("Data seeded successfully")
 
     def clear_data(self):
         try:
-            LocationCharger.objects.all().delete()
+            with chargerLinksPaused():
+                LocationCharger.objects.all().delete()
+            if chargerLinksEnabled():
+                rebuildChargerLinks()
+            rebuildChargerMasks()
+            bumpChargerDataset()
         except:
             self.logFatal("Error while trying to delete data from the database")
             return
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.3 on 2026-10-17 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteGeometry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("routeId", models.PositiveBigIntegerField(unique=True)),
+                ("polylines", models.JSONField(default=dict)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_dataset_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoadLeg",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("provider", models.CharField(max_length=20)),
+                ("origin", models.CharField(max_length=32)),
+                ("destination", models.CharField(max_length=32)),
+                ("distance", models.PositiveIntegerField()),
+                ("duration", models.PositiveIntegerField()),
+                ("polyline", models.TextField()),
+                ("updatedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="roadleg",
+            constraint=models.UniqueConstraint(
+                fields=("provider", "origin", "destination"), name="unique_road_leg"
+            ),
+        ),
+    ]
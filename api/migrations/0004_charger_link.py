@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_road_leg"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChargerLink",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("source", models.PositiveBigIntegerField()),
+                ("target", models.PositiveBigIntegerField(db_index=True)),
+                ("distance", models.FloatField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="chargerlink",
+            constraint=models.UniqueConstraint(
+                fields=("source", "target"), name="unique_charger_link"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_charger_link"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChargerMask",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("chargerId", models.PositiveBigIntegerField(unique=True)),
+                ("typeMask", models.PositiveSmallIntegerField(default=0)),
+                ("velocityMask", models.PositiveSmallIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_charger_mask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlannerVariant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("plans", models.PositiveIntegerField(default=0)),
+                ("wins", models.PositiveIntegerField(default=0)),
+                ("updatedAt", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+"""
+Indexes of the origin and destination coordinates of the routes for the location filter.
+
+The routes table belongs to the shared models package (common) and can be created by other
+services, so the migration runs after the first common one, fails if the table does not exist
+yet and leaves the indexes alone if they already do.
+"""
+
+from django.db import migrations
+
+ROUTE_TABLE = "common_route"
+INDEXES = {
+    "api_route_origin_coords": ["originLat", "originLon"],
+    "api_route_destination_coords": ["destinationLat", "destinationLon"],
+}
+
+
+def createIndexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if ROUTE_TABLE not in connection.introspection.table_names(cursor):
+            raise RuntimeError(
+                f"The {ROUTE_TABLE} table does not exist, migrate the common app before the api one"
+            )
+    for name, columns in INDEXES.items():
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS %s ON %s (%s)"
+            % (
+                schema_editor.quote_name(name),
+                schema_editor.quote_name(ROUTE_TABLE),
+                ", ".join(schema_editor.quote_name(column) for column in columns),
+            )
+        )
+
+
+def dropIndexes(apps, schema_editor):
+    for name in INDEXES:
+        schema_editor.execute("DROP INDEX IF EXISTS %s" % schema_editor.quote_name(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_planner_variant"),
+        # the routes table
+        ("common", "__first__"),
+    ]
+
+    operations = [
+        migrations.RunPython(createIndexes, dropIndexes),
+    ]
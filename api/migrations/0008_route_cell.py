@@ -0,0 +1,39 @@
+# Generated by Django 5.0.3 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_route_location_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteCell",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("routeId", models.PositiveBigIntegerField(unique=True)),
+                ("originCell", models.CharField(max_length=12)),
+                ("destinationCell", models.CharField(max_length=12)),
+                ("departureTime", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["originCell", "destinationCell", "departureTime"],
+                        name="route_cell_origin_idx",
+                    ),
+                    models.Index(
+                        fields=["destinationCell", "departureTime"], name="route_cell_dest_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+"""
+Indexes of the status and departure time of the routes for the route list.
+
+(cancelled, finalized, departureTime) serves the status condition of the list with any include,
+and where the database supports partial indexes the active routes have their own index on the
+departure time. The routes table belongs to the shared models package (common) and can be
+created by other services, so the migration runs after the first common one, fails if the table
+does not exist yet and leaves the indexes alone if they already do.
+"""
+
+from django.db import migrations
+
+ROUTE_TABLE = "common_route"
+STATUS_INDEX = ("api_route_status_departure", ["cancelled", "finalized", "departureTime"])
+ACTIVE_INDEX = ("api_route_active_departure", ["departureTime"])
+
+
+def createIndexes(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if ROUTE_TABLE not in connection.introspection.table_names(cursor):
+            raise RuntimeError(
+                f"The {ROUTE_TABLE} table does not exist, migrate the common app before the api one"
+            )
+
+    def createIndex(name, columns, condition=""):
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS %s ON %s (%s)%s"
+            % (
+                schema_editor.quote_name(name),
+                schema_editor.quote_name(ROUTE_TABLE),
+                ", ".join(schema_editor.quote_name(column) for column in columns),
+                condition,
+            )
+        )
+
+    createIndex(*STATUS_INDEX)
+    if connection.features.supports_partial_indexes:
+        # the condition as the ORM writes filters on booleans, so the planner matches it
+        createIndex(
+            *ACTIVE_INDEX,
+            " WHERE NOT %s AND NOT %s"
+            % (schema_editor.quote_name("cancelled"), schema_editor.quote_name("finalized")),
+        )
+
+
+def dropIndexes(apps, schema_editor):
+    for name, _ in (STATUS_INDEX, ACTIVE_INDEX):
+        schema_editor.execute("DROP INDEX IF EXISTS %s" % schema_editor.quote_name(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_route_cell"),
+        # the routes table
+        ("common", "__first__"),
+    ]
+
+    operations = [
+        migrations.RunPython(createIndexes, dropIndexes),
+    ]
@@ -0,0 +1,308 @@
+"""
+Data models owned by the route API.
+
+Routes and chargers live in the shared models package (common), which is managed by other
+services, so the models here reference them by id instead of foreign keys.
+"""
+
+from datetime import timedelta
+from typing import Iterable
+
+import polyline
+from django.conf import settings
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+from api.service.geo import geohash, simplifyPolyline
+
+
+class RouteGeometry(models.Model):
+    """
+    Simplified versions of the polyline of a route, one encoded polyline per detail level of
+    ROUTE_POLYLINE_LEVELS. They are computed once, when the route is created.
+    """
+
+    FULL = "full"
+
+    routeId = models.PositiveBigIntegerField(unique=True)
+    polylines = models.JSONField(default=dict)
+
+    @staticmethod
+    def simplify(encodedPolyline: str) -> dict[str, str]:
+        """
+        Returns the encoded polyline simplified for every detail level.
+        """
+        coords = polyline.decode(encodedPolyline)
+        return {
+            level: polyline.encode(simplifyPolyline(coords, tolerance))
+            for level, tolerance in settings.ROUTE_POLYLINE_LEVELS.items()
+        }
+
+    @classmethod
+    def forRoute(cls, route) -> "RouteGeometry":
+        """
+        Returns the geometry of the route. Routes created without it get one computed and not
+        stored, reads do not write (see RouteListCreateView.post).
+        """
+        geometry = cls.objects.filter(routeId=route.pk).first()
+        if geometry is None:
+            geometry = cls(routeId=route.pk, polylines=cls.simplify(route.polyline))
+        return geometry
+
+    @classmethod
+    def polylineFor(cls, route, detail: str) -> str:
+        """
+        Returns the encoded polyline of the route for the detail level.
+        """
+        if detail == cls.FULL:
+            return route.polyline
+        return cls.forRoute(route).polylines[detail]
+
+
+class DatasetVersion(models.Model):
+    """
+    Version of a dataset loaded by a management command, bumped every time it changes so the
+    processes that keep a copy in memory know when to reload it.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        return cls.objects.filter(name=name).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name: str) -> int:
+        """
+        Increments the version of the dataset, returns the new version.
+        """
+        cls.objects.get_or_create(name=name)
+        cls.objects.filter(name=name).update(version=F("version") + 1)
+        return cls.current(name)
+
+
+class RoadLeg(models.Model):
+    """
+    Road distance, duration and polyline between two points as returned by a routing provider.
+
+    Chargers are identified by their id and any other point (origin or destination) by the
+    geohash cell of ROUTE_LEG_CELL_PRECISION characters it falls in, so the legs computed for a
+    trip are shared by every later trip between the same chargers and cells.
+    """
+
+    provider = models.CharField(max_length=20)
+    origin = models.CharField(max_length=32)
+    destination = models.CharField(max_length=32)
+    distance = models.PositiveIntegerField()
+    duration = models.PositiveIntegerField()
+    polyline = models.TextField()
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["provider", "origin", "destination"], name="unique_road_leg"
+            )
+        ]
+
+    @staticmethod
+    def pointKey(point: dict) -> str:
+        """
+        Returns the key of a point of a path, 'charger:<id>' or 'cell:<geohash>'.
+        """
+        charger = point.get("charger")
+        if isinstance(charger, int) and not isinstance(charger, bool):
+            return f"charger:{charger}"
+        cell = geohash(
+            float(point["latitude"]), float(point["longitude"]), settings.ROUTE_LEG_CELL_PRECISION
+        )
+        return f"cell:{cell}"
+
+    @classmethod
+    def fresh(cls):
+        """
+        Returns the legs of the current provider recorded in the last ROUTE_LEG_MAX_AGE days.
+        """
+        since = timezone.now() - timedelta(days=settings.ROUTE_LEG_MAX_AGE)
+        return cls.objects.filter(provider=settings.ROUTE_PROVIDER, updatedAt__gte=since)
+
+    @classmethod
+    def record(cls, path: list[dict], legs: list[dict]):
+        """
+        Stores the legs between the consecutive points of the path, replacing the known ones.
+
+        Args:
+            path (list): The points of the route, each one with a 'latitude' and 'longitude'.
+            legs (list): The polyline, duration and distance of every leg of the path.
+        """
+        keys = [cls.pointKey(point) for point in path]
+        records = {}
+        for origin, destination, leg in zip(keys, keys[1:], legs):
+            # a leg inside a cell does not tell anything about the roads
+            if origin != destination:
+                records[origin, destination] = cls(
+                    provider=settings.ROUTE_PROVIDER,
+                    origin=origin,
+                    destination=destination,
+                    distance=leg["distance"],
+                    duration=leg["duration"],
+                    polyline=leg["polyline"],
+                )
+
+        cls.objects.bulk_create(
+            records.values(),
+            update_conflicts=True,
+            unique_fields=["provider", "origin", "destination"],
+            update_fields=["distance", "duration", "polyline", "updatedAt"],
+        )
+
+    @classmethod
+    def knownDistances(cls, keys: Iterable[str]) -> dict[tuple[str, str], float]:
+        """
+        Returns the road distance in kilometers of the known legs between the points.
+        """
+        keys = list(keys)
+        legs = cls.fresh().filter(origin__in=keys, destination__in=keys)
+        return {
+            (origin, destination): distance / 1000
+            for origin, destination, distance in legs.values_list(
+                "origin", "destination", "distance"
+            )
+        }
+
+    @classmethod
+    def assemble(cls, path: list[dict]) -> dict | None:
+        """
+        Returns the route through the points of the path joining their known legs, None if any
+        of them is unknown. The ends of the route are those of the legs, which can be up to a
+        cell away from the points of the path.
+        """
+        keys = [cls.pointKey(point) for point in path]
+        pairs = list(zip(keys, keys[1:]))
+        if any(origin == destination for origin, destination in pairs):
+            return None
+
+        legs = {
+            (leg.origin, leg.destination): leg
+            for leg in cls.fresh().filter(origin__in=keys, destination__in=keys)
+        }
+        if any(pair not in legs for pair in pairs):
+            return None
+
+        coords = []
+        for pair in pairs:
+            legCoords = polyline.decode(legs[pair].polyline)
+            # consecutive legs share their end point
+            coords.extend(legCoords[1:] if coords else legCoords)
+        return {
+            "polyline": polyline.encode(coords),
+            "duration": sum(legs[pair].duration for pair in pairs),
+            "distance": sum(legs[pair].distance for pair in pairs),
+        }
+
+
+class ChargerLink(models.Model):
+    """
+    Pair of chargers at most CHARGER_LINK_MAX_KM apart and their great circle distance in
+    kilometers, the edges of the reachability graph of the chargers. Every pair is stored once,
+    with the lowest id as source.
+    """
+
+    source = models.PositiveBigIntegerField()
+    target = models.PositiveBigIntegerField(db_index=True)
+    distance = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target"], name="unique_charger_link")
+        ]
+
+
+class ChargerMask(models.Model):
+    """
+    Connection types and velocities of a charger as bitmasks, bit i is set if the charger has the
+    i-th choice of ChargerLocationType.CHARGER_CHOICES or ChargerVelocity.VELOCITY_CHOICES. They
+    are computed when the chargers are seeded, so the charger index is loaded without scanning
+    the many to many tables of the chargers.
+    """
+
+    chargerId = models.PositiveBigIntegerField(unique=True)
+    typeMask = models.PositiveSmallIntegerField(default=0)
+    velocityMask = models.PositiveSmallIntegerField(default=0)
+
+
+class PlannerVariant(models.Model):
+    """
+    Outcome of the kPowerFinder parameter variants of the speculative planner: how many plans
+    the variant found a route for and how many times its route was the one used, so the default
+    parameters can be tuned with the trips of production.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    plans = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def record(cls, feasible: Iterable[str], winner: str):
+        """
+        Records a plan, the variants that found a route and the one whose route was used.
+        """
+        feasible = list(feasible)
+        for name in feasible:
+            cls.objects.get_or_create(name=name)
+        cls.objects.filter(name__in=feasible).update(plans=F("plans") + 1, updatedAt=timezone.now())
+        cls.objects.filter(name=winner).update(wins=F("wins") + 1)
+
+
+class RouteCell(models.Model):
+    """
+    Geohash cells of ROUTE_CELL_PRECISION characters of the origin and destination of a route
+    and its departure time, an indexed copy of the route for the location search. Kept up to
+    date when routes are saved and backfilled by `manage.py backfillroutecells`.
+    """
+
+    routeId = models.PositiveBigIntegerField(unique=True)
+    originCell = models.CharField(max_length=12)
+    destinationCell = models.CharField(max_length=12)
+    departureTime = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["originCell", "destinationCell", "departureTime"],
+                name="route_cell_origin_idx",
+            ),
+            models.Index(fields=["destinationCell", "departureTime"], name="route_cell_dest_idx"),
+        ]
+
+    @classmethod
+    def fromRoute(cls, route) -> "RouteCell":
+        precision = settings.ROUTE_CELL_PRECISION
+        return cls(
+            routeId=route.pk,
+            originCell=geohash(route.originLat, route.originLon, precision),
+            destinationCell=geohash(route.destinationLat, route.destinationLon, precision),
+            departureTime=route.departureTime,
+        )
+
+    @classmethod
+    def store(cls, routes: Iterable, batchSize: int = 1000) -> int:
+        """
+        Stores the cells of the routes, replacing the known ones.
+
+        Returns:
+            int: The number of routes.
+        """
+        return len(
+            cls.objects.bulk_create(
+                (cls.fromRoute(route) for route in routes),
+                batch_size=batchSize,
+                update_conflicts=True,
+                unique_fields=["routeId"],
+                update_fields=["originCell", "destinationCell", "departureTime"],
+            )
+        )
@@ -1,18 +1,48 @@
 from common.models.route import Route
+from django.conf import settings
+from django.db.models import Prefetch
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 
+from api.models import RouteGeometry
+
 from common.models.user import User
 from common.models.charger import LocationCharger, ChargerLocationType, ChargerVelocity
 
 
-class RouteSerializer(ModelSerializer):
+def polylineDetail(request) -> str:
+    """
+    Returns the polyline detail level requested with ?detail=, the full polyline by default.
+    """
+    detail = request.query_params.get("detail", RouteGeometry.FULL)
+    levels = [RouteGeometry.FULL, *settings.ROUTE_POLYLINE_LEVELS]
+    if detail not in levels:
+        raise serializers.ValidationError({"detail": f"Must be one of: {', '.join(levels)}"})
+    return detail
+
+
+class PolylineDetailMixin:
+    """
+    Returns the polyline with the detail level given in the 'detail' context key.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        detail = self.context.get("detail", RouteGeometry.FULL)
+        if detail != RouteGeometry.FULL:
+            data["polyline"] = RouteGeometry.polylineFor(instance, detail)
+        return data
+
+
+class RouteSerializer(PolylineDetailMixin, ModelSerializer):
     class Meta:
         model = Route
         fields = "__all__"
 
 
 class CreateRouteSerializer(ModelSerializer):
+    planToken = serializers.CharField(write_only=True, required=False)
+
     class Meta:
         model = Route
         fields = [
@@ -25,6 +55,7 @@ class CreateRouteSerializer(ModelSerializer):
             "departureTime",
             "freeSeats",
             "price",
+            "planToken",
         ]
 
 
@@ -34,7 +65,7 @@ class UserSerializer(ModelSerializer):
         fields = ["id", "username", "email"]
 
 
-class DetaliedRouteSerializer(ModelSerializer):
+class DetaliedRouteSerializer(PolylineDetailMixin, ModelSerializer):
     passengers = UserSerializer(many=True, read_only=True)
     driver = UserSerializer(read_only=True)
 
@@ -42,8 +73,20 @@ class DetaliedRouteSerializer(ModelSerializer):
         model = Route
         fields = "__all__"
 
+    @staticmethod
+    def withRelated(queryset):
+        """
+        Returns the queryset loading the driver and passengers of the routes in two queries.
+        """
+        return queryset.select_related("driver").prefetch_related(
+            Prefetch("passengers", queryset=User.objects.only(*UserSerializer.Meta.fields))
+        )
+
 
 class PreviewRouteSerializer(ModelSerializer):
+    planToken = serializers.CharField(read_only=True)
+    approximate = serializers.BooleanField(read_only=True)
+
     class Meta:
         model = Route
         fields = [
@@ -54,6 +97,8 @@ class PreviewRouteSerializer(ModelSerializer):
             "polyline",
             "duration",
             "distance",
+            "planToken",
+            "approximate",
         ]
         write_only_fields = [
             "originLat",
@@ -65,9 +110,20 @@ class PreviewRouteSerializer(ModelSerializer):
             "polyline",
             "duration",
             "distance",
+            "planToken",
+            "approximate",
         ]
 
 
+class BatchPreviewRouteSerializer(serializers.Serializer):
+    # Every route is validated on its own with PreviewRouteSerializer to report per route errors
+    routes = serializers.ListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=settings.ROUTE_BATCH_MAX_SIZE,
+    )
+
+
 class ListRouteSerializer(ModelSerializer):
     class UserListSerializer(ModelSerializer):
         class Meta:
@@ -97,6 +153,18 @@ class ListRouteSerializer(ModelSerializer):
             "finalized",
         ]
 
+    @staticmethod
+    def withRelated(queryset):
+        """
+        Returns the queryset loading the driver and passengers of the routes in two queries.
+        """
+        return queryset.select_related("driver").prefetch_related(
+            Prefetch(
+                "passengers",
+                queryset=User.objects.only(*ListRouteSerializer.UserListSerializer.Meta.fields),
+            )
+        )
+
 
 # The following fields are available in the Route model:
 # "id"
@@ -0,0 +1,121 @@
+"""
+Circuit breaker for the calls to external services.
+
+After 'failureThreshold' consecutive failures the circuit opens and calls are rejected right away
+with CircuitOpen, so a slow or down service does not keep the workers waiting on it. Once
+'resetTimeout' seconds have passed a single trial call is let through (half open): if it
+succeeds the circuit closes again, otherwise it stays open for another 'resetTimeout'.
+"""
+
+import logging
+import time
+from threading import Lock
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Counts the failures of the calls made through it and opens when there are too many.
+    Only exceptions of the 'failures' types count as failures, other exceptions are errors of the
+    call itself (e.g. no route found) and count as successful calls to the service.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        failureThreshold: int,
+        resetTimeout: float,
+        failures: tuple[type[BaseException], ...] = (Exception,),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.failures = failures
+        self.clock = clock
+        self.lock = Lock()
+        self.state = self.CLOSED
+        self.consecutiveFailures = 0
+        self.openedAt = 0.0
+        self.rejected = 0
+
+    def allow(self):
+        """
+        Raises CircuitOpen if the call can't be made now.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() - self.openedAt >= self.resetTimeout:
+                self.state = self.HALF_OPEN
+                return
+            self.rejected += 1
+        raise CircuitOpen(f"{self.name} circuit is open")
+
+    def recordSuccess(self):
+        with self.lock:
+            if self.state != self.CLOSED:
+                logger.info("%s circuit closed", self.name)
+            self.state = self.CLOSED
+            self.consecutiveFailures = 0
+
+    def recordFailure(self):
+        with self.lock:
+            self.consecutiveFailures += 1
+            if self.state == self.HALF_OPEN or self.consecutiveFailures >= self.failureThreshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        "%s circuit opened after %d failures", self.name, self.consecutiveFailures
+                    )
+                self.state = self.OPEN
+                self.openedAt = self.clock()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Returns fn(*args, **kwargs) if the circuit allows it, raises CircuitOpen otherwise.
+        """
+        self.allow()
+        try:
+            result = fn(*args, **kwargs)
+        except self.failures:
+            self.recordFailure()
+            raise
+        except Exception:
+            self.recordSuccess()
+            raise
+        except BaseException:
+            # cancelled before the service answered, it may be hanging
+            self.recordFailure()
+            raise
+        self.recordSuccess()
+        return result
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Async version of call.
+        """
+        self.allow()
+        try:
+            result = await fn(*args, **kwargs)
+        except self.failures:
+            self.recordFailure()
+            raise
+        except Exception:
+            self.recordSuccess()
+            raise
+        except BaseException:
+            # cancelled before the service answered, it may be hanging
+            self.recordFailure()
+            raise
+        self.recordSuccess()
+        return result
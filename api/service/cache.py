@@ -0,0 +1,293 @@
+"""
+Caching layer for the routes computed by the routing backend.
+
+Results are stored in two tiers: an in-process LRU with TTL (cachetools) in front of the Django
+cache framework, so repeated trips skip the Maps round trips both within a worker and across
+workers sharing the same cache backend.
+
+It also keeps the chargers selected for the trips, shared by similar trips of drivers with
+similar cars, and the short-lived route plans handed from the preview to the creation of a route.
+"""
+
+import hashlib
+import logging
+import secrets
+from threading import Lock
+from typing import Any, Iterable
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+
+from api.service.geo import geohash
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    Two tier cache: a local TTLCache (LRU eviction + TTL) backed by a Django cache alias.
+
+    Keys are built from an iterable of (latitude, longitude) points quantized to 'precision'
+    decimals, so small GPS jitter between requests maps to the same entry. The hit/miss counters
+    are logged every CACHE_STATS_INTERVAL lookups.
+    """
+
+    def __init__(self, prefix: str, ttl: int, maxsize: int, precision: int, alias: str = "default"):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.precision = precision
+        self.alias = alias
+        self.local: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = Lock()
+        self.hits = 0
+        self.localHits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, points: Iterable[tuple[float, float]]) -> str:
+        """
+        Returns the cache key for the given points.
+        """
+        quantized = "|".join(
+            f"{float(lat):.{self.precision}f},{float(lon):.{self.precision}f}"
+            for lat, lon in points
+        )
+        return self.hashKey(quantized)
+
+    def hashKey(self, text: str) -> str:
+        """
+        Returns the cache key for an arbitrary text.
+        """
+        # hashed since memcached-like backends reject long keys
+        return f"{self.prefix}:{hashlib.sha1(text.encode()).hexdigest()}"
+
+    def get(self, points: Iterable[tuple[float, float]]) -> Any:
+        """
+        Returns the cached value for the given points or None if it is not cached.
+        """
+        return self.lookup(self.key(points))
+
+    def lookup(self, key: str) -> Any:
+        """
+        Returns the value cached with the key or None if it is not cached.
+        """
+        value = self.getLocal(key)
+        if value is not None:
+            return value
+        return self.promote(key, self.backend.get(key))
+
+    async def aget(self, points: Iterable[tuple[float, float]]) -> Any:
+        """
+        Async version of get, the shared tier is queried without blocking the event loop.
+        """
+        key = self.key(points)
+        value = self.getLocal(key)
+        if value is not None:
+            return value
+        return self.promote(key, await self.backend.aget(key))
+
+    def getLocal(self, key: str) -> Any:
+        with self.lock:
+            value = self.local.get(key)
+            if value is None:
+                return None
+            self.hits += 1
+            self.localHits += 1
+            report = self.reportDue()
+        if report:
+            self.report()
+        return value
+
+    def promote(self, key: str, value: Any) -> Any:
+        """
+        Records the lookup on the shared tier and copies the value found to the local tier.
+        """
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                logger.debug("%s miss %s", self.prefix, key)
+            else:
+                self.hits += 1
+                self.local[key] = value
+            report = self.reportDue()
+        if report:
+            self.report()
+        return value
+
+    def reportDue(self) -> bool:
+        interval = settings.CACHE_STATS_INTERVAL
+        return interval > 0 and (self.hits + self.misses) % interval == 0
+
+    def report(self):
+        """
+        Logs the hit/miss counters of this process.
+        """
+        stats = self.stats()
+        logger.info(
+            "%s cache: %d hits (%d local), %d misses, hit ratio %.2f, %d local entries",
+            self.prefix,
+            stats["hits"],
+            stats["localHits"],
+            stats["misses"],
+            stats["hitRatio"],
+            stats["size"],
+        )
+
+    def set(self, points: Iterable[tuple[float, float]], value: Any):
+        """
+        Stores the value for the given points in both tiers.
+        """
+        self.store(self.key(points), value)
+
+    def store(self, key: str, value: Any):
+        """
+        Stores the value with the key in both tiers.
+        """
+        with self.lock:
+            self.local[key] = value
+        self.backend.set(key, value, timeout=self.ttl)
+
+    async def aset(self, points: Iterable[tuple[float, float]], value: Any):
+        """
+        Async version of set.
+        """
+        key = self.key(points)
+        with self.lock:
+            self.local[key] = value
+        await self.backend.aset(key, value, timeout=self.ttl)
+
+    def clear(self):
+        """
+        Clears the local tier and resets the counters. The shared tier expires on its own.
+        """
+        with self.lock:
+            self.local.clear()
+            self.hits = 0
+            self.localHits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns the hit/miss counters of this process.
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "localHits": self.localHits,
+                "misses": self.misses,
+                "hitRatio": self.hits / total if total else 0.0,
+                "size": len(self.local),
+            }
+
+
+# Each routing provider has its own entries, their routes are not interchangeable
+routeCache = TieredCache(
+    f"route:{settings.ROUTE_PROVIDER}",
+    ttl=settings.ROUTE_CACHE_TTL,
+    maxsize=settings.ROUTE_CACHE_MAXSIZE,
+    precision=settings.ROUTE_CACHE_PRECISION,
+)
+
+
+# Chargers of the planned routes, see chargersPlanKey
+chargersPlanCache = TieredCache(
+    "chargers",
+    ttl=settings.CHARGER_PLAN_CACHE_TTL,
+    maxsize=settings.CHARGER_PLAN_CACHE_MAXSIZE,
+    precision=settings.ROUTE_CACHE_PRECISION,
+)
+
+
+def chargersPlanKey(
+    origin: tuple[float, float],
+    destination: tuple[float, float],
+    autonomy: int,
+    chargerTypes: list[str],
+    version: int,
+) -> str:
+    """
+    Returns the key of the chargers planned for a trip. Trips between the same geohash cells of
+    CHARGER_PLAN_CELL_PRECISION characters, with the same autonomy band and charger types share
+    it, the chargers dataset version and the planner settings are part of the key so plans of
+    old chargers or another planner are not reused.
+    """
+    precision = settings.CHARGER_PLAN_CELL_PRECISION
+    return chargersPlanCache.hashKey(
+        ":".join(
+            [
+                geohash(*origin, precision),
+                geohash(*destination, precision),
+                str(autonomy),
+                ",".join(sorted(chargerTypes)),
+                str(version),
+                settings.CHARGER_PLANNER_MODE,
+                settings.CHARGER_SELECTION_MODE,
+            ]
+        )
+    )
+
+
+PLAN_PREFIX = "plan"
+
+
+def planEndpointsKey(endpoints: list[dict]):
+    return routeCache.key((point["latitude"], point["longitude"]) for point in endpoints)
+
+
+def storePlan(driverId: int, endpoints: list[dict], routeData: dict, waypoints: list):
+    """
+    Stores a computed route plan so the creation of the route can reuse it.
+
+    Args:
+        driverId (int): The driver that requested the plan.
+        endpoints (list): The origin and destination of the plan, with 'latitude' and 'longitude'.
+        routeData (dict): The route polyline, duration and distance.
+        waypoints (list): The chargers of the route.
+
+    Returns:
+        str: The token that identifies the plan.
+    """
+    token = secrets.token_urlsafe(16)
+    plan = {
+        "driver": driverId,
+        "endpoints": planEndpointsKey(endpoints),
+        "routeData": routeData,
+        "waypoints": waypoints,
+    }
+    caches[routeCache.alias].set(f"{PLAN_PREFIX}:{token}", plan, timeout=settings.ROUTE_PLAN_TTL)
+    return token
+
+
+def retrievePlan(token: str, driverId: int, endpoints: list[dict]):
+    """
+    Returns the stored plan if it was computed for the same driver and endpoints, the plan can
+    only be used once: it is only returned by the request that deletes it.
+
+    Args:
+        token (str): The token returned by storePlan.
+        driverId (int): The driver that wants to use the plan.
+        endpoints (list): The origin and destination of the route being created.
+
+    Returns:
+        tuple[dict, list] | None: The route data and waypoints, None if there is no matching plan.
+    """
+    backend = caches[routeCache.alias]
+    key = f"{PLAN_PREFIX}:{token}"
+    plan = backend.get(key)
+    if plan is None:
+        return None
+
+    if plan["driver"] != driverId or plan["endpoints"] != planEndpointsKey(endpoints):
+        logger.debug("plan %s does not match the route inputs", token)
+        return None
+
+    # another request may have read the plan too, only the one that deletes it uses it
+    if not backend.delete(key):
+        logger.debug("plan %s was already used", token)
+        return None
+    return plan["routeData"], plan["waypoints"]
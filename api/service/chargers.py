@@ -0,0 +1,308 @@
+"""
+In-memory spatial index of the chargers.
+
+The charger dataset is small and only changes when `manage.py seed` or `manage.py cleardata`
+run, so every process keeps it in NumPy arrays with a haversine BallTree and answers the bounding
+box, radius and nearest queries of the planners and charger endpoints without the ORM.
+
+Connection types and velocities are stored as bitmasks, bit i is set if the charger has the i-th
+choice of ChargerLocationType.CHARGER_CHOICES or ChargerVelocity.VELOCITY_CHOICES. The masks are
+computed from the many to many tables when the chargers are seeded and stored as ChargerMask, the
+index reads them in a single query and only computes those of the chargers that have none.
+
+The index is rebuilt when the version of the chargers dataset (DatasetVersion) changes, which is
+checked at most every CHARGER_INDEX_CHECK_INTERVAL seconds.
+"""
+
+import logging
+import time
+from threading import Lock
+from typing import Iterable
+
+import numpy as np
+from api.models import ChargerMask, DatasetVersion
+from api.service.geo import (
+    EARTH_RADIUS_KM,
+    densifyPolyline,
+    haversineDistances,
+    polylineDistances,
+    simplifyPolyline,
+)
+from common.models.charger import (
+    ChargerLocationType,
+    ChargerTypeM2M,
+    ChargerVelocity,
+    ChargerVelocityM2M,
+    LocationCharger,
+)
+from django.conf import settings
+from django.db import transaction
+from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+CHARGERS_DATASET = "chargers"
+CONNECTION_TYPES = [choice for choice, _ in ChargerLocationType.CHARGER_CHOICES]
+VELOCITIES = [choice for choice, _ in ChargerVelocity.VELOCITY_CHOICES]
+
+
+def buildMask(values: Iterable[str], choices: list[str]) -> int:
+    """
+    Returns the bitmask of the values, values that are not a choice are ignored.
+    """
+    mask = 0
+    for value in values:
+        if value in choices:
+            mask |= 1 << choices.index(value)
+    return mask
+
+
+def computeChargerMasks(chargerIds: Iterable[int] | None = None) -> dict[int, tuple[int, int]]:
+    """
+    Returns the type and velocity masks of the chargers from their many to many tables.
+
+    Args:
+        chargerIds (Iterable[int] | None): The chargers to compute, all of them if None.
+
+    Returns:
+        dict: The (typeMask, velocityMask) of every charger with a type or velocity.
+    """
+    types = ChargerTypeM2M.objects.all()
+    velocities = ChargerVelocityM2M.objects.all()
+    if chargerIds is not None:
+        chargerIds = list(chargerIds)
+        types = types.filter(location_charger_id__in=chargerIds)
+        velocities = velocities.filter(location_charger_id__in=chargerIds)
+
+    masks = {}
+    for chargerId, chargerType in types.values_list(
+        "location_charger_id", "charger_location_type__chargerType"
+    ):
+        typeMask, velocityMask = masks.get(chargerId, (0, 0))
+        masks[chargerId] = (typeMask | buildMask([chargerType], CONNECTION_TYPES), velocityMask)
+    for chargerId, velocity in velocities.values_list(
+        "location_charger_id", "charger_velocity__velocity"
+    ):
+        typeMask, velocityMask = masks.get(chargerId, (0, 0))
+        masks[chargerId] = (typeMask, velocityMask | buildMask([velocity], VELOCITIES))
+    return masks
+
+
+def rebuildChargerMasks() -> int:
+    """
+    Replaces the stored masks with those of the current chargers.
+
+    Returns:
+        int: The number of chargers.
+    """
+    chargerIds = list(LocationCharger.objects.values_list("id", flat=True))
+    masks = computeChargerMasks()
+    with transaction.atomic():
+        ChargerMask.objects.all().delete()
+        ChargerMask.objects.bulk_create(
+            (
+                ChargerMask(chargerId=chargerId, typeMask=typeMask, velocityMask=velocityMask)
+                for chargerId in chargerIds
+                for typeMask, velocityMask in [masks.get(chargerId, (0, 0))]
+            ),
+            batch_size=5000,
+        )
+    return len(chargerIds)
+
+
+class ChargerIndex:
+    """
+    Array backed index of the chargers, the queries return the rows of the matching chargers.
+    """
+
+    def __init__(self, ids, lat, lon, kw, typeMask, velocityMask, version: int = 0):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.kw = np.asarray(kw, dtype=np.float32)
+        self.typeMask = np.asarray(typeMask, dtype=np.uint16)
+        self.velocityMask = np.asarray(velocityMask, dtype=np.uint16)
+        self.version = version
+
+        self.coords = np.column_stack([self.lat, self.lon])
+        self.tree = BallTree(np.radians(self.coords), metric="haversine") if len(self) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, version: int = 0) -> "ChargerIndex":
+        """
+        Loads the chargers from the database.
+        """
+        chargers = list(
+            LocationCharger.objects.order_by("id").values_list("id", "latitud", "longitud", "kw")
+        )
+        rows = {chargerId: row for row, (chargerId, *_) in enumerate(chargers)}
+
+        typeMask = np.zeros(len(chargers), dtype=np.uint16)
+        velocityMask = np.zeros(len(chargers), dtype=np.uint16)
+        masks = {
+            chargerId: (types, velocities)
+            for chargerId, types, velocities in ChargerMask.objects.values_list(
+                "chargerId", "typeMask", "velocityMask"
+            )
+            if chargerId in rows
+        }
+        missing = rows.keys() - masks.keys()
+        if missing:
+            logger.warning("Computing the masks of %d chargers without them", len(missing))
+            # with no stored masks (before the first seed) scanning all the rows is cheaper
+            masks.update(computeChargerMasks(None if not masks else missing))
+
+        for chargerId, (types, velocities) in masks.items():
+            typeMask[rows[chargerId]] = types
+            velocityMask[rows[chargerId]] = velocities
+
+        columns = list(zip(*chargers)) or [[], [], [], []]
+        logger.info("Charger index %d built with %d chargers", version, len(chargers))
+        return cls(*columns, typeMask, velocityMask, version=version)
+
+    def filterRows(self, rows: np.ndarray, chargerTypes: Iterable[str] | None) -> np.ndarray:
+        """
+        Returns the rows of the chargers with any of the connection types, all of them if
+        chargerTypes is None.
+        """
+        if chargerTypes is None:
+            return rows
+        return rows[self.hasTypes(rows, chargerTypes)]
+
+    def hasTypes(self, rows: np.ndarray, chargerTypes: Iterable[str]) -> np.ndarray:
+        return (self.typeMask[rows] & buildMask(chargerTypes, CONNECTION_TYPES)) != 0
+
+    def inBounds(
+        self,
+        southwest: tuple[float, float],
+        northeast: tuple[float, float],
+        chargerTypes: Iterable[str] | None = None,
+    ) -> np.ndarray:
+        """
+        Returns the rows of the chargers inside the bounding box, in id order.
+        """
+        inside = (
+            (self.lat >= southwest[0])
+            & (self.lat <= northeast[0])
+            & (self.lon >= southwest[1])
+            & (self.lon <= northeast[1])
+        )
+        return self.filterRows(np.flatnonzero(inside), chargerTypes)
+
+    def inCorridor(
+        self,
+        coords: list[tuple[float, float]],
+        bufferKm: float,
+        chargerTypes: Iterable[str] | None = None,
+    ) -> np.ndarray:
+        """
+        Returns the rows of the chargers at most bufferKm away from the polyline, in id order.
+
+        The polyline is simplified and sampled every bufferKm, the samples query the tree with a
+        radius that covers the buffer of the line between them and the candidates found are
+        filtered with their exact distance to the simplified segments.
+        """
+        if self.tree is None:
+            return np.empty(0, dtype=np.intp)
+
+        # a tenth of the buffer is a negligible shift of the line
+        simplified = simplifyPolyline(list(coords), bufferKm * 100)
+        samples = densifyPolyline(simplified, bufferKm)
+        found = self.tree.query_radius(np.radians(samples), r=1.5 * bufferKm / EARTH_RADIUS_KM)
+        rows = self.filterRows(np.unique(np.concatenate(found)), chargerTypes)
+        if len(rows) == 0:
+            return rows
+        return rows[polylineDistances(self.coords[rows], simplified) <= bufferKm]
+
+    def withinRadius(
+        self,
+        point: tuple[float, float],
+        radiusKm: float,
+        chargerTypes: Iterable[str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the rows of the chargers within the radius of the point and their distances in
+        kilometers, nearest first.
+        """
+        if self.tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        rows, distances = self.tree.query_radius(
+            np.radians([point]),
+            r=radiusKm / EARTH_RADIUS_KM,
+            return_distance=True,
+            sort_results=True,
+        )
+        rows, distances = rows[0], distances[0] * EARTH_RADIUS_KM
+        if chargerTypes is None:
+            return rows, distances
+        keep = self.hasTypes(rows, chargerTypes)
+        return rows[keep], distances[keep]
+
+    def nearest(
+        self,
+        point: tuple[float, float],
+        k: int,
+        chargerTypes: Iterable[str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the rows of the k chargers nearest to the point and their distances in
+        kilometers, nearest first.
+        """
+        rows = self.filterRows(np.arange(len(self)), chargerTypes)
+        k = min(k, len(rows))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        if chargerTypes is None:
+            distances, found = self.tree.query(np.radians([point]), k=k)
+            return found[0], distances[0] * EARTH_RADIUS_KM
+
+        distances = haversineDistances(self.coords[rows], point)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return rows[nearest], distances[nearest]
+
+
+_index: ChargerIndex | None = None
+_checkedAt = 0.0
+_lock = Lock()
+
+
+def getChargerIndex() -> ChargerIndex:
+    """
+    Returns the charger index of this process, building it again if the dataset changed.
+    """
+    global _index, _checkedAt
+
+    if _index is not None and time.monotonic() - _checkedAt < settings.CHARGER_INDEX_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        if _index is None or time.monotonic() - _checkedAt >= settings.CHARGER_INDEX_CHECK_INTERVAL:
+            version = DatasetVersion.current(CHARGERS_DATASET)
+            if _index is None or _index.version != version:
+                _index = ChargerIndex.build(version)
+            _checkedAt = time.monotonic()
+        return _index
+
+
+def invalidateChargerIndex():
+    """
+    Drops the charger index of this process, the next getChargerIndex builds it again.
+    """
+    global _index
+    with _lock:
+        _index = None
+
+
+def bumpChargerDataset() -> int:
+    """
+    Records a change of the chargers dataset, every process rebuilds its index.
+    """
+    version = DatasetVersion.bump(CHARGERS_DATASET)
+    invalidateChargerIndex()
+    return version
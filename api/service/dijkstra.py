@@ -1,5 +1,9 @@
 import heapq
-from typing import Dict, List
+from typing import Dict, Hashable, List
+
+import numpy as np
+
+from api.service.geo import haversineMatrix
 
 
 def dijkstra(
@@ -53,3 +57,31 @@ def dijkstra(
         current_node = parents[current_node]
     path.reverse()
     return path
+
+
+def buildDistanceGraph(
+    points: Dict[Hashable, tuple[float, float]], maxDistance: float
+) -> Dict[Hashable, Dict[Hashable, float]]:
+    """
+    Returns the graph between the points for the dijkstra function, with an edge between every
+    pair of points at most maxDistance kilometers apart. Distances are computed at once as a
+    haversine matrix, the edges longer than maxDistance are left out of the graph.
+
+    Args:
+        points (Dict): The coordinates of every node.
+        maxDistance (float): The maximum length of an edge in kilometers.
+    """
+    labels = list(points)
+    distances = haversineMatrix(np.array(list(points.values()), dtype=np.float64))
+    np.fill_diagonal(distances, np.inf)
+
+    rows, cols = np.nonzero(distances <= maxDistance)
+    weights = distances[rows, cols].tolist()
+    splits = np.searchsorted(rows, np.arange(1, len(labels))).tolist()
+
+    graph: Dict[Hashable, Dict[Hashable, float]] = {}
+    for label, start, end in zip(labels, [0, *splits], [*splits, len(rows)]):
+        graph[label] = {
+            labels[col]: weight for col, weight in zip(cols[start:end].tolist(), weights[start:end])
+        }
+    return graph
@@ -0,0 +1,225 @@
+"""
+Geometry helpers shared by the route services.
+
+Distances are computed on a sphere (haversine), which is accurate enough for route planning and
+vectorizes well. Local computations project the coordinates to meters with an equirectangular
+projection around the mean latitude, valid for regional distances like the routes we handle.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def projectToMeters(coords: np.ndarray, refLat: float | None = None) -> np.ndarray:
+    """
+    Projects (latitude, longitude) coordinates in degrees to (x, y) meters.
+
+    Args:
+        coords (np.ndarray): Array of shape (n, 2) with the coordinates.
+        refLat (float, optional): Latitude where the projection is exact, defaults to the mean.
+    """
+    radians = np.radians(np.asarray(coords, dtype=np.float64))
+    if refLat is None:
+        refLat = float(np.degrees(radians[:, 0].mean()))
+    scale = EARTH_RADIUS_KM * 1000
+    return np.column_stack(
+        [radians[:, 1] * scale * np.cos(np.radians(refLat)), radians[:, 0] * scale]
+    )
+
+
+def simplifyPolyline(coords: list[tuple[float, float]], tolerance: float):
+    """
+    Simplifies a polyline with the Douglas-Peucker algorithm.
+
+    Args:
+        coords (list): The (latitude, longitude) points of the polyline.
+        tolerance (float): Maximum distance in meters between the simplified and original lines.
+
+    Returns:
+        list: The points of the polyline that are kept, always including the first and last ones.
+    """
+    if len(coords) < 3:
+        return list(coords)
+
+    points = projectToMeters(np.asarray(coords))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        distances = segmentDistances(points[start + 1 : end], points[start], points[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return [coord for coord, kept in zip(coords, keep) if kept]
+
+
+def segmentDistances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    Returns the distance of every projected point to the segment between start and end.
+    """
+    segment = end - start
+    length = float(segment @ segment)
+    if length == 0:
+        return np.linalg.norm(points - start, axis=1)
+    t = np.clip((points - start) @ segment / length, 0, 1)
+    return np.linalg.norm(points - (start + t[:, None] * segment), axis=1)
+
+
+def haversineDistances(points: np.ndarray, point: tuple[float, float]) -> np.ndarray:
+    """
+    Returns the great circle distance in kilometers from every point to 'point'.
+
+    Args:
+        points (np.ndarray): Array of shape (n, 2) with (latitude, longitude) in degrees.
+        point (tuple): The (latitude, longitude) in degrees to measure the distances to.
+    """
+    return haversinePairs(points, np.asarray(point, dtype=np.float64))
+
+
+def haversinePairs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Returns the great circle distance in kilometers between the points of a and b, element wise
+    with broadcasting. The last axis of both arrays is (latitude, longitude) in degrees.
+    """
+    a = np.radians(np.asarray(a, dtype=np.float64))
+    b = np.radians(np.asarray(b, dtype=np.float64))
+    lat1, lon1 = a[..., 0], a[..., 1]
+    lat2, lon2 = b[..., 0], b[..., 1]
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def haversineMatrix(points: np.ndarray) -> np.ndarray:
+    """
+    Returns the matrix of great circle distances in kilometers between every pair of points.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    return haversinePairs(points[:, None, :], points[None, :, :])
+
+
+def densifyPolyline(coords: np.ndarray, stepKm: float) -> np.ndarray:
+    """
+    Returns the polyline with points added so consecutive points are at most stepKm apart.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) < 2:
+        return coords
+
+    lengths = haversinePairs(coords[:-1], coords[1:])
+    parts = np.maximum(np.ceil(lengths / stepKm).astype(np.int64), 1)
+    # t goes from 0 to 1 (excluded) along every segment, the last point is added at the end
+    segments = np.repeat(np.arange(len(parts)), parts)
+    t = np.arange(len(segments)) - np.repeat(np.cumsum(parts) - parts, parts)
+    t = (t / np.repeat(parts, parts))[:, None]
+    points = coords[segments] + t * (coords[segments + 1] - coords[segments])
+    return np.vstack([points, coords[-1:]])
+
+
+def polylineDistances(points: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """
+    Returns the distance in kilometers from every point to the nearest segment of the polyline.
+
+    Distances are computed on an equirectangular projection centered at each point, accurate
+    for the distances of a few tens of kilometers it is used for.
+
+    Args:
+        points (np.ndarray): Array of shape (n, 2) with (latitude, longitude) in degrees.
+        coords (np.ndarray): Array of shape (m, 2) with the points of the polyline.
+    """
+    points = np.radians(np.asarray(points, dtype=np.float64))[:, None, :]
+    coords = np.radians(np.asarray(coords, dtype=np.float64))
+    if len(coords) == 1:
+        coords = np.vstack([coords, coords])
+
+    # (n, m) coordinates of the polyline points relative to every point
+    scale = np.cos(points[..., 0])
+    x = (coords[None, :, 1] - points[..., 1]) * scale
+    y = coords[None, :, 0] - points[..., 0]
+
+    x1, y1, x2, y2 = x[:, :-1], y[:, :-1], x[:, 1:], y[:, 1:]
+    dx, dy = x2 - x1, y2 - y1
+    length = dx**2 + dy**2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length > 0, -(x1 * dx + y1 * dy) / length, 0.0)
+    t = np.clip(t, 0, 1)
+    distances = np.hypot(x1 + t * dx, y1 + t * dy)
+    return distances.min(axis=1) * EARTH_RADIUS_KM
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int) -> str:
+    """
+    Returns the geohash of the point, the cell of the grid with 'precision' characters that
+    contains it (e.g. 6 ~ 1.2 x 0.6 km, 7 ~ 150 x 150 m).
+    """
+    latRange, lonRange = [-90.0, 90.0], [-180.0, 180.0]
+    cell = []
+    bits, char, even = 0, 0, True
+    while len(cell) < precision:
+        # bits alternate between longitude and latitude, starting with the longitude
+        interval, value = (lonRange, lon) if even else (latRange, lat)
+        middle = (interval[0] + interval[1]) / 2
+        char <<= 1
+        if value >= middle:
+            char |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            cell.append(GEOHASH_ALPHABET[char])
+            bits, char = 0, 0
+    return "".join(cell)
+
+
+def geohashCellSize(precision: int) -> tuple[float, float]:
+    """
+    Returns the height and width in degrees of the geohash cells with 'precision' characters.
+    """
+    bits = 5 * precision
+    # the longitude gets the extra bit of odd lengths
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def geohashCells(
+    southwest: tuple[float, float], northeast: tuple[float, float], precision: int
+) -> list[str]:
+    """
+    Returns the geohash cells with 'precision' characters that intersect the bounding box, the
+    box must not cross the antimeridian.
+    """
+    height, width = geohashCellSize(precision)
+    south, west = max(southwest[0], -90.0), max(southwest[1], -180.0)
+    north, east = min(northeast[0], 90.0), min(northeast[1], 180.0)
+    # centers of the cells of the grid, from the row and column of the south west corner
+    firstLat = (math.floor((south + 90.0) / height) + 0.5) * height - 90.0
+    firstLon = (math.floor((west + 180.0) / width) + 0.5) * width - 180.0
+    rows = math.floor((north + 90.0) / height) - math.floor((south + 90.0) / height) + 1
+    columns = math.floor((east + 180.0) / width) - math.floor((west + 180.0) / width) + 1
+    cells = (
+        geohash(
+            min(firstLat + row * height, 90.0), min(firstLon + column * width, 180.0), precision
+        )
+        for row in range(rows)
+        for column in range(columns)
+    )
+    # the edges of the world round into the last row or column
+    return list(dict.fromkeys(cells))
@@ -0,0 +1,255 @@
+"""
+Routing backends used to compute the road route that goes through a path of points.
+
+Every provider returns the route as {polyline, duration, distance}, with the encoded polyline,
+the duration in seconds and the distance in meters. Providers that know the legs between the
+consecutive points of the path also return them in 'legs', with the same shape. The provider in
+use is chosen with the ROUTE_PROVIDER setting:
+- google: Google Maps Routes API.
+- local: in-process road graph loaded from ROUTE_GRAPH_PATH, see api.service.roadgraph.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Union
+
+import polyline
+from api import getGoogleMapsRouteAsyncClient, getGoogleMapsRouteClient
+from api.service.breaker import CircuitBreaker, CircuitOpen
+from api.service.roadgraph import RoadGraph
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from google.api_core import exceptions as gexceptions
+from google.api_core.retry import Retry, if_exception_type
+from google.api_core.retry_async import AsyncRetry
+from google.maps.routing_v2 import ComputeRoutesRequest, ComputeRoutesResponse
+from google.maps.routing_v2 import Route as GRoute
+from rest_framework.exceptions import APIException
+
+X_GOOGLE_FIELDS = (
+    "x-goog-fieldmask",
+    "routes.distanceMeters,routes.duration,routes.polyline.encodedPolyline,"
+    "routes.legs.distanceMeters,routes.legs.duration,routes.legs.polyline.encodedPolyline",
+)
+
+
+# Errors of the Maps API that mean it is unavailable, not that the request is wrong
+MAPS_UNAVAILABLE_ERRORS = (
+    gexceptions.DeadlineExceeded,
+    gexceptions.ServiceUnavailable,
+    gexceptions.InternalServerError,
+    gexceptions.ResourceExhausted,
+    gexceptions.RetryError,
+)
+MAPS_RETRYABLE_ERRORS = if_exception_type(gexceptions.ServiceUnavailable)
+
+
+class NoRouteFound(APIException):
+    status_code = 404
+    default_detail = "No routes found"
+    default_code = "no_routes_found"
+
+
+class RoutingUnavailable(APIException):
+    status_code = 503
+    default_detail = "The routing service is not available, try again later"
+    default_code = "routing_unavailable"
+
+
+def deserializeMapsRoutesResponse(mapsRoute: ComputeRoutesResponse):
+    """
+    Derializes a ComputeRoutesResponse object into the serializer.
+
+    Args:
+        response (ComputeRoutesResponse): The ComputeRoutesResponse object to serialize.
+    """
+    assert isinstance(mapsRoute, ComputeRoutesResponse), "Wrong type for response parameter"
+
+    if not mapsRoute.routes:
+        raise NoRouteFound()
+
+    route: GRoute = mapsRoute.routes[0]
+    routeData = {
+        "polyline": route.polyline.encoded_polyline,
+        "duration": route.duration.seconds,
+        "distance": route.distance_meters,
+    }
+    if route.legs:
+        routeData["legs"] = [
+            {
+                "polyline": leg.polyline.encoded_polyline,
+                "duration": leg.duration.seconds,
+                "distance": leg.distance_meters,
+            }
+            for leg in route.legs
+        ]
+    return routeData
+
+
+def buildMapsRouteRequestChargers(path: list[dict[str, Union[str, float]]]):
+    """
+    Creates a payload for the Google Maps API.
+
+    Args:
+        path (list): The path from the Dijkstra's algorithm.
+        origin (str): The origin.
+        destination (str): The destination.
+    """
+
+    # Remove the origin and destination from the path
+    waypoints = path[1:-1]
+    origin = path[0]
+    destination = path[-1]
+
+    # Format the waypoints into a string
+    # waypoints_str = '|'.join(waypoints)
+    intermediates = []
+    for point in waypoints:
+        intermediates.append(
+            {
+                "location": {
+                    "lat_lng": {
+                        "latitude": point["latitude"],
+                        "longitude": point["longitude"],
+                    }
+                }
+            }
+        )
+
+    mapping = {
+        "origin": {
+            "location": {
+                "lat_lng": {
+                    "latitude": origin["latitude"],
+                    "longitude": origin["longitude"],
+                }
+            }
+        },
+        "destination": {
+            "location": {
+                "lat_lng": {
+                    "latitude": destination["latitude"],
+                    "longitude": destination["longitude"],
+                }
+            }
+        },
+        "intermediates": [],
+    }
+    mapping["intermediates"] = intermediates
+    computeRoutesRequest = ComputeRoutesRequest(mapping)
+    return computeRoutesRequest
+
+
+class RouteProvider(ABC):
+    """
+    Defines the interface to be followed by any routing backend.
+    """
+
+    @abstractmethod
+    def computeRoute(self, path: list[dict[str, Union[str, float]]]) -> dict:
+        """
+        Returns the route that goes through all the points of the path, the first and last points
+        are the origin and destination.
+
+        Raises:
+            NoRouteFound: If there is no route between the points.
+        """
+        pass
+
+    async def acomputeRoute(self, path: list[dict[str, Union[str, float]]]) -> dict:
+        """
+        Async version of computeRoute, by default the sync version runs in a thread.
+        """
+        return await sync_to_async(self.computeRoute, thread_sensitive=False)(path)
+
+
+class GoogleRouteProvider(RouteProvider):
+    """
+    Computes the routes with the Google Maps Routes API.
+
+    Every call has a deadline of ROUTE_PROVIDER_TIMEOUT seconds, retries of transient errors
+    included, and goes through a circuit breaker so an unavailable API fails fast with
+    RoutingUnavailable instead of holding the workers.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            "google-routes",
+            failureThreshold=settings.ROUTE_BREAKER_THRESHOLD,
+            resetTimeout=settings.ROUTE_BREAKER_RESET,
+            failures=MAPS_UNAVAILABLE_ERRORS,
+        )
+
+    def computeRoute(self, path: list[dict[str, Union[str, float]]]) -> dict:
+        request = buildMapsRouteRequestChargers(path)
+        timeout = settings.ROUTE_PROVIDER_TIMEOUT
+        try:
+            response = self.breaker.call(
+                getGoogleMapsRouteClient().compute_routes,
+                request=request,
+                metadata=[X_GOOGLE_FIELDS],
+                retry=Retry(predicate=MAPS_RETRYABLE_ERRORS, maximum=1.0, timeout=timeout),
+                timeout=timeout,
+            )
+        except (CircuitOpen, *MAPS_UNAVAILABLE_ERRORS) as exc:
+            raise RoutingUnavailable() from exc
+        return deserializeMapsRoutesResponse(response)
+
+    async def acomputeRoute(self, path: list[dict[str, Union[str, float]]]) -> dict:
+        request = buildMapsRouteRequestChargers(path)
+        client = getGoogleMapsRouteAsyncClient()
+        timeout = settings.ROUTE_PROVIDER_TIMEOUT
+        try:
+            response = await self.breaker.acall(
+                client.compute_routes,
+                request=request,
+                metadata=[X_GOOGLE_FIELDS],
+                retry=AsyncRetry(predicate=MAPS_RETRYABLE_ERRORS, maximum=1.0, timeout=timeout),
+                timeout=timeout,
+            )
+        except (CircuitOpen, *MAPS_UNAVAILABLE_ERRORS) as exc:
+            raise RoutingUnavailable() from exc
+        return deserializeMapsRoutesResponse(response)
+
+
+class LocalRouteProvider(RouteProvider):
+    """
+    Computes the routes with the road graph in ROUTE_GRAPH_PATH, the graph is loaded once per
+    process on first use. Points are snapped to their nearest node of the graph.
+    """
+
+    graph: RoadGraph | None = None
+
+    def getGraph(self) -> RoadGraph:
+        if self.graph is None:
+            self.graph = RoadGraph.load(settings.ROUTE_GRAPH_PATH)
+        return self.graph
+
+    def computeRoute(self, path: list[dict[str, Union[str, float]]]) -> dict:
+        points = [(float(point["latitude"]), float(point["longitude"])) for point in path]
+        route = self.getGraph().route(points)
+        if route is None:
+            raise NoRouteFound()
+
+        coords, length, time = route
+        return {
+            "polyline": polyline.encode(coords),
+            "duration": round(time),
+            "distance": round(length),
+        }
+
+
+ROUTE_PROVIDERS: dict[str, type[RouteProvider]] = {
+    "google": GoogleRouteProvider,
+    "local": LocalRouteProvider,
+}
+_providers: dict[str, RouteProvider] = {}
+
+
+def getRouteProvider() -> RouteProvider:
+    """
+    Returns the routing backend configured in the ROUTE_PROVIDER setting.
+    """
+    name = settings.ROUTE_PROVIDER
+    if name not in _providers:
+        _providers[name] = ROUTE_PROVIDERS[name]()
+    return _providers[name]
@@ -0,0 +1,275 @@
+"""
+Reachability graph of the chargers.
+
+The pairs of chargers at most CHARGER_LINK_MAX_KM apart are stored as ChargerLink. With
+CHARGER_PLANNER_MODE="links" the table is rebuilt after the chargers are seeded and patched when
+a charger is saved or deleted, so the planner does not have to find out which chargers reach
+which on every request. Other planners do not use it and it is not kept up to date, the
+buildchargerlinks command builds it before switching to the links planner.
+
+Every process keeps the graph in CSR form over the rows of the charger index and loads it again
+when the chargers dataset version changes. A route is planned connecting its origin and
+destination to the chargers within the autonomy of the driver with the charger index and
+searching the stored graph, skipping the links longer than the autonomy.
+"""
+
+import heapq
+import logging
+from contextlib import contextmanager
+from threading import Lock, local
+from typing import Iterable
+
+import numpy as np
+from api.models import ChargerLink
+from api.service.chargers import ChargerIndex
+from api.service.geo import EARTH_RADIUS_KM, haversineDistances
+from common.models.charger import LocationCharger
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from sklearn.neighbors import BallTree
+
+logger = logging.getLogger(__name__)
+
+LINKS_BATCH_SIZE = 5000
+
+_maintenance = local()
+
+
+@contextmanager
+def chargerLinksPaused():
+    """
+    Stops patching the links when chargers are saved or deleted, for bulk loads that rebuild
+    them afterwards.
+    """
+    previous = linksPaused()
+    _maintenance.paused = True
+    try:
+        yield
+    finally:
+        _maintenance.paused = previous
+
+
+def linksPaused() -> bool:
+    return getattr(_maintenance, "paused", False)
+
+
+def chargerLinksEnabled() -> bool:
+    """
+    Whether the links are kept up to date, only the links planner uses them.
+    """
+    return settings.CHARGER_PLANNER_MODE == "links"
+
+
+def chargerLinks(ids: np.ndarray, coords: np.ndarray, maxDistance: float):
+    """
+    Returns the links between the chargers at most maxDistance kilometers apart.
+
+    Returns:
+        Iterator[ChargerLink]: The links, each pair once with the lowest id as source.
+    """
+    if len(ids) == 0:
+        return
+    tree = BallTree(np.radians(coords), metric="haversine")
+    neighbors, distances = tree.query_radius(
+        np.radians(coords), r=maxDistance / EARTH_RADIUS_KM, return_distance=True
+    )
+    for source, found, lengths in zip(ids.tolist(), neighbors, distances):
+        targets = ids[found]
+        keep = targets > source
+        for target, distance in zip(
+            targets[keep].tolist(), (lengths[keep] * EARTH_RADIUS_KM).tolist()
+        ):
+            yield ChargerLink(source=source, target=target, distance=distance)
+
+
+def chargerCoords(chargers) -> tuple[np.ndarray, np.ndarray]:
+    rows = list(chargers.values_list("id", "latitud", "longitud"))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    coords = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 2)
+    return ids, coords
+
+
+def rebuildChargerLinks() -> int:
+    """
+    Replaces the links with those of the current chargers.
+
+    Returns:
+        int: The number of links.
+    """
+    ids, coords = chargerCoords(LocationCharger.objects.order_by("id"))
+    links = chargerLinks(ids, coords, settings.CHARGER_LINK_MAX_KM)
+    with transaction.atomic():
+        ChargerLink.objects.all().delete()
+        created = ChargerLink.objects.bulk_create(links, batch_size=LINKS_BATCH_SIZE)
+    logger.info("Charger links rebuilt, %d links between %d chargers", len(created), len(ids))
+    return len(created)
+
+
+def linkCharger(chargerId: int, latitude: float, longitude: float):
+    """
+    Replaces the links of a charger with the chargers at most CHARGER_LINK_MAX_KM away.
+    """
+    ids, coords = chargerCoords(LocationCharger.objects.exclude(id=chargerId))
+    distances = haversineDistances(coords, (latitude, longitude))
+    near = distances <= settings.CHARGER_LINK_MAX_KM
+    with transaction.atomic():
+        unlinkCharger(chargerId)
+        ChargerLink.objects.bulk_create(
+            (
+                ChargerLink(
+                    source=min(chargerId, other), target=max(chargerId, other), distance=distance
+                )
+                for other, distance in zip(ids[near].tolist(), distances[near].tolist())
+            ),
+            batch_size=LINKS_BATCH_SIZE,
+        )
+
+
+def unlinkCharger(chargerId: int):
+    ChargerLink.objects.filter(Q(source=chargerId) | Q(target=chargerId)).delete()
+
+
+class ChargerLinkGraph:
+    """
+    The stored links as an undirected CSR graph over the rows of a charger index, the links of
+    row i are indices[indptr[i]:indptr[i + 1]] with lengths in 'weights'.
+    """
+
+    def __init__(self, index: ChargerIndex, sources, targets, weights):
+        self.index = index
+        n = len(index)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        # both directions, sorted by source row
+        allSources = np.concatenate([sources, targets])
+        order = np.argsort(allSources, kind="stable")
+        self.indices = np.concatenate([targets, sources])[order]
+        self.weights = np.concatenate([weights, weights])[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(allSources, minlength=n), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def load(cls, index: ChargerIndex) -> "ChargerLinkGraph":
+        """
+        Loads the links between the chargers of the index, links of chargers the index does not
+        have are left out.
+        """
+        links = np.array(
+            ChargerLink.objects.values_list("source", "target", "distance"), dtype=np.float64
+        ).reshape(-1, 3)
+        sources = rowsOf(index, links[:, 0].astype(np.int64))
+        targets = rowsOf(index, links[:, 1].astype(np.int64))
+        known = (sources >= 0) & (targets >= 0)
+        logger.info("Charger link graph %d loaded with %d links", index.version, known.sum())
+        return cls(index, sources[known], targets[known], links[known, 2])
+
+    def route(
+        self,
+        origin: tuple[float, float],
+        destination: tuple[float, float],
+        autonomy: float,
+        chargerTypes: Iterable[str] | None = None,
+    ) -> list[int] | None:
+        """
+        Returns the rows of the chargers of the shortest path from the origin to the destination
+        without legs longer than the autonomy, None if there is no such path.
+
+        The origin and destination are not nodes of the graph, the search starts at the chargers
+        within the autonomy of the origin and ends at the ones within the autonomy of the
+        destination. It is an A* search with the great circle distance to the destination as
+        heuristic, which is also the length of the last leg.
+        """
+        n = len(self)
+        if n == 0:
+            return None
+
+        allowed = np.ones(n, dtype=bool)
+        if chargerTypes is not None:
+            allowed = self.index.hasTypes(np.arange(n), chargerTypes)
+
+        estimates = haversineDistances(self.index.coords, destination)
+        reachesEnd = allowed & (estimates <= autonomy)
+
+        costs = np.full(n, np.inf)
+        parents = np.full(n, -1, dtype=np.int64)
+        closed = np.zeros(n, dtype=bool)
+        startRows, startDistances = self.index.withinRadius(origin, autonomy, chargerTypes)
+        costs[startRows] = startDistances
+        queue = list(zip((startDistances + estimates[startRows]).tolist(), startRows.tolist()))
+        heapq.heapify(queue)
+
+        best, last = np.inf, -1
+        while queue:
+            estimate, node = heapq.heappop(queue)
+            # no path through the nodes left can be shorter
+            if estimate >= best:
+                break
+            if closed[node]:
+                continue
+            closed[node] = True
+
+            if reachesEnd[node] and costs[node] + estimates[node] < best:
+                best, last = costs[node] + estimates[node], node
+
+            begin, finish = self.indptr[node], self.indptr[node + 1]
+            neighbors = self.indices[begin:finish]
+            candidates = costs[node] + self.weights[begin:finish]
+            better = (
+                (self.weights[begin:finish] <= autonomy)
+                & allowed[neighbors]
+                & (candidates < costs[neighbors])
+            )
+            neighbors, candidates = neighbors[better], candidates[better]
+            costs[neighbors] = candidates
+            parents[neighbors] = node
+            for neighbor, cost in zip(
+                neighbors.tolist(), (candidates + estimates[neighbors]).tolist()
+            ):
+                heapq.heappush(queue, (cost, neighbor))
+
+        if last < 0:
+            return None
+
+        path = [last]
+        while parents[path[-1]] >= 0:
+            path.append(int(parents[path[-1]]))
+        path.reverse()
+        return path
+
+
+def rowsOf(index: ChargerIndex, ids: np.ndarray) -> np.ndarray:
+    """
+    Returns the rows of the charger ids in the index, -1 for the ids it does not have.
+    """
+    rows = np.searchsorted(index.ids, ids)
+    rows = np.minimum(rows, max(len(index) - 1, 0))
+    found = (index.ids[rows] == ids) if len(index) else np.zeros(len(ids), dtype=bool)
+    return np.where(found, rows, -1)
+
+
+_graph: ChargerLinkGraph | None = None
+_lock = Lock()
+
+
+def getChargerLinkGraph(index: ChargerIndex) -> ChargerLinkGraph:
+    """
+    Returns the link graph of this process for the charger index, loading it again if the
+    chargers dataset changed.
+    """
+    global _graph
+    with _lock:
+        if _graph is None or _graph.index is not index:
+            _graph = ChargerLinkGraph.load(index)
+        return _graph
+
+
+def invalidateChargerLinkGraph():
+    global _graph
+    with _lock:
+        _graph = None
@@ -0,0 +1,161 @@
+"""
+In-process road graph used by the local routing provider.
+
+The graph is stored as a compressed sparse row (CSR) adjacency in a .npz file with the arrays:
+- lat, lon: coordinates of the nodes in degrees.
+- indptr, indices: CSR adjacency, the edges of node i are indices[indptr[i]:indptr[i + 1]].
+- length: length of every edge in meters.
+- time: travel time of every edge in seconds.
+
+Use `manage.py buildroadgraph` to create it from a preprocessed OSM extract.
+"""
+
+import heapq
+from math import inf
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+
+class RoadGraph:
+    """
+    Road graph that answers fastest path queries with a bidirectional Dijkstra search.
+    """
+
+    def __init__(self, lat, lon, indptr, indices, length, time):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.time = np.asarray(time, dtype=np.float64)
+
+        # Reverse adjacency for the backward search, redges maps reversed edges to the original ones
+        n = len(self.lat)
+        self.tails = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        self.redges = np.argsort(self.indices, kind="stable")
+        self.rindices = self.tails[self.redges]
+        self.rindptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=n), out=self.rindptr[1:])
+
+        self.edgeIds = np.arange(len(self.indices), dtype=np.int64)
+        self.edgeTimes = self.time.tolist()  # plain floats are much faster to sum in the search
+        self.tree = BallTree(np.radians(np.column_stack([self.lat, self.lon])), metric="haversine")
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with np.load(path) as data:
+            return cls(
+                data["lat"],
+                data["lon"],
+                data["indptr"],
+                data["indices"],
+                data["length"],
+                data["time"],
+            )
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            lat=self.lat,
+            lon=self.lon,
+            indptr=self.indptr,
+            indices=self.indices,
+            length=self.length,
+            time=self.time,
+        )
+
+    def nearestNodes(self, points: list[tuple[float, float]]) -> list[int]:
+        """
+        Returns the nearest node of the graph to every point.
+        """
+        _, nodes = self.tree.query(np.radians(np.asarray(points, dtype=np.float64)), k=1)
+        return nodes[:, 0].tolist()
+
+    def shortestPath(self, source: int, target: int) -> list[int] | None:
+        """
+        Returns the fastest path between two nodes as a list of edge ids, None if the target is
+        not reachable.
+
+        Both searches advance the side with the lowest tentative time and stop once the sum of
+        the queue heads can't improve the best meeting point found.
+        """
+        if source == target:
+            return []
+
+        adjacency = [
+            (self.indptr, self.indices, self.edgeIds),
+            (self.rindptr, self.rindices, self.redges),
+        ]
+        distances: list[dict[int, float]] = [{source: 0.0}, {target: 0.0}]
+        parents: list[dict[int, int]] = [{}, {}]  # node -> edge id used to reach it
+        queues = [[(0.0, source)], [(0.0, target)]]
+        best = inf
+        meeting = -1
+
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            current, node = heapq.heappop(queues[side])
+            if current > distances[side][node]:
+                continue
+
+            indptr, indices, edges = adjacency[side]
+            start, end = indptr[node], indptr[node + 1]
+            for neighbor, edge in zip(indices[start:end].tolist(), edges[start:end].tolist()):
+                distance = current + self.edgeTimes[edge]
+                if distance < distances[side].get(neighbor, inf):
+                    distances[side][neighbor] = distance
+                    parents[side][neighbor] = edge
+                    heapq.heappush(queues[side], (distance, neighbor))
+
+                other = distances[1 - side].get(neighbor)
+                if other is not None and distances[side][neighbor] + other < best:
+                    best = distances[side][neighbor] + other
+                    meeting = neighbor
+
+        if meeting < 0:
+            return None
+
+        # forward half: walk the parents back to the source
+        path: list[int] = []
+        node = meeting
+        while node != source:
+            edge = parents[0][node]
+            path.append(edge)
+            node = int(self.tails[edge])
+        path.reverse()
+
+        # backward half: walk the parents to the target
+        node = meeting
+        while node != target:
+            edge = parents[1][node]
+            path.append(edge)
+            node = int(self.indices[edge])
+        return path
+
+    def route(self, points: list[tuple[float, float]]):
+        """
+        Returns the coordinates, length in meters and time in seconds of the fastest route
+        through all the points, None if a leg can't be routed.
+        """
+        nodes = self.nearestNodes(points)
+        edges: list[int] = []
+        for source, target in zip(nodes, nodes[1:]):
+            leg = self.shortestPath(source, target)
+            if leg is None:
+                return None
+            edges.extend(leg)
+
+        coords = [(self.lat[nodes[0]], self.lon[nodes[0]])]
+        for edge in edges:
+            head = self.indices[edge]
+            coords.append((self.lat[head], self.lon[head]))
+
+        return (
+            [(float(lat), float(lon)) for lat, lon in coords],
+            float(self.length[edges].sum()),
+            float(self.time[edges].sum()),
+        )
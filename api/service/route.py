@@ -1,184 +1,371 @@
+import asyncio
 import json
 import logging
-from typing import Union
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Iterable, Union
 
+import numpy as np
 import polyline
 import requests
-from api import GoogleMapsRouteClient
+from api.models import PlannerVariant, RoadLeg
 from api.serializers import CreateRouteSerializer, PreviewRouteSerializer
-from api.service.dijkstra import dijkstra
+from api.service.cache import chargersPlanCache, chargersPlanKey, routeCache
+from api.service.chargers import ChargerIndex, getChargerIndex
+from api.service.geo import haversinePairs
 from api.service.kPowerFinder import kPowerFinder
-from common.models.charger import ChargerLocationType, LocationCharger
+from api.service.providers import NoRouteFound, getRouteProvider
+from api.service.reachability import getChargerLinkGraph
+from api.service.shortestpath import sparseShortestPath
+from api.service.speculative import PLANNER_VARIANTS, planVariant
+from api.service.singleflight import SingleFlight
 from common.models.route import Route
 from common.models.user import Driver, User
 
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+
 # Dont remove, it is use for migrate well
 from django.utils import timezone
 from geopy.distance import distance
-from google.maps.routing_v2 import ComputeRoutesRequest, ComputeRoutesResponse
-from google.maps.routing_v2 import Route as GRoute
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import ValidationError
 
-X_GOOGLE_FIELDS = (
-    "x-goog-fieldmask",
-    "routes.distanceMeters,routes.duration,routes.polyline.encodedPolyline",
+logger = logging.getLogger(__name__)
+
+# Bounded pool for the chargers selection (database and CPU bound) of the async path
+plannerExecutor = ThreadPoolExecutor(
+    max_workers=settings.ROUTE_PLANNER_WORKERS, thread_name_prefix="planner"
 )
+# Identical route plans in flight are computed once
+routeFlight = SingleFlight()
+# Processes of the speculative planning, started on first use
+variantExecutor: ProcessPoolExecutor | None = None
+variantExecutorLock = Lock()
+# variant plans submitted to the pool and not finished yet, including those no longer waited for
+variantFutures: set[Future] = set()
 
-from rest_framework.exceptions import APIException
 
+def computeMapsRoute(serializer: Union[PreviewRouteSerializer, CreateRouteSerializer]):
+    """
+    Computes the route using the routing provider based on the provided serializer.
+
+    Args:
+        serializer (Union[CreatePreviewRouteSerializer, CreateRouteSerializer]): The serializer object containing the route information.
 
-class NoRouteFound(APIException):
-    status_code = 404
-    default_detail = "No routes found"
-    default_code = "no_routes_found"
+    Returns:
+        The deserialized response from the routing provider.
+    """
+    return computeMapsRoutePath(buildRouteEndpoints(serializer))
 
 
-def buildMapsRouteRequest(
-    serializer: Union[PreviewRouteSerializer, CreateRouteSerializer]
-) -> ComputeRoutesRequest:
+def buildRouteEndpoints(serializer: Union[PreviewRouteSerializer, CreateRouteSerializer]):
     """
-    Creates a ComputeRoutesRequest object based on the passed data.
+    Returns the origin and destination of the serializer as a path.
 
-    Returns:
-        ComputeRoutesRequest: The created ComputeRoutesRequest object.
-    """
-    mapping = {
-        "origin": {
-            "location": {
-                "lat_lng": {
-                    "latitude": serializer.validated_data.get("originLat"),  # type: ignore
-                    "longitude": serializer.validated_data.get("originLon"),  # type: ignore
-                }
-            }
+    Args:
+        serializer (Union[CreatePreviewRouteSerializer, CreateRouteSerializer]): The serializer object containing the route information.
+    """
+    return [
+        {
+            "charger": "origin",
+            "latitude": serializer.validated_data.get("originLat"),  # type: ignore
+            "longitude": serializer.validated_data.get("originLon"),  # type: ignore
         },
-        "destination": {
-            "location": {
-                "lat_lng": {
-                    "latitude": serializer.validated_data.get("destinationLat"),  # type: ignore
-                    "longitude": serializer.validated_data.get("destinationLon"),  # type: ignore
-                }
-            }
+        {
+            "charger": "destination",
+            "latitude": serializer.validated_data.get("destinationLat"),  # type: ignore
+            "longitude": serializer.validated_data.get("destinationLon"),  # type: ignore
         },
-    }
-    computeRoutesRequest = ComputeRoutesRequest(mapping)
-    return computeRoutesRequest
+    ]
 
 
-def deserializeMapsRoutesResponse(mapsRoute: ComputeRoutesResponse):
+def computeMapsRoutePath(path: list[dict[str, Union[str, float]]]):
     """
-    Derializes a ComputeRoutesResponse object into the serializer.
+    Computes the route that goes through all the points of the path, the first and last points
+    are the origin and destination. Results are cached by their quantized coordinates so the same
+    trip does not hit the routing provider again, and the legs returned by the provider are
+    recorded as RoadLeg.
 
     Args:
-        response (ComputeRoutesResponse): The ComputeRoutesResponse object to serialize.
+        path (list): The points of the route, each one with a 'latitude' and 'longitude'.
+
+    Returns:
+        dict: The route polyline, duration and distance.
     """
-    assert isinstance(mapsRoute, ComputeRoutesResponse), "Wrong type for response parameter"
+    points = [(point["latitude"], point["longitude"]) for point in path]
+    routeData = routeCache.get(points)
+    if routeData is not None:
+        return routeData
 
-    if not mapsRoute.routes:
-        raise NoRouteFound()
+    if settings.ROUTE_LEG_REUSE:
+        routeData = RoadLeg.assemble(path)
+    if routeData is None:
+        routeData = getRouteProvider().computeRoute(path)
+        legs = routeData.pop("legs", None)
+        if legs:
+            RoadLeg.record(path, legs)
 
-    route: GRoute = mapsRoute.routes[0]
-    return {
-        "polyline": route.polyline.encoded_polyline,
-        "duration": route.duration.seconds,
-        "distance": route.distance_meters,
-    }
+    routeCache.set(points, routeData)
+    return routeData
 
 
-def computeMapsRoute(serializer: Union[PreviewRouteSerializer, CreateRouteSerializer]):
+async def acomputeMapsRoutePath(path: list[dict[str, Union[str, float]]]):
     """
-    Computes the route using the Google Maps API based on the provided serializer.
+    Async version of computeMapsRoutePath, with the Google provider it uses the gRPC asyncio client
+    so the event loop can keep many Google Maps requests in flight.
 
     Args:
-        serializer (Union[CreatePreviewRouteSerializer, CreateRouteSerializer]): The serializer object containing the route information.
+        path (list): The points of the route, each one with a 'latitude' and 'longitude'.
 
     Returns:
-        The deserialized response from the Google Maps API.
+        dict: The route polyline, duration and distance.
     """
-    mapsPayload = buildMapsRouteRequest(serializer)
+    points = [(point["latitude"], point["longitude"]) for point in path]
+    routeData = await routeCache.aget(points)
+    if routeData is not None:
+        return routeData
 
-    # Initialize request argument(s)
-    request = ComputeRoutesRequest(mapping=mapsPayload)
-    response = GoogleMapsRouteClient.compute_routes(request=request, metadata=[X_GOOGLE_FIELDS])
+    if settings.ROUTE_LEG_REUSE:
+        routeData = await sync_to_async(RoadLeg.assemble)(path)
+    if routeData is None:
+        routeData = await getRouteProvider().acomputeRoute(path)
+        legs = routeData.pop("legs", None)
+        if legs:
+            await sync_to_async(RoadLeg.record)(path, legs)
 
-    # Deserialize the response from the Google Maps API and send it back to the client
-    return deserializeMapsRoutesResponse(response)
+    await routeCache.aset(points, routeData)
+    return routeData
 
 
-def buildMapsRouteRequestChargers(path: list[dict[str, Union[str, float]]]):
+async def aestimateRoute(endpoints: list[dict]):
     """
-    Creates a payload for the Google Maps API.
+    Returns an approximate route between the endpoints without calling the routing provider, for
+    when it is not available: the cached route if there is one, a straight line otherwise.
 
     Args:
-        path (list): The path from the Dijkstra's algorithm.
-        origin (str): The origin.
-        destination (str): The destination.
-    """
+        endpoints (list): The origin and destination, with 'latitude' and 'longitude'.
 
-    # Remove the origin and destination from the path
-    waypoints = path[1:-1]
-    origin = path[0]
-    destination = path[-1]
+    Returns:
+        dict: The route polyline, duration and distance.
+    """
+    points = [(float(point["latitude"]), float(point["longitude"])) for point in endpoints]
+    routeData = await routeCache.aget(points)
+    if routeData is not None:
+        return routeData
+    return estimateStraightRoute(points)
 
-    # Format the waypoints into a string
-    # waypoints_str = '|'.join(waypoints)
-    intermediates = []
-    for point in waypoints:
-        intermediates.append(
-            {
-                "location": {
-                    "lat_lng": {
-                        "latitude": point["latitude"],
-                        "longitude": point["longitude"],
-                    }
-                }
-            }
-        )
 
-    mapping = {
-        "origin": {
-            "location": {
-                "lat_lng": {
-                    "latitude": origin["latitude"],
-                    "longitude": origin["longitude"],
-                }
-            }
-        },
-        "destination": {
-            "location": {
-                "lat_lng": {
-                    "latitude": destination["latitude"],
-                    "longitude": destination["longitude"],
-                }
-            }
-        },
-        "intermediates": [],
+def estimateStraightRoute(points: list[tuple[float, float]]):
+    """
+    Estimates the route that joins the points with straight lines, its length is increased by
+    ROUTE_DETOUR_FACTOR to account for the roads and its duration uses ROUTE_ESTIMATE_SPEED.
+    """
+    length = sum(distance(a, b).km for a, b in zip(points, points[1:]))
+    length *= settings.ROUTE_DETOUR_FACTOR
+    return {
+        "polyline": polyline.encode(points),
+        "duration": round(length / settings.ROUTE_ESTIMATE_SPEED * 3600),
+        "distance": round(length * 1000),
     }
-    mapping["intermediates"] = intermediates
-    computeRoutesRequest = ComputeRoutesRequest(mapping)
-    return computeRoutesRequest
 
 
 def computeOptimizedRoute(
     serializer: Union[PreviewRouteSerializer, CreateRouteSerializer], driverId: int
 ):
     """
-    Creates a ComputeOptimizedRoutesRequest object based on the passed data.
+    Computes the route between the origin and destination of the serializer adding the chargers
+    the driver needs to reach the destination. Identical plans being computed at the same time
+    are only computed once, see planningKey.
 
     Returns:
-        ComputeOptimizedRoutesRequest: The created ComputeOptimizedRoutesRequest object.
+        tuple[dict, list]: The route polyline, duration and distance, and the chargers of the route.
+    """
+    endpoints = buildRouteEndpoints(serializer)
+    autonomy, chargerTypes = getDriverPlanningProfile(driverId)
+    key = planningKey(endpoints, autonomy, chargerTypes)
+    leader = []
+
+    def plan():
+        leader.append(True)
+        try:
+            return planOptimizedRoute(endpoints, autonomy, chargerTypes)
+        except NoRouteFound as exc:
+            exc.autonomy = autonomy
+            raise
+
+    try:
+        routeData, waypoints = routeFlight.do(key, plan)
+    except NoRouteFound as exc:
+        # the leader may have had less autonomy
+        if leader or exc.autonomy >= autonomy:
+            raise
+        return planOptimizedRoute(endpoints, autonomy, chargerTypes)
+
+    if not leader and not planFits(endpoints, waypoints, autonomy):
+        return planOptimizedRoute(endpoints, autonomy, chargerTypes)
+    return routeData, waypoints
+
+
+def planOptimizedRoute(endpoints: list[dict], autonomy: int, chargerTypes: list[str]):
+    directRoute = computeMapsRoutePath(endpoints)
+    finalRoute = computeChargersPath(
+        polyline.decode(directRoute["polyline"]), autonomy, chargerTypes
+    )
+
+    # Without chargers in between the direct route is already the final one
+    routeData = computeMapsRoutePath(finalRoute) if len(finalRoute) > 2 else directRoute
+    waypoints = finalRoute[1:-1]
+    return routeData, waypoints
+
+
+async def acomputeOptimizedRoute(
+    serializer: Union[PreviewRouteSerializer, CreateRouteSerializer], driverId: int
+):
+    """
+    Async version of computeOptimizedRoute. The routing requests are awaited and the chargers
+    selection runs in the planner pool.
+
+    Returns:
+        tuple[dict, list]: The route polyline, duration and distance, and the chargers of the route.
+    """
+    endpoints = buildRouteEndpoints(serializer)
+    autonomy, chargerTypes = await sync_to_async(getDriverPlanningProfile)(driverId)
+    key = planningKey(endpoints, autonomy, chargerTypes)
+    leader = []
+
+    async def plan():
+        leader.append(True)
+        try:
+            return await aplanOptimizedRoute(endpoints, autonomy, chargerTypes)
+        except NoRouteFound as exc:
+            exc.autonomy = autonomy
+            raise
+
+    try:
+        routeData, waypoints = await routeFlight.ado(key, plan)
+    except NoRouteFound as exc:
+        if leader or exc.autonomy >= autonomy:
+            raise
+        return await aplanOptimizedRoute(endpoints, autonomy, chargerTypes)
+
+    if not leader and not planFits(endpoints, waypoints, autonomy):
+        return await aplanOptimizedRoute(endpoints, autonomy, chargerTypes)
+    return routeData, waypoints
+
+
+async def aplanOptimizedRoute(endpoints: list[dict], autonomy: int, chargerTypes: list[str]):
+    directRoute = await acomputeMapsRoutePath(endpoints)
+    finalRoute = await sync_to_async(
+        computeChargersPathInWorker, thread_sensitive=False, executor=plannerExecutor
+    )(polyline.decode(directRoute["polyline"]), autonomy, chargerTypes)
+
+    routeData = await acomputeMapsRoutePath(finalRoute) if len(finalRoute) > 2 else directRoute
+    waypoints = finalRoute[1:-1]
+    return routeData, waypoints
+
+
+def getDriverPlanningProfile(driverId: int) -> tuple[int, list[str]]:
+    """
+    Returns the autonomy and charger types the route of the driver is planned with.
+
+    Args:
+        driverId (int): The driver of the route.
+    """
+    driver = Driver.objects.get(id=driverId)
+    chargerTypes = sorted(driver.chargerTypes.values_list("chargerType", flat=True))
+    return driver.autonomy, chargerTypes
+
+
+def planningKey(endpoints: list[dict], autonomy: int, chargerTypes: list[str]) -> str:
+    """
+    Returns the key that identifies the plan of a route, routes with the same key being planned
+    at the same time share the plan. The autonomy is rounded down to ROUTE_AUTONOMY_BUCKET
+    kilometers so drivers with similar cars share plans, see planFits.
+    """
+    bucket = settings.ROUTE_AUTONOMY_BUCKET
+    if autonomy >= bucket:
+        autonomy -= autonomy % bucket
+    points = routeCache.key((point["latitude"], point["longitude"]) for point in endpoints)
+    return f"{points}:{autonomy}:{','.join(chargerTypes)}"
+
+
+def planFits(endpoints: list[dict], waypoints: list[dict], autonomy: float) -> bool:
+    """
+    Returns whether a plan shared by another driver of the same planningKey is the one the
+    autonomy would get: every leg is within the autonomy and there are no chargers when the
+    destination is within it.
+    """
+    path = [endpoints[0], *waypoints, endpoints[-1]]
+    points = np.array([(point["latitude"], point["longitude"]) for point in path], dtype=float)
+    if waypoints and distance(points[0], points[-1]).km <= autonomy:
+        return False
+    return bool((haversinePairs(points[:-1], points[1:]) <= autonomy).all())
+
+
+async def acomputeOptimizedRoutes(
+    serializers: list[Union[PreviewRouteSerializer, CreateRouteSerializer]], driverId: int
+):
+    """
+    Computes the routes of all the serializers concurrently. Identical origin and destination
+    pairs are only computed once and at most ROUTE_BATCH_CONCURRENCY routes are computed at the
+    same time.
+
+    Returns:
+        list[tuple[dict, list] | Exception]: The result of every serializer, in the same order,
+            or the exception raised while computing it.
+    """
+    semaphore = asyncio.Semaphore(settings.ROUTE_BATCH_CONCURRENCY)
+
+    async def compute(serializer):
+        async with semaphore:
+            return await acomputeOptimizedRoute(serializer, driverId)
+
+    # Group the serializers by their quantized endpoints
+    keys = []
+    unique = {}
+    for serializer in serializers:
+        endpoints = buildRouteEndpoints(serializer)
+        key = routeCache.key((point["latitude"], point["longitude"]) for point in endpoints)
+        keys.append(key)
+        unique.setdefault(key, serializer)
+
+    results = await asyncio.gather(
+        *(compute(serializer) for serializer in unique.values()), return_exceptions=True
+    )
+    resultByKey = dict(zip(unique.keys(), results))
+    return [resultByKey[key] for key in keys]
+
+
+def computeChargersPathInWorker(
+    decodedPolyline: list[tuple[float, float]], autonomy: int, chargerTypes: list[str]
+):
     """
-    # Refactor to outside method
-    mapsPayload = buildMapsRouteRequest(serializer)
-    request = ComputeRoutesRequest(mapping=mapsPayload)
-    response = GoogleMapsRouteClient.compute_routes(request=request, metadata=[X_GOOGLE_FIELDS])
+    Runs computeChargersPath in a planner worker, the database connection the worker opened is
+    closed afterwards as no request lifecycle will do it.
+    """
+    try:
+        return computeChargersPath(decodedPolyline, autonomy, chargerTypes)
+    finally:
+        close_old_connections()
 
-    # Decode the polyline
-    decodedPolyline = polyline.decode(response.routes[0].polyline.encoded_polyline)
 
-    user = Driver.objects.get(id=driverId)
-    autonomy = user.autonomy
+def computeChargersPath(
+    decodedPolyline: list[tuple[float, float]], autonomy: int, chargerTypes: list[str]
+):
+    """
+    Returns the path from the origin to the destination of the polyline going through the
+    chargers the driver needs to stop at.
 
+    Args:
+        decodedPolyline (list): The decoded polyline of the direct route.
+        autonomy (int): The autonomy of the driver in kilometers.
+        chargerTypes (list): The charger types the driver can use.
+    """
     finalRoute: list[dict[str, str | float]] = []
     origin_to_destination_distance = distance(decodedPolyline[0], decodedPolyline[-1]).km
 
@@ -197,30 +384,103 @@ def computeOptimizedRoute(
             },
         ]
 
+    elif settings.CHARGER_PLAN_CACHE:
+        finalRoute = cachedChargersPath(decodedPolyline, autonomy, chargerTypes)
+
     else:
-        # Get route bounds
-        bounds = getRouteBounds(decodedPolyline)
+        finalRoute = selectChargersPath(decodedPolyline, autonomy, chargerTypes)
 
-        # Convert ManyToManyRelatedManager to list
-        driverChargerTypes = list(user.chargerTypes.all())
-        chargersInArea = calculateChargerPoints(bounds, driverChargerTypes)
+    return finalRoute
 
-        # Create list with possible route points
-        # [0] is origin, [-1] is destination
-        potentialWaypoints = {"origin": decodedPolyline[0]}
-        for charger in chargersInArea:
-            potentialWaypoints[f"{charger['id']}"] = (charger["latitud"], charger["longitud"])
-        potentialWaypoints["destination"] = decodedPolyline[-1]
 
-        finalRoute = computeChargersRoute(potentialWaypoints, autonomy)
+def cachedChargersPath(
+    decodedPolyline: list[tuple[float, float]], autonomy: int, chargerTypes: list[str]
+):
+    """
+    Returns the chargers path of the trip planned for a similar one (see chargersPlanKey) if the
+    driver can drive it, otherwise plans it with the autonomy rounded down to
+    CHARGER_PLAN_AUTONOMY_BAND km, so it can be shared by every driver of the band. Trips the band
+    can't plan are planned with the autonomy of the driver.
 
-    mapsPayload = buildMapsRouteRequestChargers(finalRoute)
-    request = ComputeRoutesRequest(mapping=mapsPayload)
-    response = GoogleMapsRouteClient.compute_routes(request=request, metadata=[X_GOOGLE_FIELDS])
+    Args:
+        decodedPolyline (list): The decoded polyline of the direct route.
+        autonomy (int): The autonomy of the driver in kilometers, not rounded.
+        chargerTypes (list): The charger types the driver can use.
+    """
+    origin, destination = tuple(decodedPolyline[0]), tuple(decodedPolyline[-1])
+    band = settings.CHARGER_PLAN_AUTONOMY_BAND
+    bandAutonomy = autonomy - autonomy % band if autonomy >= band else autonomy
+    key = chargersPlanKey(
+        origin, destination, bandAutonomy, chargerTypes, getChargerIndex().version
+    )
 
-    routeData = deserializeMapsRoutesResponse(response)
-    waypoints = finalRoute[1:-1]
-    return routeData, waypoints
+    chargers = chargersPlanCache.lookup(key)
+    if chargers is not None:
+        path = chargersPathThrough(origin, destination, chargers)
+        points = np.array([(point["latitude"], point["longitude"]) for point in path])
+        if (haversinePairs(points[:-1], points[1:]) <= autonomy).all():
+            return path
+        logger.debug("cached chargers plan %s is out of reach", key)
+
+    try:
+        path = selectChargersPath(decodedPolyline, bandAutonomy, chargerTypes)
+    except NoRouteFound:
+        if bandAutonomy == autonomy:
+            raise
+        return selectChargersPath(decodedPolyline, autonomy, chargerTypes)
+
+    chargersPlanCache.store(
+        key, [(point["charger"], point["latitude"], point["longitude"]) for point in path[1:-1]]
+    )
+    return path
+
+
+def chargersPathThrough(
+    origin: tuple[float, float], destination: tuple[float, float], chargers: Iterable[tuple]
+):
+    """
+    Returns the path from the origin to the destination through the (id, latitude, longitude)
+    of the chargers.
+    """
+    return [
+        {"charger": "origin", "latitude": origin[0], "longitude": origin[1]},
+        *(
+            {"charger": chargerId, "latitude": lat, "longitude": lon}
+            for chargerId, lat, lon in chargers
+        ),
+        {"charger": "destination", "latitude": destination[0], "longitude": destination[1]},
+    ]
+
+
+def selectChargersPath(
+    decodedPolyline: list[tuple[float, float]], autonomy: int, chargerTypes: list[str]
+):
+    """
+    Plans the chargers path of the trip with the planner of CHARGER_PLANNER_MODE.
+    """
+    if settings.CHARGER_PLANNER_MODE == "links" and autonomy <= settings.CHARGER_LINK_MAX_KM:
+        return computeLinkedChargersRoute(
+            decodedPolyline[0], decodedPolyline[-1], autonomy, chargerTypes
+        )
+
+    if settings.CHARGER_SELECTION_MODE == "corridor":
+        chargersInArea = calculateCorridorChargerPoints(decodedPolyline, chargerTypes)
+    else:
+        # Get route bounds
+        bounds = getRouteBounds(decodedPolyline)
+
+        chargersInArea = calculateChargerPoints(bounds, chargerTypes)
+
+    # Create list with possible route points
+    # [0] is origin, [-1] is destination
+    potentialWaypoints = {"origin": decodedPolyline[0]}
+    for charger in chargersInArea:
+        potentialWaypoints[charger["id"]] = (charger["latitud"], charger["longitud"])
+    potentialWaypoints["destination"] = decodedPolyline[-1]
+
+    if settings.CHARGER_SPECULATIVE_PLANNING:
+        return speculativeChargersRoute(potentialWaypoints, autonomy)
+    return computeChargersRoute(potentialWaypoints, autonomy)
 
 
 def getRouteBounds(decodedPolyline: list):
@@ -252,32 +512,48 @@ def calculateChargerPoints(bounds: dict, chargerTypes: list):
 
     Args:
         bounds (dict): The bounds of the route.
+        chargerTypes (list): The connection types the chargers must have (any of them).
     """
-    try:
-        chargerTypeObjs = ChargerLocationType.objects.filter(chargerType__in=chargerTypes)
-    except ChargerLocationType.DoesNotExist:
-        raise APIException()
-    # Get the charger points
-    chargerPoints = LocationCharger.objects.filter(
-        connectionType__in=chargerTypeObjs,
-        latitud__gte=bounds["southwest"][0],
-        latitud__lte=bounds["northeast"][0],
-        longitud__gte=bounds["southwest"][1],
-        longitud__lte=bounds["northeast"][1],
-    ).values()
-    return list(chargerPoints)
+    index = getChargerIndex()
+    rows = index.inBounds(bounds["southwest"], bounds["northeast"], chargerTypes)
+    return chargerPoints(index, rows)
+
 
+def calculateCorridorChargerPoints(decodedPolyline: list, chargerTypes: list):
+    """
+    Returns the charger points at most CHARGER_CORRIDOR_BUFFER_KM away from the route.
 
-def vectDistance(point1: list[float], point2: list[float]):
-    return distance(list(point1), list(point2)).kilometers
+    Args:
+        decodedPolyline (list): The decoded polyline of the route.
+        chargerTypes (list): The connection types the chargers must have (any of them).
+    """
+    index = getChargerIndex()
+    rows = index.inCorridor(decodedPolyline, settings.CHARGER_CORRIDOR_BUFFER_KM, chargerTypes)
+    return chargerPoints(index, rows)
 
 
-def computeChargersRoute(routePoints: dict[str, tuple[float, float]], autonomy: float):
+def chargerPoints(index: ChargerIndex, rows) -> list[dict]:
+    return [
+        {"id": chargerId, "latitud": lat, "longitud": lon}
+        for chargerId, lat, lon in zip(
+            index.ids[rows].tolist(), index.lat[rows].tolist(), index.lon[rows].tolist()
+        )
+    ]
+
+
+def computeChargersRoute(
+    routePoints: dict[int | str, tuple[float, float]],
+    autonomy: float,
+    legDistances: dict[tuple[int | str, int | str], float] | None = None,
+):
     """
     Returns the possible routes based on the charger points.
 
     Args:
-        routePoints (dict): The route points.
+        routePoints (dict): The route points, the chargers keyed by their id plus the 'origin'
+            and 'destination'.
+        legDistances (dict, optional): The road distances of the known legs between the route
+            points, queried from RoadLeg if not given.
     """
     # Dijkstra candidate points and a distance matrix between them
     try:
@@ -288,33 +564,26 @@ def computeChargersRoute(routePoints: dict[str, tuple[float, float]], autonomy:
     except ValueError:
         raise NoRouteFound("Destination is unreachable")
 
-    # Label the charger points with it's ID
-    labeledChargers: dict[str, tuple[float, float]] = {}
-    for coord in filteredRoutePoints:
-        # get the charger id from db and add it to the dict
-        try:
-            chargerInstance = LocationCharger.objects.filter(
-                latitud=coord[0], longitud=coord[1]
-            ).first()
-            if not chargerInstance:
-                raise LocationCharger.DoesNotExist
-        except LocationCharger.DoesNotExist:
-            raise APIException()  # and it should exist
-
-        labeledChargers[chargerInstance.pk] = coord
+    # The candidates are labeled with their charger id
+    labeledChargers: dict[int | str, tuple[float, float]] = dict(filteredRoutePoints)
 
     # Add the origin and destination to the dict
     labeledChargers["origin"] = routePoints["origin"]
     labeledChargers["destination"] = routePoints["destination"]
 
-    # We get the distances between the points
-    labeledDistances: dict[str, dict[str, float]] = {}
-    for key1, value1 in labeledChargers.items():
-        labeledDistances[key1] = {}
-        for key2, value2 in labeledChargers.items():
-            labeledDistances[key1][key2] = distance(value1, value2).kilometers
-
-    finalPoints = dijkstra(labeledDistances, "origin", "destination", autonomy)
+    # Shortest path through the legs within the autonomy, by road where it is known
+    if legDistances is None:
+        legDistances = knownLegDistances(labeledChargers)
+    finalPoints = sparseShortestPath(
+        labeledChargers,
+        "origin",
+        "destination",
+        autonomy,
+        heuristic=settings.CHARGER_PATH_HEURISTIC,
+        legDistances=legDistances,
+    )
+    if not finalPoints:
+        raise NoRouteFound("Destination is unreachable")
 
     path: list[dict[str, str | float]] = []
     for point in finalPoints:
@@ -328,6 +597,161 @@ def computeChargersRoute(routePoints: dict[str, tuple[float, float]], autonomy:
     return path
 
 
+def getVariantExecutor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool of the speculative planner, creating it on first use.
+
+    The workers are started by a forkserver, forking the multithreaded server would copy the
+    state of its threads and gRPC channels into them, and they are replaced after
+    CHARGER_SPECULATIVE_TASKS_PER_PROCESS plans.
+    """
+    global variantExecutor
+    with variantExecutorLock:
+        if variantExecutor is None:
+            variantExecutor = ProcessPoolExecutor(
+                max_workers=settings.CHARGER_SPECULATIVE_PROCESSES,
+                mp_context=multiprocessing.get_context("forkserver"),
+                max_tasks_per_child=settings.CHARGER_SPECULATIVE_TASKS_PER_PROCESS,
+            )
+        return variantExecutor
+
+
+def submitVariants(routePoints: dict[int | str, tuple[float, float]], autonomy: float):
+    """
+    Submits the plans of every variant to the pool, or returns None when the pool already has
+    CHARGER_SPECULATIVE_MAX_PENDING plans pending, as variants that missed the deadline keep
+    running until they finish.
+    """
+    with variantExecutorLock:
+        variantFutures.difference_update([future for future in variantFutures if future.done()])
+        if len(variantFutures) >= settings.CHARGER_SPECULATIVE_MAX_PENDING:
+            return None
+
+    futures = [
+        getVariantExecutor().submit(
+            planVariant, variant, routePoints, autonomy, settings.CHARGER_PATH_HEURISTIC
+        )
+        for variant in PLANNER_VARIANTS
+    ]
+    with variantExecutorLock:
+        variantFutures.update(futures)
+    return futures
+
+
+def speculativeChargersRoute(routePoints: dict[int | str, tuple[float, float]], autonomy: float):
+    """
+    Returns the chargers route of computeChargersRoute planned with every kPowerFinder variant
+    of PLANNER_VARIANTS in parallel.
+
+    The shortest path found within CHARGER_SPECULATIVE_DEADLINE seconds is returned, or the first
+    one found with CHARGER_SPECULATIVE_PICK="first"; variants still running are not waited for.
+    If none was found by the deadline the default variant is waited for, as it would have been
+    without speculative planning, and when the pool is busy the route is planned with
+    computeChargersRoute. The variants that found a path and the one returned are recorded in
+    PlannerVariant.
+
+    Args:
+        routePoints (dict): The route points, the chargers keyed by their id plus the 'origin'
+            and 'destination'.
+    """
+    futures = submitVariants(routePoints, autonomy)
+    if futures is None:
+        logger.info("speculative planner pool is busy, planning with the default variant")
+        return computeChargersRoute(routePoints, autonomy)
+
+    plans: dict[str, tuple[list, float]] = {}
+    try:
+        for future in as_completed(futures, timeout=settings.CHARGER_SPECULATIVE_DEADLINE):
+            try:
+                variant, path, length = future.result()
+            except Exception:
+                logger.exception("speculative planner variant failed")
+                continue
+            if path:
+                plans[variant] = (path, length)
+                if settings.CHARGER_SPECULATIVE_PICK == "first":
+                    break
+    except FutureTimeoutError:
+        logger.info(
+            "speculative planning deadline reached, %d of %d variants found a route",
+            len(plans),
+            len(futures),
+        )
+    finally:
+        # the default variant is the first one, it is kept in case it is waited for
+        for future in futures[1:]:
+            future.cancel()
+
+    if not plans:
+        default = futures[0]
+        try:
+            variant, path, length = default.result()
+        except Exception:
+            logger.exception("speculative planner default variant failed")
+            return computeChargersRoute(routePoints, autonomy)
+        if not path:
+            raise NoRouteFound("Destination is unreachable")
+        plans[variant] = (path, length)
+    else:
+        futures[0].cancel()
+
+    # ties go to the variant listed first
+    winner = min(
+        (variant for variant in PLANNER_VARIANTS if variant in plans),
+        key=lambda variant: plans[variant][1],
+    )
+    PlannerVariant.record(plans, winner)
+    logger.info("speculative planning picked %s out of %s", winner, sorted(plans))
+    return [
+        {"charger": point, "latitude": routePoints[point][0], "longitude": routePoints[point][1]}
+        for point in plans[winner][0]
+    ]
+
+
+def computeLinkedChargersRoute(
+    origin: tuple[float, float],
+    destination: tuple[float, float],
+    autonomy: float,
+    chargerTypes: list[str],
+):
+    """
+    Returns the path from the origin to the destination through the reachability graph of the
+    chargers.
+
+    Args:
+        origin (tuple): The coordinates of the origin.
+        destination (tuple): The coordinates of the destination.
+        autonomy (float): The autonomy in kilometers.
+        chargerTypes (list): The connection types the chargers must have (any of them).
+    """
+    index = getChargerIndex()
+    rows = getChargerLinkGraph(index).route(origin, destination, autonomy, chargerTypes)
+    if rows is None:
+        raise NoRouteFound("Destination is unreachable")
+
+    return chargersPathThrough(
+        origin,
+        destination,
+        zip(index.ids[rows].tolist(), index.lat[rows].tolist(), index.lon[rows].tolist()),
+    )
+
+
+def knownLegDistances(
+    points: dict[int | str, tuple[float, float]],
+) -> dict[tuple[int | str, int | str], float]:
+    """
+    Returns the road distance in kilometers of the known legs between the labeled points.
+    """
+    labels = {
+        RoadLeg.pointKey({"charger": label, "latitude": lat, "longitude": lon}): label
+        for label, (lat, lon) in points.items()
+    }
+    return {
+        (labels[origin], labels[destination]): km
+        for (origin, destination), km in RoadLeg.knownDistances(labels).items()
+    }
+
+
 def validateJoinRoute(routeId: int, passengerId: int):
     """
     Validates if a user can join a route.
@@ -1,12 +1,119 @@
-from django.db.models import Q, FloatField, Value, Case, When
+import base64
+import binascii
+import json
+import math
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import Q, F, FloatField, Value, ExpressionWrapper
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from django.utils.dateparse import parse_datetime
 from django_filters import FilterSet
 from common.models.route import Route
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from datetime import datetime, timedelta
-from haversine import haversine, Unit
 
 from django_filters import CharFilter
 
+from api.models import RouteCell
+from api.service.geo import EARTH_RADIUS_KM, geohashCells
+
+# Cells looked up around a point at most, larger radiuses are filtered with the bounding box
+MAX_SEARCH_CELLS = 256
+
+
+def haversineDistance(latField: str, lonField: str, lat: float, lon: float):
+    """
+    Returns the SQL expression of the great circle distance in kilometers between the point of
+    the latField and lonField columns and (lat, lon).
+    """
+    h = Power(Sin(Radians(F(latField) - lat) / 2), 2) + Cos(Radians(F(latField))) * math.cos(
+        math.radians(lat)
+    ) * Power(Sin(Radians(F(lonField) - lon) / 2), 2)
+    # rounding can take h slightly above 1 for antipodal points
+    return ExpressionWrapper(
+        2 * EARTH_RADIUS_KM * ASin(Sqrt(Least(h, Value(1.0)))), output_field=FloatField()
+    )
+
+
+def radiusBounds(
+    lat: float, lon: float, radius: float
+) -> tuple[tuple[float, float], tuple[float, float] | None]:
+    """
+    Returns the latitude and longitude ranges of the bounding box of the points within the radius
+    (in kilometers) of (lat, lon). The longitude range is None near the poles or if the box
+    crosses the antimeridian.
+    """
+    angle = radius / EARTH_RADIUS_KM
+    dLat = math.degrees(angle)
+    latRange = (lat - dLat, lat + dLat)
+    if abs(lat) + dLat < 90 and math.sin(angle) < math.cos(math.radians(lat)):
+        dLon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+        if -180 <= lon - dLon and lon + dLon <= 180:
+            return latRange, (lon - dLon, lon + dLon)
+    return latRange, None
+
+
+def boundingBox(latField: str, lonField: str, lat: float, lon: float, radius: float) -> Q:
+    """
+    Returns the condition of the columns being inside the bounding box of the points within the
+    radius (in kilometers) of (lat, lon), which can be checked with an index on the columns.
+    """
+    latRange, lonRange = radiusBounds(lat, lon, radius)
+    condition = Q(**{f"{latField}__range": latRange})
+    if lonRange is not None:
+        condition &= Q(**{f"{lonField}__range": lonRange})
+    return condition
+
+
+def radiusCells(lat: float, lon: float, radius: float) -> list[str] | None:
+    """
+    Returns the geohash cells of ROUTE_CELL_PRECISION characters that cover the radius (in
+    kilometers) of (lat, lon), None if they are too many to look up or the longitude of the
+    radius is not bounded.
+    """
+    latRange, lonRange = radiusBounds(lat, lon, radius)
+    if lonRange is None:
+        return None
+    cells = geohashCells(
+        (latRange[0], lonRange[0]), (latRange[1], lonRange[1]), settings.ROUTE_CELL_PRECISION
+    )
+    return cells if len(cells) <= MAX_SEARCH_CELLS else None
+
+
+def statusFilter(include: Iterable[str]) -> Q:
+    """
+    Returns the condition of the active routes plus the 'cancelled' and 'finalized' ones if they
+    are included, as a single predicate on (cancelled, finalized).
+
+    Every (cancelled, finalized) pair the routes can have is kept or not, the pairs kept are
+    grouped by 'cancelled' so the condition is at most two equality prefixes of the
+    (cancelled, finalized, departureTime) index instead of an OR of every included status.
+    """
+    include = set(include)
+    kept = {
+        (cancelled, finalized)
+        for cancelled in (False, True)
+        for finalized in (False, True)
+        if (not cancelled and not finalized)
+        or (cancelled and "cancelled" in include)
+        or (finalized and "finalized" in include)
+    }
+    if len(kept) == 4:
+        return Q()
+
+    condition = Q()
+    for cancelled in (False, True):
+        finalized = [value for value in (False, True) if (cancelled, value) in kept]
+        if len(finalized) == 2:
+            condition |= Q(cancelled=cancelled)
+        elif finalized:
+            condition |= Q(cancelled=cancelled, finalized=finalized[0])
+    return condition
+
 
 class BaseRouteFilter(FilterSet):
     # Manually added fields to customize aspect and schema generation
@@ -59,54 +166,38 @@ class BaseRouteFilter(FilterSet):
     def location_filter(self, queryset, name, value):
         """
         The queryset is all the routes within the radius of the origin and destination coordinates.
+
+        Routes are filtered in the database, the bounding boxes of the radius around the origin
+        and destination leave out most routes with an index scan and the distances of the rest
+        are computed with the haversine formula in SQL. With ROUTE_CELL_SEARCH the routes are
+        first looked up by the geohash cells of the radius around both points in RouteCell.
         """
         origin_lat, origin_lon, dest_lat, dest_lon = map(float, value.split(","))
-        routes = list(queryset)
 
-        # Calculate the distance with haversine formula
-        filtered_routes = []
-        for route in routes:
-            originDistance = haversine(
-                (origin_lat, origin_lon), (route.originLat, route.originLon), unit=Unit.KILOMETERS
+        if settings.ROUTE_CELL_SEARCH:
+            originCells = radiusCells(origin_lat, origin_lon, self.radius)
+            destinationCells = radiusCells(dest_lat, dest_lon, self.radius)
+            if originCells is not None and destinationCells is not None:
+                queryset = queryset.filter(
+                    id__in=RouteCell.objects.filter(
+                        originCell__in=originCells, destinationCell__in=destinationCells
+                    ).values("routeId")
+                )
+
+        return (
+            queryset.filter(
+                boundingBox("originLat", "originLon", origin_lat, origin_lon, self.radius),
+                boundingBox("destinationLat", "destinationLon", dest_lat, dest_lon, self.radius),
             )
-            destinationDistance = haversine(
-                (dest_lat, dest_lon),
-                (route.destinationLat, route.destinationLon),
-                unit=Unit.KILOMETERS,
+            .annotate(
+                originDistance=haversineDistance("originLat", "originLon", origin_lat, origin_lon),
+                destinationDistance=haversineDistance(
+                    "destinationLat", "destinationLon", dest_lat, dest_lon
+                ),
             )
-            if originDistance <= self.radius and destinationDistance <= self.radius:
-                route.originDistance = originDistance
-                route.destinationDistance = destinationDistance
-                filtered_routes.append(route)
-
-        if not filtered_routes:  # No routes within the radius
-            return queryset.none()
-
-        # Filter using the filtered_routes found. This creates a queryset
-        filtered_ids = [route.id for route in filtered_routes]
-        filtered_queryset = queryset.filter(id__in=filtered_ids)
-
-        # Case and When used to do conditional queries on the queryset
-        origin_distance_annotation = Case(
-            *[When(id=route.id, then=Value(route.originDistance)) for route in filtered_routes],
-            output_field=FloatField(),
-        )
-        destination_distance_annotation = Case(
-            *[
-                When(id=route.id, then=Value(route.destinationDistance))
-                for route in filtered_routes
-            ],
-            output_field=FloatField(),
-        )
-
-        # Add dinamically the origin and destination distances to the queryset
-        filtered_queryset = filtered_queryset.annotate(
-            originDistance=origin_distance_annotation,
-            destinationDistance=destination_distance_annotation,
+            .filter(originDistance__lte=self.radius, destinationDistance__lte=self.radius)
         )
 
-        return filtered_queryset
-
     class Meta:
         model = Route
         fields = {
@@ -121,3 +212,133 @@ class BasePaginator(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetPaginator(BasePagination):
+    """
+    Cursor pagination ordered by (departureTime, id), or by the distance to the searched points
+    and id when the routes are filtered by location.
+
+    A page is the rows after the last row of the previous page, which the cursor points to, so
+    no page needs an OFFSET and no COUNT of the routes is run. The response only has the link to
+    the 'next' page and the 'results'.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        pageSize = self.getPageSize(request)
+
+        if "originDistance" in queryset.query.annotations:
+            queryset = queryset.annotate(
+                searchDistance=F("originDistance") + F("destinationDistance")
+            )
+            self.ordering = ("searchDistance", "id")
+        else:
+            self.ordering = ("departureTime", "id")
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decodeCursor(request, self.ordering[0])
+        if position is not None:
+            field, tiebreaker = self.ordering
+            queryset = queryset.filter(
+                Q(**{f"{field}__gt": position[0]})
+                | Q(**{field: position[0], f"{tiebreaker}__gt": position[1]})
+            )
+
+        # one more row tells if there is a next page
+        rows = list(queryset[: pageSize + 1])
+        self.page = rows[:pageSize]
+        self.hasNext = len(rows) > pageSize
+        return self.page
+
+    def getPageSize(self, request) -> int:
+        try:
+            pageSize = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(pageSize, self.max_page_size) if pageSize > 0 else self.page_size
+
+    def decodeCursor(self, request, field: str) -> tuple | None:
+        """
+        Returns the (value of the ordering field, id) of the row the cursor points to, None if
+        there is no cursor.
+
+        Raises:
+            NotFound: The cursor is not one of this ordering.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != 2:
+            raise NotFound(self.invalid_cursor_message)
+
+        value, pk = position
+        # bool is an int too
+        if type(pk) is not int:
+            raise NotFound(self.invalid_cursor_message)
+        if field == "departureTime":
+            try:
+                value = parse_datetime(value) if isinstance(value, str) else None
+            except ValueError:
+                value = None
+        elif type(value) not in (int, float) or not math.isfinite(value):
+            value = None
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encodeCursor(self, row) -> str:
+        value = getattr(row, self.ordering[0])
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        position = json.dumps([value, row.pk])
+        return base64.urlsafe_b64encode(position.encode("ascii")).decode("ascii")
+
+    def get_next_link(self) -> str | None:
+        if not self.hasNext:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encodeCursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class SelectablePaginationMixin:
+    """
+    Lets every request choose the KeysetPaginator with ?pagination=cursor, other requests keep
+    the pagination_class of the view (none if it has none).
+    """
+
+    pagination_query_param = "pagination"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get(self.pagination_query_param) == "cursor":
+                self._paginator = KeysetPaginator()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
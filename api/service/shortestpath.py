@@ -0,0 +1,153 @@
+"""
+Shortest path engine for the graph between the candidate chargers of a route.
+
+The graph is a compressed sparse row (CSR) adjacency over integer node ids in which only the
+legs the vehicle can drive (at most 'maxDistance' kilometers) are edges, so no edge is rejected
+during the search. The search is A* with the great circle distance to the target as heuristic,
+it never overestimates since edges are great circle distances too; without the heuristic it is
+a plain Dijkstra search.
+
+Edges can be given their road distance when it is known, the heuristic stays admissible as a
+road is never shorter than the great circle between its ends. Edges whose road is longer than
+'maxDistance' are left out of the search.
+"""
+
+import heapq
+from typing import Hashable
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from api.service.geo import EARTH_RADIUS_KM, haversineDistances
+
+
+class SparseGraph:
+    """
+    Graph between points with an edge between every pair at most 'maxDistance' kilometers apart.
+    The edges of node i are indices[indptr[i]:indptr[i + 1]] with lengths in 'weights'.
+    """
+
+    def __init__(self, coords, maxDistance: float):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.maxDistance = maxDistance
+        n = len(self.coords)
+
+        tree = BallTree(np.radians(self.coords), metric="haversine")
+        neighbors, distances = tree.query_radius(
+            np.radians(self.coords), r=maxDistance / EARTH_RADIUS_KM, return_distance=True
+        )
+        # every point is its own neighbor, loops are left out
+        sources = np.repeat(np.arange(n), [len(found) for found in neighbors])
+        indices = np.concatenate(neighbors) if n else np.empty(0, dtype=np.intp)
+        weights = np.concatenate(distances) * EARTH_RADIUS_KM if n else np.empty(0)
+        keep = indices != sources
+
+        self.indices = indices[keep]
+        self.weights = weights[keep]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources[keep], minlength=n), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.coords)
+
+    def setWeights(self, weights: dict[tuple[int, int], float]):
+        """
+        Replaces the length of the given (source, target) edges, pairs that are not an edge of
+        the graph are ignored. Edges longer than 'maxDistance' can not be driven and are given
+        an infinite length, so the search never takes them.
+        """
+        for (source, target), weight in weights.items():
+            begin = self.indptr[source]
+            found = np.flatnonzero(self.indices[begin : self.indptr[source + 1]] == target)
+            if len(found):
+                self.weights[begin + found[0]] = weight if weight <= self.maxDistance else np.inf
+
+    def shortestPath(self, start: int, end: int, heuristic: bool = True) -> list[int] | None:
+        """
+        Returns the nodes of the shortest path from start to end, None if end is not reachable.
+
+        Args:
+            start (int): The start node.
+            end (int): The end node.
+            heuristic (bool, optional): Whether to guide the search with the distance to the end
+                (A*) or not (Dijkstra). Defaults to True.
+        """
+        n = len(self)
+        if heuristic:
+            estimates = haversineDistances(self.coords, self.coords[end])
+        else:
+            estimates = np.zeros(n)
+
+        costs = np.full(n, np.inf)
+        parents = np.full(n, -1, dtype=np.int64)
+        closed = np.zeros(n, dtype=bool)
+        costs[start] = 0.0
+        queue = [(estimates[start], start)]
+
+        while queue:
+            _, node = heapq.heappop(queue)
+            if closed[node]:
+                continue
+            if node == end:
+                break
+            closed[node] = True
+
+            begin, finish = self.indptr[node], self.indptr[node + 1]
+            neighbors = self.indices[begin:finish]
+            candidates = costs[node] + self.weights[begin:finish]
+            better = candidates < costs[neighbors]
+            neighbors, candidates = neighbors[better], candidates[better]
+            costs[neighbors] = candidates
+            parents[neighbors] = node
+            for neighbor, cost in zip(
+                neighbors.tolist(), (candidates + estimates[neighbors]).tolist()
+            ):
+                heapq.heappush(queue, (cost, neighbor))
+
+        if not np.isfinite(costs[end]):
+            return None
+
+        path = [end]
+        while path[-1] != start:
+            path.append(int(parents[path[-1]]))
+        path.reverse()
+        return path
+
+
+def sparseShortestPath(
+    points: dict[Hashable, tuple[float, float]],
+    start: Hashable,
+    end: Hashable,
+    autonomy: float,
+    heuristic: bool = True,
+    legDistances: dict[tuple[Hashable, Hashable], float] | None = None,
+) -> list[Hashable]:
+    """
+    Returns the shortest path from start to end through the points without legs longer than
+    the autonomy, the same contract as dijkstra but on the coordinates of the nodes.
+
+    Args:
+        points (dict): The coordinates of every node.
+        start (Hashable): The start node.
+        end (Hashable): The end node.
+        autonomy (float): The autonomy in kilometers.
+        heuristic (bool, optional): Whether to use A* or Dijkstra. Defaults to True.
+        legDistances (dict, optional): The road distance in kilometers of the (source, target)
+            legs that are known, the rest are weighted with their great circle distance.
+
+    Returns:
+        list: The nodes of the path from start to end, empty if end is not reachable.
+    """
+    labels = list(points)
+    graph = SparseGraph(list(points.values()), autonomy)
+    if legDistances:
+        positions = {label: position for position, label in enumerate(labels)}
+        graph.setWeights(
+            {
+                (positions[source], positions[target]): weight
+                for (source, target), weight in legDistances.items()
+                if source in positions and target in positions
+            }
+        )
+    path = graph.shortestPath(labels.index(start), labels.index(end), heuristic)
+    return [] if path is None else [labels[node] for node in path]
@@ -0,0 +1,73 @@
+"""
+Coalescing of identical in-flight computations.
+
+When several requests need the same result at the same time only the first one (the leader)
+computes it, the rest wait for the leader and share its result or exception. Calls are only
+coalesced within a process and while the computation is running, nothing is cached afterwards.
+"""
+
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single execution.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls: dict[str, Future] = {}
+        self.tasks: dict[tuple[int, str], asyncio.Task] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args) -> Any:
+        """
+        Returns fn(*args), waiting for the call in flight with the same key if there is one.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """
+        Async version of do, calls are coalesced among the coroutines of the same event loop.
+        """
+        # tasks are bound to their loop, so are the calls they can be shared with
+        taskKey = (id(asyncio.get_running_loop()), key)
+        with self.lock:
+            task = self.tasks.get(taskKey)
+            if task is None:
+                task = asyncio.ensure_future(fn(*args))
+                self.tasks[taskKey] = task
+                task.add_done_callback(lambda _: self.forget(taskKey))
+            else:
+                self.coalesced += 1
+
+        # shielded so a cancelled waiter does not cancel the computation of the others
+        return await asyncio.shield(task)
+
+    def forget(self, taskKey: tuple[int, str]):
+        with self.lock:
+            self.tasks.pop(taskKey, None)
@@ -0,0 +1,60 @@
+"""
+Parameter variants of the candidate chargers search for speculative planning.
+
+kPowerFinder trades the number of candidates it keeps (and so the time of the shortest path
+search) for the chance of finding a route, and its default parameters miss routes that another
+setting finds. With CHARGER_SPECULATIVE_PLANNING the planner runs every variant in a process pool
+and keeps the best plan found within the deadline (see route.speculativeChargersRoute).
+
+The worker processes import this module without setting up Django, so it only uses the planning
+modules that do not depend on it. They still import the api package, which creates no Maps
+clients at import.
+"""
+
+from typing import Hashable
+
+import numpy as np
+
+from api.service.geo import haversinePairs
+from api.service.kPowerFinder import kPowerFinder
+from api.service.shortestpath import sparseShortestPath
+
+# name: kPowerFinder parameters, the first one is the default search
+PLANNER_VARIANTS: dict[str, dict] = {
+    "default": {},
+    "slim": {"slim": True},
+    "fineRing": {"reductionParam": 0.02},
+    "lowDeviation": {"deviationParam": 0.05},
+    "highDeviation": {"deviationParam": 0.2},
+}
+
+
+def planVariant(
+    variant: str,
+    routePoints: dict[Hashable, tuple[float, float]],
+    autonomy: float,
+    heuristic: bool = True,
+) -> tuple[str, list[Hashable], float]:
+    """
+    Plans the chargers path of the route points with the kPowerFinder parameters of a variant.
+
+    Legs are weighted with their great circle distance, the road distances of the known legs are
+    in the database, which the worker processes do not use.
+
+    Returns:
+        tuple: The variant, the keys of the path (empty if it found none) and its length in
+            kilometers (infinite if it found none).
+    """
+    try:
+        candidates = dict(kPowerFinder(autonomy, routePoints, **PLANNER_VARIANTS[variant]))
+    except ValueError:
+        return variant, [], float("inf")
+
+    candidates["origin"] = routePoints["origin"]
+    candidates["destination"] = routePoints["destination"]
+    path = sparseShortestPath(candidates, "origin", "destination", autonomy, heuristic=heuristic)
+    if not path:
+        return variant, [], float("inf")
+
+    coords = np.array([candidates[key] for key in path])
+    return variant, path, float(haversinePairs(coords[:-1], coords[1:]).sum())
@@ -1,18 +1,35 @@
 """
 This module contains the signals to update the achievements of the users
 These signals are created in this repository because the ppf-user-api ca not catch the signals of the ppf-route-api
+It also keeps the reachability graph and the masks of the chargers up to date when a charger changes
+and the geohash cells of the routes when a route is saved
 """
 
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from common.models.charger import LocationCharger
 from common.models.achievement import UserAchievementProgress, Achievement
 from common.models.route import Route
 from common.models.user import User
 from common.models.calendar import GoogleOAuth2Token
 from .service.calendar import add_event_calendar, delete_event_calendar
+from .models import ChargerMask, RouteCell
+from .service.chargers import bumpChargerDataset
+from .service.reachability import chargerLinksEnabled, linkCharger, linksPaused, unlinkCharger
 import datetime
 
 
+# Keep the geohash cells of the route for the location search
+@receiver(post_save, sender=Route)
+def route_saved(sender, instance, **kwargs):
+    RouteCell.store([instance])
+
+
+@receiver(post_delete, sender=Route)
+def route_deleted(sender, instance, **kwargs):
+    RouteCell.objects.filter(routeId=instance.pk).delete()
+
+
 # Create 1, 10 and 50 routes
 @receiver(post_save, sender=Route)
 def route_created(sender, instance, created, **kwargs):
@@ -180,4 +197,37 @@ def passenger_leave_route_calendar_event(sender, instance, action, pk_set, **kwa
                     user = User.objects.get(pk=user_id)
                     delete_event_calendar(user, instance)
                 except User.DoesNotExist:
-                    pass
\ No newline at end of file
+                    pass
+
+
+# Link a new or moved charger to the chargers it can reach, when the links planner is used
+@receiver(post_save, sender=LocationCharger)
+def charger_saved(sender, instance, **kwargs):
+    if not linksPaused():
+        if chargerLinksEnabled():
+            linkCharger(instance.pk, instance.latitud, instance.longitud)
+        bumpChargerDataset()
+
+
+# Remove the links of a deleted charger
+@receiver(post_delete, sender=LocationCharger)
+def charger_deleted(sender, instance, **kwargs):
+    if not linksPaused():
+        if chargerLinksEnabled():
+            unlinkCharger(instance.pk)
+        ChargerMask.objects.filter(chargerId=instance.pk).delete()
+        bumpChargerDataset()
+
+
+# Drop the masks of chargers whose connection types or velocities changed, the index computes them
+@receiver(m2m_changed, sender=LocationCharger.connectionType.through)
+@receiver(m2m_changed, sender=LocationCharger.velocities.through)
+def charger_options_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith("post_") and not linksPaused():
+        masks = ChargerMask.objects.all()
+        if not reverse:
+            masks = masks.filter(chargerId=instance.pk)
+        elif pk_set is not None:
+            masks = masks.filter(chargerId__in=pk_set)
+        masks.delete()
+        bumpChargerDataset()
@@ -0,0 +1,83 @@
+from django.test import SimpleTestCase, TestCase
+
+from api.benchmarks.planner import (
+    findRegressions,
+    fixturePoints,
+    runSuite,
+    syntheticPoints,
+)
+
+
+def report(*medians: float) -> dict:
+    return {
+        "results": [
+            {"name": f"case{i}", "status": "ok", "median": median}
+            for i, median in enumerate(medians)
+        ]
+    }
+
+
+class PlannerBenchmarkTestCase(SimpleTestCase):
+    """
+    Test case for the planner benchmark suite.
+    """
+
+    def testReproducibleDatasets(self):
+        """
+        The charger sets only depend on their size and seed.
+        """
+        for builder in (syntheticPoints, fixturePoints):
+            points = builder(200, 1)
+            self.assertEqual(len(points), 202)
+            self.assertIn("origin", points)
+            self.assertIn("destination", points)
+            self.assertEqual(points, builder(200, 1))
+            self.assertNotEqual(points, builder(200, 2))
+
+    def testResults(self):
+        """
+        Every case of the run has its timings and result.
+        """
+        run = runSuite(
+            benchmarks=["kPowerFinder"], datasets=["synthetic"], sizes=[100], autonomies=[80, 150]
+        )
+        self.assertEqual(
+            [case["name"] for case in run["results"]],
+            ["kPowerFinder/synthetic/100/80", "kPowerFinder/synthetic/100/150"],
+        )
+        for case in run["results"]:
+            self.assertEqual(case["status"], "ok")
+            self.assertGreater(case["candidates"], 0)
+            self.assertLessEqual(case["min"], case["median"])
+        self.assertEqual(run["meta"]["repeat"], 5)
+
+    def testRegressions(self):
+        """
+        Only cases slower than the tolerance and the minimum delta are regressions.
+        """
+        baseline = report(0.1, 0.1, 0.001)
+        regressions = findRegressions(report(0.12, 0.2, 0.003), baseline, 0.25, 0.005)
+        self.assertEqual([regression["name"] for regression in regressions], ["case1"])
+        self.assertAlmostEqual(regressions[0]["ratio"], 2.0)
+
+    def testNewCases(self):
+        """
+        Cases that are not in the baseline are not compared.
+        """
+        self.assertEqual(findRegressions(report(0.1, 1.0), report(0.1), 0.25, 0.0), [])
+
+
+class PlannerBenchmarkQueriesTestCase(TestCase):
+    def testLegsLoadedOnce(self):
+        """
+        The known road legs of a charger set are queried once, not in every timed run.
+        """
+        with self.assertNumQueries(1):
+            run = runSuite(
+                benchmarks=["computeChargersRoute"],
+                datasets=["synthetic"],
+                sizes=[100],
+                autonomies=[150, 300],
+                repeat=2,
+            )
+        self.assertEqual([case["status"] for case in run["results"]], ["ok", "ok"])
@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase
+
+from api.service.breaker import CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError()
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    """
+    Test case for the circuit breaker.
+    """
+
+    def setUp(self) -> None:
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(
+            "test",
+            failureThreshold=2,
+            resetTimeout=10,
+            failures=(ConnectionError,),
+            clock=self.clock,
+        )
+        return super().setUp()
+
+    def trip(self):
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.breaker.call(fail)
+
+    def testOpensAfterThreshold(self):
+        """
+        Calls are rejected without running them once the threshold is reached.
+        """
+        self.trip()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(self.unexpectedCall)
+        self.assertEqual(self.breaker.rejected, 1)
+
+    def unexpectedCall(self):
+        self.fail("The call should have been rejected")
+
+    def testOtherErrorsDontCount(self):
+        """
+        Errors that are not failures of the service don't open the circuit.
+        """
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.breaker.call(int, "not a number")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def testHalfOpenSuccessCloses(self):
+        """
+        After the reset timeout a successful trial call closes the circuit.
+        """
+        self.trip()
+        self.clock.now = 10
+        self.assertEqual(self.breaker.call(int, "1"), 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def testHalfOpenFailureReopens(self):
+        """
+        A failed trial call opens the circuit for another reset timeout.
+        """
+        self.trip()
+        self.clock.now = 10
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.clock.now = 15
+        with self.assertRaises(CircuitOpen):
+            self.breaker.call(int, "1")
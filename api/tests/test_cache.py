@@ -0,0 +1,129 @@
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from google.maps.routing_v2 import ComputeRoutesResponse
+
+from api.service.cache import TieredCache, routeCache
+from api.service.route import acomputeMapsRoutePath, computeMapsRoutePath
+
+from .payloads import CREATE_ROUTE_PAYLOAD, CREATE_ROUTE_PREVIEW_RESPONSE
+
+PATH = [
+    {
+        "charger": "origin",
+        "latitude": CREATE_ROUTE_PAYLOAD["originLat"],
+        "longitude": CREATE_ROUTE_PAYLOAD["originLon"],
+    },
+    {
+        "charger": "destination",
+        "latitude": CREATE_ROUTE_PAYLOAD["destinationLat"],
+        "longitude": CREATE_ROUTE_PAYLOAD["destinationLon"],
+    },
+]
+
+
+def mapsResponse():
+    return ComputeRoutesResponse(
+        {
+            "routes": [
+                {
+                    "distance_meters": CREATE_ROUTE_PREVIEW_RESPONSE["distance"],
+                    "duration": {"seconds": CREATE_ROUTE_PREVIEW_RESPONSE["duration"]},
+                    "polyline": {"encoded_polyline": CREATE_ROUTE_PREVIEW_RESPONSE["polyline"]},
+                }
+            ]
+        }
+    )
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    """
+    Test case for the two tier route cache.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.cache = TieredCache("test", ttl=60, maxsize=2, precision=4)
+        return super().setUp()
+
+    def testQuantizedKey(self):
+        """
+        Points closer than the precision share the same entry.
+        """
+        self.cache.set([(41.389972, 2.115333)], "route")
+        self.assertEqual(self.cache.get([(41.38997249, 2.11533251)]), "route")
+        self.assertIsNone(self.cache.get([(41.3901, 2.115333)]))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def testSharedTier(self):
+        """
+        Entries evicted from the local tier are still served by the Django cache.
+        """
+        for i in range(3):
+            self.cache.set([(float(i), float(i))], i)
+
+        self.assertEqual(self.cache.stats()["size"], 2)
+        self.assertEqual(self.cache.get([(0.0, 0.0)]), 0)
+        self.assertEqual(self.cache.stats()["localHits"], 0)
+        self.assertEqual(self.cache.get([(0.0, 0.0)]), 0)
+        self.assertEqual(self.cache.stats()["localHits"], 1)
+
+    @override_settings(CACHE_STATS_INTERVAL=3)
+    def testStatsReported(self):
+        """
+        The counters are logged every CACHE_STATS_INTERVAL lookups.
+        """
+        self.cache.set([(0.0, 0.0)], 0)
+        with self.assertLogs("api.service.cache", "INFO") as logs:
+            for i in range(6):
+                self.cache.get([(float(i % 2), 0.0)])
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:api.service.cache:test cache: 2 hits (2 local), 1 misses, hit ratio 0.67, "
+                "1 local entries",
+                "INFO:api.service.cache:test cache: 3 hits (3 local), 3 misses, hit ratio 0.50, "
+                "1 local entries",
+            ],
+        )
+
+
+class ComputeMapsRoutePathTestCase(SimpleTestCase):
+    """
+    Test case for the cached route computation.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        routeCache.clear()
+        return super().setUp()
+
+    def testRouteIsCached(self):
+        """
+        The same path only hits the Google Maps API once.
+        """
+        with patch("api.service.providers.getGoogleMapsRouteClient") as mockGetClient:
+            mockClient = mockGetClient.return_value
+            mockClient.compute_routes.return_value = mapsResponse()
+            first = computeMapsRoutePath(PATH)
+            second = computeMapsRoutePath(PATH)
+
+        self.assertEqual(mockClient.compute_routes.call_count, 1)
+        self.assertEqual(first, CREATE_ROUTE_PREVIEW_RESPONSE)
+        self.assertEqual(second, first)
+
+    def testAsyncRouteIsCached(self):
+        """
+        The async path shares the cache with the sync one.
+        """
+        with patch("api.service.providers.getGoogleMapsRouteAsyncClient") as mockGetClient:
+            mockGetClient.return_value.compute_routes = AsyncMock(return_value=mapsResponse())
+            first = async_to_sync(acomputeMapsRoutePath)(PATH)
+            second = computeMapsRoutePath(PATH)
+
+        self.assertEqual(mockGetClient.return_value.compute_routes.await_count, 1)
+        self.assertEqual(first, CREATE_ROUTE_PREVIEW_RESPONSE)
+        self.assertEqual(second, first)
@@ -0,0 +1,282 @@
+import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import polyline
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.models import ChargerMask
+from api.service.cache import chargersPlanCache, chargersPlanKey
+from api.service.chargers import (
+    CONNECTION_TYPES,
+    ChargerIndex,
+    bumpChargerDataset,
+    getChargerIndex,
+    invalidateChargerIndex,
+    rebuildChargerMasks,
+)
+from api.service.route import (
+    calculateChargerPoints,
+    calculateCorridorChargerPoints,
+    computeChargersPath,
+    computeOptimizedRoute,
+)
+from common.models.charger import ChargerLocationType, ChargerVelocity, LocationCharger
+from common.models.user import ChargerType, Driver
+
+# name: (latitude, longitude, connection types)
+CHARGERS = {
+    "bcn": (41.3874, 2.1686, ["MENNEKES", "CCS COMBO2"]),
+    "bdn": (41.4500, 2.2474, ["TESLA"]),
+    "gir": (41.9794, 2.8214, ["MENNEKES"]),
+    "tgn": (41.1189, 1.2445, ["SCHUKO"]),
+}
+
+
+def createChargers():
+    for chargerType, _ in ChargerLocationType.CHARGER_CHOICES:
+        ChargerLocationType.objects.create(chargerType=chargerType)
+    rapid = ChargerVelocity.objects.create(velocity=ChargerVelocity.RAPID)
+
+    chargers = {}
+    for name, (lat, lon, types) in CHARGERS.items():
+        charger = LocationCharger.objects.create(
+            promotorGestor=name, access="", kw=50, acDc="DC", latitud=lat, longitud=lon, adreA=""
+        )
+        charger.connectionType.set(ChargerLocationType.objects.filter(chargerType__in=types))
+        charger.velocities.add(rapid)
+        chargers[name] = charger.pk
+    bumpChargerDataset()
+    return chargers
+
+
+class ChargerIndexTestCase(TestCase):
+    """
+    Test case for the in-memory charger index.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        chargersPlanCache.clear()
+        self.chargers = createChargers()
+        self.index = getChargerIndex()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        invalidateChargerIndex()
+        return super().tearDown()
+
+    def ids(self, rows):
+        return set(self.index.ids[rows].tolist())
+
+    def testBounds(self):
+        """
+        The bounding box query filters by connection type.
+        """
+        rows = self.index.inBounds((41.3, 2.0), (42.0, 3.0))
+        self.assertEqual(self.ids(rows), {self.chargers[name] for name in ("bcn", "bdn", "gir")})
+
+        rows = self.index.inBounds((41.3, 2.0), (42.0, 3.0), ["MENNEKES"])
+        self.assertEqual(self.ids(rows), {self.chargers["bcn"], self.chargers["gir"]})
+
+    def testRadius(self):
+        """
+        The radius query returns the chargers nearest first with their distance.
+        """
+        rows, distances = self.index.withinRadius((41.39, 2.17), 15)
+        self.assertEqual(
+            self.index.ids[rows].tolist(), [self.chargers["bcn"], self.chargers["bdn"]]
+        )
+        self.assertLess(distances[0], distances[1])
+        self.assertLess(distances[1], 15)
+
+    def testNearest(self):
+        """
+        The k nearest query with a connection type skips the chargers without it.
+        """
+        rows, _ = self.index.nearest((41.39, 2.17), 2)
+        self.assertEqual(self.ids(rows), {self.chargers["bcn"], self.chargers["bdn"]})
+
+        rows, _ = self.index.nearest((41.39, 2.17), 2, ["MENNEKES"])
+        self.assertEqual(
+            self.index.ids[rows].tolist(), [self.chargers["bcn"], self.chargers["gir"]]
+        )
+
+    def testDatasetVersion(self):
+        """
+        The index is rebuilt when the dataset changes.
+        """
+        LocationCharger.objects.filter(pk=self.chargers["tgn"]).delete()
+        bumpChargerDataset()
+
+        index = getChargerIndex()
+        self.assertIsNot(index, self.index)
+        self.assertEqual(len(index), len(CHARGERS) - 1)
+
+    def testStoredMasks(self):
+        """
+        The index reads the stored masks without the many to many tables of the chargers.
+        """
+        self.assertEqual(rebuildChargerMasks(), len(CHARGERS))
+        mask = ChargerMask.objects.get(chargerId=self.chargers["bcn"])
+        self.assertEqual(
+            mask.typeMask,
+            1 << CONNECTION_TYPES.index("MENNEKES") | 1 << CONNECTION_TYPES.index("CCS COMBO2"),
+        )
+
+        with self.assertNumQueries(2):
+            index = ChargerIndex.build()
+        self.assertEqual(index.typeMask.tolist(), self.index.typeMask.tolist())
+        self.assertEqual(index.velocityMask.tolist(), self.index.velocityMask.tolist())
+
+    def testMissingMasks(self):
+        """
+        The masks of chargers changed after the seed are computed when the index is built.
+        """
+        rebuildChargerMasks()
+        charger = LocationCharger.objects.get(pk=self.chargers["tgn"])
+        charger.connectionType.set(ChargerLocationType.objects.filter(chargerType="TESLA"))
+        self.assertFalse(ChargerMask.objects.filter(chargerId=charger.pk).exists())
+
+        index = getChargerIndex()
+        self.assertIsNot(index, self.index)
+        rows = index.inBounds((41.0, 1.0), (42.0, 3.0), ["TESLA"])
+        self.assertEqual(
+            set(index.ids[rows].tolist()), {self.chargers["bdn"], self.chargers["tgn"]}
+        )
+
+    def testCalculateChargerPoints(self):
+        """
+        The chargers of the route area are served by the index.
+        """
+        bounds = {"southwest": [41.0, 1.0], "northeast": [42.0, 3.0]}
+        with self.assertNumQueries(0):
+            points = calculateChargerPoints(bounds, ["SCHUKO", "TESLA"])
+        self.assertEqual(
+            {point["id"] for point in points}, {self.chargers["bdn"], self.chargers["tgn"]}
+        )
+
+    @override_settings(CHARGER_CORRIDOR_BUFFER_KM=5)
+    def testCorridor(self):
+        """
+        Only the chargers near the route are selected, not every charger in its bounding box.
+        """
+        route = [(41.12, 1.25), (41.25, 1.70), (41.39, 2.17), (41.60, 2.15), (41.98, 2.82)]
+        points = calculateCorridorChargerPoints(route, None)
+        self.assertEqual(
+            [point["id"] for point in points],
+            [self.chargers[name] for name in ("bcn", "gir", "tgn")],
+        )
+
+        points = calculateCorridorChargerPoints(route, ["SCHUKO"])
+        self.assertEqual([point["id"] for point in points], [self.chargers["tgn"]])
+
+    def testChargersPath(self):
+        """
+        The planner labels the chargers of the path with their id, only the known road legs
+        between them are queried.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        with self.assertNumQueries(1):
+            path = computeChargersPath(route, 100, ["MENNEKES"])
+
+        self.assertEqual(
+            [point["charger"] for point in path], ["origin", self.chargers["bcn"], "destination"]
+        )
+
+    def testEmptyIndex(self):
+        index = ChargerIndex([], [], [], [], [], [])
+        self.assertEqual(len(index.withinRadius((41.0, 2.0), 10)[0]), 0)
+        self.assertEqual(len(index.nearest((41.0, 2.0), 3)[0]), 0)
+
+    def testSharedPlan(self):
+        """
+        Trips between the same cells with the same autonomy band and charger types share the
+        chargers, without planning them again.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        first = computeChargersPath(route, 100, ["MENNEKES"])
+
+        nearby = [(41.1201, 1.2502), (41.39, 2.17), (41.9801, 2.8199)]
+        with self.assertNumQueries(0):
+            second = computeChargersPath(nearby, 102, ["MENNEKES"])
+
+        self.assertEqual([point["charger"] for point in second], [p["charger"] for p in first])
+        self.assertEqual((second[0]["latitude"], second[0]["longitude"]), nearby[0])
+        self.assertEqual(chargersPlanCache.stats()["hits"], 1)
+
+        computeChargersPath(route, 100, ["MENNEKES", "TESLA"])
+        self.assertEqual(chargersPlanCache.stats()["misses"], 2)
+
+    def testPlanOfOldChargers(self):
+        """
+        Plans are not shared once the chargers change.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        computeChargersPath(route, 100, ["MENNEKES"])
+        bumpChargerDataset()
+        computeChargersPath(route, 100, ["MENNEKES"])
+        self.assertEqual(chargersPlanCache.stats()["misses"], 2)
+
+    def testPlanOutOfReach(self):
+        """
+        A shared plan the driver can't drive from the actual origin is planned again.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        key = chargersPlanKey(route[0], route[-1], 100, ["MENNEKES"], self.index.version)
+        chargersPlanCache.store(key, [(self.chargers["gir"], *CHARGERS["gir"][:2])])
+
+        path = computeChargersPath(route, 100, ["MENNEKES"])
+        self.assertEqual(path[1]["charger"], self.chargers["bcn"])
+
+    def testExactAutonomy(self):
+        """
+        A trip the band of the driver can't plan is planned with the autonomy of the driver.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        serializer = SimpleNamespace(
+            validated_data={
+                "originLat": route[0][0],
+                "originLon": route[0][1],
+                "destinationLat": route[-1][0],
+                "destinationLon": route[-1][1],
+            }
+        )
+        driver = Driver.objects.create(
+            username="driver", dni="1", iban="1", birthDate=datetime.date(1998, 10, 6), autonomy=92
+        )
+        driver.chargerTypes.add(ChargerType.objects.create(chargerType="MENNEKES"))
+
+        # the band of 92 km (90) finds no route
+        with patch(
+            "api.service.route.computeMapsRoutePath",
+            return_value={"polyline": polyline.encode(route), "duration": 0, "distance": 0},
+        ):
+            _, waypoints = computeOptimizedRoute(serializer, driver.pk)
+        self.assertEqual([point["charger"] for point in waypoints], [self.chargers["bcn"]])
+
+
+class NearbyChargersTestCase(APITestCase):
+    """
+    Test case for the chargers around a point.
+    """
+
+    def setUp(self) -> None:
+        self.chargers = createChargers()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        invalidateChargerIndex()
+        return super().tearDown()
+
+    def testNearbyChargers(self):
+        response = self.client.get("/chargers/?latitud=41.39&longitud=2.17&radio_km=15")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([charger["promotorGestor"] for charger in response.data], ["bcn", "bdn"])
+
+    def testMissingParameters(self):
+        response = self.client.get("/chargers/?latitud=41.39")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+from geopy.distance import distance
+
+from api.service.dijkstra import buildDistanceGraph, dijkstra
+
+POINTS = {
+    "origin": (41.0, 2.0),
+    1: (41.4, 2.0),
+    2: (41.8, 2.0),
+    3: (41.4, 2.6),
+    "destination": (42.2, 2.0),
+}
+
+
+class BuildDistanceGraphTestCase(SimpleTestCase):
+    """
+    Test case for the sparse distance graph of the candidate chargers.
+    """
+
+    def setUp(self) -> None:
+        self.graph = buildDistanceGraph(POINTS, 50)
+        return super().setUp()
+
+    def testOnlyEdgesWithinDistance(self):
+        """
+        Every node is in the graph with the nodes it can reach, never itself.
+        """
+        self.assertEqual(set(self.graph), set(POINTS))
+        self.assertEqual(set(self.graph["origin"]), {1})
+        self.assertEqual(set(self.graph[1]), {"origin", 2})
+        self.assertEqual(self.graph[3], {})
+
+    def testDistances(self):
+        """
+        The haversine weights are close to the geodesic distances.
+        """
+        expected = distance(POINTS["origin"], POINTS[1]).km
+        self.assertAlmostEqual(self.graph["origin"][1], expected, delta=expected * 0.005)
+
+    def testShortestPath(self):
+        path = dijkstra(self.graph, "origin", "destination", 50)
+        self.assertEqual(path, ["origin", 1, 2, "destination"])
@@ -0,0 +1,373 @@
+import base64
+import datetime
+import importlib
+import json
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Q
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.models import RouteCell
+from api.service.geo import geohash, haversineDistances
+from api.service.route_filters import boundingBox, statusFilter
+from common.models.route import Route
+from common.models.user import Driver
+
+BCN = (41.3874, 2.1686)
+GIR = (41.9794, 2.8214)
+MAD = (40.4168, -3.7038)
+
+routeIndexes = importlib.import_module("api.migrations.0007_route_location_indexes")
+statusIndexes = importlib.import_module("api.migrations.0009_route_status_indexes")
+
+
+def createRoute(driver: Driver, origin: tuple, destination: tuple, **fields) -> Route:
+    return Route.objects.create(
+        driver=driver,
+        originLat=origin[0],
+        originLon=origin[1],
+        originAlias="",
+        destinationLat=destination[0],
+        destinationLon=destination[1],
+        destinationAlias="",
+        polyline="",
+        distance=0,
+        duration=0,
+        freeSeats=4,
+        **{
+            "departureTime": datetime.datetime(2024, 10, 6, 10, tzinfo=datetime.timezone.utc),
+            **fields,
+        },
+    )
+
+
+class BoundingBoxTestCase(SimpleTestCase):
+    """
+    Test case for the bounding box prefilter of the location filter.
+    """
+
+    def bounds(self, condition) -> dict:
+        return {field: value for field, value in condition.children}
+
+    def testContainsRadius(self):
+        """
+        Every point within the radius is inside the box.
+        """
+        for lat, lon in [BCN, (-33.9, 18.4), (69.6, 18.9)]:
+            bounds = self.bounds(boundingBox("lat", "lon", lat, lon, 50))
+            angles = np.linspace(0, 2 * np.pi, 360)
+            # points a bit less than 50 km away in every direction
+            for angle in angles:
+                point = (lat + 0.449 * np.cos(angle), lon)
+                point = (point[0], lon + 0.449 * np.sin(angle) / np.cos(np.radians(point[0])))
+                if haversineDistances(np.array([point]), (lat, lon))[0] <= 50:
+                    self.assertTrue(bounds["lat__range"][0] <= point[0] <= bounds["lat__range"][1])
+                    self.assertTrue(bounds["lon__range"][0] <= point[1] <= bounds["lon__range"][1])
+
+    def testUnboundedLongitude(self):
+        """
+        The longitude is not bounded near the poles nor across the antimeridian.
+        """
+        self.assertEqual(list(self.bounds(boundingBox("lat", "lon", 89.9, 0, 50))), ["lat__range"])
+        self.assertEqual(list(self.bounds(boundingBox("lat", "lon", 0, 179.9, 50))), ["lat__range"])
+
+
+class LocationFilterTestCase(APITestCase):
+    """
+    Test case for the location filter of the route list.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.near = createRoute(self.driver, (41.40, 2.17), (41.98, 2.80))
+        self.farOrigin = createRoute(self.driver, MAD, (41.98, 2.80))
+        self.farDestination = createRoute(self.driver, (41.40, 2.17), MAD)
+        return super().setUp()
+
+    def testLocation(self):
+        """
+        Only the routes with both ends within the radius are listed, with their distances.
+        """
+        response = self.client.get("/v2/routes", {"location": ",".join(map(str, BCN + GIR))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = response.data["results"]
+        self.assertEqual([route["id"] for route in routes], [self.near.id])
+        self.assertAlmostEqual(
+            routes[0]["originDistance"],
+            haversineDistances(np.array([(41.40, 2.17)]), BCN)[0],
+            places=6,
+        )
+        self.assertAlmostEqual(
+            routes[0]["destinationDistance"],
+            haversineDistances(np.array([(41.98, 2.80)]), GIR)[0],
+            places=6,
+        )
+
+    def testNoRoutes(self):
+        response = self.client.get("/v2/routes", {"location": ",".join(map(str, GIR + BCN))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+    @override_settings(ROUTE_CELL_SEARCH=True)
+    def testCellSearch(self):
+        """
+        The routes are looked up by their cells, routes without them are not found.
+        """
+        location = {"location": ",".join(map(str, BCN + GIR))}
+        response = self.client.get("/v2/routes", location)
+        self.assertEqual([route["id"] for route in response.data["results"]], [self.near.id])
+
+        RouteCell.objects.filter(routeId=self.near.id).delete()
+        response = self.client.get("/v2/routes", location)
+        self.assertEqual(response.data["results"], [])
+
+
+class RouteCellTestCase(APITestCase):
+    """
+    Test case for the geohash cells of the routes.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.route = createRoute(self.driver, BCN, GIR)
+        return super().setUp()
+
+    def testSaved(self):
+        """
+        The cells follow the route when it is saved and deleted.
+        """
+        cell = RouteCell.objects.get(routeId=self.route.id)
+        self.assertEqual((cell.originCell, cell.destinationCell), ("sp3e", "sp6n"))
+        self.assertEqual(cell.departureTime, self.route.departureTime)
+
+        route = Route.objects.get(pk=self.route.id)
+        route.originLat, route.originLon = MAD
+        route.save()
+        self.assertEqual(RouteCell.objects.get(routeId=route.id).originCell, geohash(*MAD, 4))
+
+        route.delete()
+        self.assertFalse(RouteCell.objects.exists())
+
+    @override_settings(ROUTE_CELL_PRECISION=6)
+    def testBackfill(self):
+        """
+        The command stores the cells of every route and removes those of deleted routes.
+        """
+        RouteCell.objects.all().delete()
+        RouteCell.objects.create(
+            routeId=self.route.id + 1,
+            originCell="",
+            destinationCell="",
+            departureTime=self.route.departureTime,
+        )
+        call_command("backfillroutecells", stdout=StringIO())
+
+        cell = RouteCell.objects.get()
+        self.assertEqual(cell.routeId, self.route.id)
+        self.assertEqual(cell.originCell, geohash(*BCN, 6))
+
+
+class RouteLocationIndexesTestCase(TransactionTestCase):
+    """
+    Test case for the indexes of the route coordinates.
+    """
+
+    def tearDown(self) -> None:
+        with connection.schema_editor() as schemaEditor:
+            routeIndexes.dropIndexes(None, schemaEditor)
+            statusIndexes.dropIndexes(None, schemaEditor)
+        return super().tearDown()
+
+    def testCreated(self):
+        with connection.schema_editor() as schemaEditor:
+            routeIndexes.createIndexes(None, schemaEditor)
+            # the indexes can exist already
+            routeIndexes.createIndexes(None, schemaEditor)
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Route._meta.db_table)
+        for name, columns in routeIndexes.INDEXES.items():
+            self.assertEqual(constraints[name]["columns"], columns)
+            self.assertTrue(constraints[name]["index"])
+
+    def testRouteTable(self):
+        """
+        The indexes are created after the routes table, and fail without it.
+        """
+        graph = MigrationLoader(connection).graph
+        for migration in (routeIndexes, statusIndexes):
+            name = migration.__name__.rsplit(".", 1)[-1]
+            parents = {parent.key for parent in graph.node_map[("api", name)].parents}
+            self.assertIn(("common", "0001_initial"), parents)
+            with connection.schema_editor() as schemaEditor, patch.object(
+                connection.introspection, "table_names", return_value=[]
+            ):
+                with self.assertRaises(RuntimeError):
+                    migration.createIndexes(None, schemaEditor)
+
+    def testStatusIndexes(self):
+        """
+        The active routes of a date are found with the partial index.
+        """
+        with connection.schema_editor() as schemaEditor:
+            statusIndexes.createIndexes(None, schemaEditor)
+            statusIndexes.createIndexes(None, schemaEditor)
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Route._meta.db_table)
+        for name, columns in (statusIndexes.STATUS_INDEX, statusIndexes.ACTIVE_INDEX):
+            self.assertEqual(constraints[name]["columns"], columns)
+
+        day = datetime.datetime(2024, 10, 6, tzinfo=datetime.timezone.utc)
+        routes = Route.objects.filter(
+            statusFilter([]), departureTime__range=(day, day + datetime.timedelta(days=1))
+        )
+        self.assertIn(statusIndexes.ACTIVE_INDEX[0], routes.explain())
+
+
+class CursorPaginationTestCase(APITestCase):
+    """
+    Test case for the cursor pagination of the route lists.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        start = datetime.datetime(2024, 10, 6, 10, tzinfo=datetime.timezone.utc)
+        self.routes = [
+            createRoute(
+                self.driver,
+                (41.40 + i * 0.05, 2.17),
+                (41.98, 2.80),
+                # pairs of routes leave at the same time
+                departureTime=start + datetime.timedelta(hours=3 - i // 2),
+            )
+            for i in range(7)
+        ]
+        return super().setUp()
+
+    def walk(self, url: str, params: dict) -> list[list[int]]:
+        pages = []
+        response = self.client.get(url, {**params, "pagination": "cursor", "page_size": 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            pages.append([route["id"] for route in response.data["results"]])
+            if response.data["next"] is None:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def testDepartureOrder(self):
+        """
+        The pages follow the departure time and id of the routes, without repeating any.
+        """
+        expected = sorted(self.routes, key=lambda route: (route.departureTime, route.id))
+        ids = [route.id for route in expected]
+        for url in ("/v2/routes", "/routes"):
+            pages = self.walk(url, {})
+            self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+            self.assertEqual(sum(pages, []), ids)
+
+    def testDistanceOrder(self):
+        """
+        Location searches are ordered by the distance to the searched points.
+        """
+        pages = self.walk("/v2/routes", {"location": ",".join(map(str, BCN + GIR))})
+        # the further the origin the further from the searched one
+        self.assertEqual(sum(pages, []), [route.id for route in self.routes])
+
+    def testPageNumbers(self):
+        """
+        Requests without the cursor pagination keep the previous responses.
+        """
+        response = self.client.get("/v2/routes", {"page_size": 2})
+        self.assertEqual(response.data["count"], len(self.routes))
+        response = self.client.get("/routes")
+        self.assertEqual(len(response.data), len(self.routes))
+
+    def testInvalidCursor(self):
+        """
+        Cursors that are not a position of the ordering of the list are not found.
+        """
+        response = self.client.get("/v2/routes", {"pagination": "cursor", "cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        location = ",".join(map(str, BCN + GIR))
+        for params, position in [
+            ({}, ["abc", 1]),
+            ({}, ["2024-13-45T10:00:00Z", 1]),
+            ({}, ["2024-10-06T10:00:00Z", "1"]),
+            ({}, ["2024-10-06T10:00:00Z", True]),
+            ({"location": location}, ["abc", 1]),
+            ({"location": location}, [1.5, 1.5]),
+            ({"location": location}, [None, 1]),
+        ]:
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            with self.subTest(position=position):
+                response = self.client.get(
+                    "/v2/routes", {**params, "pagination": "cursor", "cursor": cursor}
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class StatusFilterTestCase(APITestCase):
+    """
+    Test case for the status condition of the route list.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.routes = {
+            (cancelled, finalized): createRoute(
+                self.driver, BCN, GIR, cancelled=cancelled, finalized=finalized
+            ).id
+            for cancelled in (False, True)
+            for finalized in (False, True)
+        }
+        return super().setUp()
+
+    def testIncludes(self):
+        """
+        The condition keeps the same routes as the union of the included statuses.
+        """
+        for include in ([], ["cancelled"], ["finalized"], ["cancelled", "finalized"], ["other"]):
+            expected = Route.objects.active()
+            if "cancelled" in include:
+                expected = expected | Route.objects.cancelled()
+            if "finalized" in include:
+                expected = expected | Route.objects.finalized()
+            with self.subTest(include=include):
+                self.assertEqual(
+                    set(Route.objects.filter(statusFilter(include)).values_list("id", flat=True)),
+                    set(expected.values_list("id", flat=True)),
+                )
+                response = self.client.get("/v2/routes", {"include": include})
+                self.assertEqual(
+                    {route["id"] for route in response.data["results"]},
+                    set(expected.values_list("id", flat=True)),
+                )
+
+    def testSinglePredicate(self):
+        """
+        Statuses are grouped by 'cancelled', everything included is no condition at all.
+        """
+        self.assertEqual(statusFilter([]), Q(cancelled=False, finalized=False))
+        self.assertEqual(
+            statusFilter(["cancelled"]), Q(cancelled=False, finalized=False) | Q(cancelled=True)
+        )
+        self.assertEqual(statusFilter(["finalized", "cancelled"]), Q())
@@ -0,0 +1,83 @@
+import polyline
+from django.test import SimpleTestCase
+from geopy.distance import geodesic
+
+from api.service.geo import geohash, geohashCells, geohashCellSize, simplifyPolyline
+
+from .polyline import POLYLINE
+
+
+class SimplifyPolylineTestCase(SimpleTestCase):
+    """
+    Test case for the Douglas-Peucker polyline simplification.
+    """
+
+    def setUp(self) -> None:
+        self.coords = polyline.decode(POLYLINE)
+        return super().setUp()
+
+    def testKeepsEndpoints(self):
+        """
+        The first and last points are always kept.
+        """
+        simplified = simplifyPolyline(self.coords, 1000)
+        self.assertEqual(simplified[0], self.coords[0])
+        self.assertEqual(simplified[-1], self.coords[-1])
+        self.assertLess(len(simplified), len(self.coords))
+
+    def testCoarserLevelsHaveLessPoints(self):
+        """
+        Higher tolerances never keep more points.
+        """
+        sizes = [len(simplifyPolyline(self.coords, tolerance)) for tolerance in (10, 50, 250)]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+
+    def testCollinearPoints(self):
+        """
+        Points on a straight segment are removed.
+        """
+        coords = [(41.0, 2.0), (41.05, 2.0), (41.1, 2.0)]
+        self.assertEqual(simplifyPolyline(coords, 1), [(41.0, 2.0), (41.1, 2.0)])
+
+    def testDeviationIsKept(self):
+        """
+        Points farther than the tolerance from the simplified line are kept.
+        """
+        coords = [(41.0, 2.0), (41.05, 2.01), (41.1, 2.0)]
+        deviation = geodesic((41.05, 2.0), (41.05, 2.01)).meters
+        self.assertEqual(len(simplifyPolyline(coords, deviation * 0.9)), 3)
+        self.assertEqual(len(simplifyPolyline(coords, deviation * 1.1)), 2)
+
+
+class GeohashTestCase(SimpleTestCase):
+    """
+    Test case for the geohash cells.
+    """
+
+    def testKnownCell(self):
+        self.assertEqual(geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def testPrefixes(self):
+        """
+        A cell contains the cells of the same point with more precision.
+        """
+        self.assertTrue(geohash(41.3851, 2.1734, 9).startswith(geohash(41.3851, 2.1734, 6)))
+        self.assertNotEqual(geohash(41.3851, 2.1734, 6), geohash(41.4851, 2.1734, 6))
+
+    def testBoxCells(self):
+        """
+        The cells of a bounding box are those of every point inside it.
+        """
+        southwest, northeast = (41.2, 1.9), (41.7, 2.6)
+        cells = geohashCells(southwest, northeast, 4)
+        self.assertEqual(len(cells), len(set(cells)))
+        height, width = geohashCellSize(4)
+        self.assertLessEqual(len(cells), (0.5 / height + 2) * (0.7 / width + 2))
+        for step in range(21):
+            for column in range(21):
+                lat = southwest[0] + step * (northeast[0] - southwest[0]) / 20
+                lon = southwest[1] + column * (northeast[1] - southwest[1]) / 20
+                self.assertIn(geohash(lat, lon, 4), cells)
+
+    def testWorldEdges(self):
+        self.assertEqual(geohashCells((89.9, 179.9), (90.0, 180.0), 1), ["z"])
@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+from geopy.distance import distance
+
+from api.benchmarks.samples import SAMPLE_POINTS as points
+from api.service.kPowerFinder import kPowerFinder
+
+# chargers every ~22 km on a straight line to the north
+LINE = {
+    "origin": (40.0, -3.7),
+    **{str(i): (40.0 + 0.2 * i, -3.7) for i in range(1, 10)},
+    "destination": (42.0, -3.7),
+}
+
+
+class KPowerFinderTestCase(SimpleTestCase):
+    """
+    Test case for the candidate chargers search.
+    """
+
+    def testSampleTrip(self):
+        """
+        The candidates of the sample trip are chargers and exclude the origin and destination.
+        """
+        candidates = kPowerFinder(90, points)
+        self.assertTrue(candidates)
+        for key, coord in candidates:
+            self.assertNotIn(key, ("origin", "destination"))
+            self.assertEqual(points[key], coord)
+
+    def testSharedLocation(self):
+        """
+        Chargers at the same location keep their own key.
+        """
+        candidates = kPowerFinder(50, {**LINE, "twin": LINE["2"]})
+        self.assertIn(("2", LINE["2"]), candidates)
+        self.assertIn(("twin", LINE["2"]), candidates)
+
+    def testHopsWithinAutonomy(self):
+        """
+        In slim mode the candidates are hops that can be driven one after the other.
+        """
+        candidates = kPowerFinder(50, LINE, slim=True)
+        path = [LINE["origin"], *(coord for _, coord in candidates), LINE["destination"]]
+        for a, b in zip(path, path[1:]):
+            self.assertLessEqual(distance(a, b).km, 50)
+
+    def testDestinationInsideRing(self):
+        """
+        A destination nearer than the furthest reachable charger ends the search.
+        """
+        candidates = kPowerFinder(150, {**LINE, "beyond": (42.35, -3.7)}, slim=True)
+        self.assertEqual(candidates, [("6", LINE["6"])])
+
+    def testUnreachable(self):
+        with self.assertRaises(ValueError):
+            kPowerFinder(15, LINE)
@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+import polyline
+from django.test import SimpleTestCase, override_settings
+from google.api_core.exceptions import ServiceUnavailable
+
+from api.service.providers import (
+    GoogleRouteProvider,
+    LocalRouteProvider,
+    NoRouteFound,
+    RoutingUnavailable,
+)
+from api.service.roadgraph import RoadGraph
+
+# 0 -> 1 -> 3 is shorter but slower than 0 -> 2 -> 3, node 4 is disconnected
+NODES = [(41.0, 2.0), (41.0, 2.1), (41.1, 2.0), (41.1, 2.1), (42.0, 3.0)]
+EDGES = [
+    # source, target, length (m), time (s)
+    (0, 1, 8000, 600),
+    (1, 3, 11000, 800),
+    (0, 2, 11000, 300),
+    (2, 3, 8000, 300),
+    (3, 0, 15000, 900),
+]
+
+
+def buildGraph():
+    indptr = [0] * (len(NODES) + 1)
+    for source, *_ in EDGES:
+        indptr[source + 1] += 1
+    for i in range(len(NODES)):
+        indptr[i + 1] += indptr[i]
+    edges = sorted(EDGES)
+    return RoadGraph(
+        [lat for lat, _ in NODES],
+        [lon for _, lon in NODES],
+        indptr,
+        [edge[1] for edge in edges],
+        [edge[2] for edge in edges],
+        [edge[3] for edge in edges],
+    )
+
+
+class RoadGraphTestCase(SimpleTestCase):
+    """
+    Test case for the local road graph search.
+    """
+
+    def setUp(self) -> None:
+        self.graph = buildGraph()
+        return super().setUp()
+
+    def testFastestPath(self):
+        """
+        The search follows the fastest path, not the shortest one.
+        """
+        coords, length, time = self.graph.route([(41.0001, 2.0001), (41.0999, 2.0999)])
+        self.assertEqual(coords, [NODES[0], NODES[2], NODES[3]])
+        self.assertEqual(length, 19000)
+        self.assertEqual(time, 600)
+
+    def testDirectedEdges(self):
+        """
+        Edges can only be followed in their direction.
+        """
+        coords, _, time = self.graph.route([NODES[3], NODES[2]])
+        self.assertEqual(coords, [NODES[3], NODES[0], NODES[2]])
+        self.assertEqual(time, 1200)
+
+    def testUnreachable(self):
+        self.assertIsNone(self.graph.route([NODES[0], NODES[4]]))
+
+    def testSaveLoad(self):
+        """
+        A saved graph answers the same routes once loaded.
+        """
+        path = "/tmp/test_roadgraph.npz"
+        self.graph.save(path)
+        loaded = RoadGraph.load(path)
+        self.assertEqual(loaded.route(NODES[:4]), self.graph.route(NODES[:4]))
+
+
+class LocalRouteProviderTestCase(SimpleTestCase):
+    """
+    Test case for the local routing provider.
+    """
+
+    def setUp(self) -> None:
+        self.provider = LocalRouteProvider()
+        self.provider.graph = buildGraph()
+        return super().setUp()
+
+    def testRouteShape(self):
+        """
+        The local provider returns the same shape as the Google one.
+        """
+        route = self.provider.computeRoute(
+            [
+                {"charger": "origin", "latitude": 41.0, "longitude": 2.0},
+                {"charger": "destination", "latitude": 41.1, "longitude": 2.1},
+            ]
+        )
+        self.assertEqual(
+            route,
+            {
+                "polyline": polyline.encode([NODES[0], NODES[2], NODES[3]]),
+                "duration": 600,
+                "distance": 19000,
+            },
+        )
+
+    def testNoRoute(self):
+        path = [{"latitude": lat, "longitude": lon} for lat, lon in (NODES[0], NODES[4])]
+        with self.assertRaises(NoRouteFound):
+            self.provider.computeRoute(path)
+
+
+@override_settings(ROUTE_BREAKER_THRESHOLD=2, ROUTE_PROVIDER_TIMEOUT=0.1)
+class GoogleRouteProviderTestCase(SimpleTestCase):
+    """
+    Test case for the deadlines and circuit breaker of the Google provider.
+    """
+
+    PATH = [
+        {"charger": "origin", "latitude": 41.0, "longitude": 2.0},
+        {"charger": "destination", "latitude": 41.1, "longitude": 2.1},
+    ]
+
+    def testUnavailable(self):
+        """
+        Maps errors are reported as RoutingUnavailable and open the circuit.
+        """
+        provider = GoogleRouteProvider()
+        with patch("api.service.providers.getGoogleMapsRouteClient") as mockGetClient:
+            mockClient = mockGetClient.return_value
+            mockClient.compute_routes.side_effect = ServiceUnavailable("down")
+            for _ in range(3):
+                with self.assertRaises(RoutingUnavailable):
+                    provider.computeRoute(self.PATH)
+
+        # the third call was rejected by the open circuit
+        self.assertEqual(mockClient.compute_routes.call_count, 2)
+        self.assertEqual(mockClient.compute_routes.call_args.kwargs["timeout"], 0.1)
@@ -0,0 +1,159 @@
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.models import ChargerLink
+from api.service.cache import chargersPlanCache
+from api.service.chargers import ChargerIndex, invalidateChargerIndex
+from api.service.geo import haversineMatrix
+from api.service.providers import NoRouteFound
+from api.service.reachability import (
+    ChargerLinkGraph,
+    chargerLinks,
+    chargerLinksPaused,
+    invalidateChargerLinkGraph,
+    rebuildChargerLinks,
+)
+from api.service.route import computeChargersPath
+from api.service.shortestpath import sparseShortestPath
+from common.models.charger import LocationCharger
+
+from .test_chargers import CHARGERS, createChargers
+
+
+def linkSet():
+    return set(ChargerLink.objects.values_list("source", "target"))
+
+
+def pathLength(points: list) -> float:
+    return float(sum(haversineMatrix([a, b])[0, 1] for a, b in zip(points, points[1:])))
+
+
+class ChargerLinkGraphTestCase(SimpleTestCase):
+    """
+    Test case for the search over the stored reachability graph.
+    """
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.coords = np.array((40.4, -3.7)) + rng.random((300, 1)) * np.array((1.0, 5.9))
+        self.coords += rng.normal(0, 0.1, self.coords.shape)
+        ids = np.arange(1, 301)
+        self.index = ChargerIndex(
+            ids, self.coords[:, 0], self.coords[:, 1], np.zeros(300), np.ones(300), np.ones(300)
+        )
+        links = list(chargerLinks(ids, self.coords, 100))
+        self.graph = ChargerLinkGraph(
+            self.index,
+            [link.source - 1 for link in links],
+            [link.target - 1 for link in links],
+            [link.distance for link in links],
+        )
+        return super().setUp()
+
+    def testPairsStoredOnce(self):
+        for link in chargerLinks(self.index.ids, self.coords, 50):
+            self.assertLess(link.source, link.target)
+            self.assertLessEqual(link.distance, 50)
+
+    def testSamePathAsCandidateGraph(self):
+        """
+        The stored graph finds paths as short as the graph of all the chargers of the request.
+        """
+        origin, destination = (40.4, -3.7), (41.4, 2.2)
+        points = {
+            "origin": origin,
+            **dict(enumerate(map(tuple, self.coords))),
+            "destination": destination,
+        }
+        for autonomy in (60, 80, 100):
+            expected = sparseShortestPath(points, "origin", "destination", autonomy)
+            rows = self.graph.route(origin, destination, autonomy)
+            path = [origin, *map(tuple, self.coords[rows]), destination]
+            self.assertAlmostEqual(
+                pathLength(path), pathLength([points[key] for key in expected]), places=6
+            )
+            self.assertTrue(all(pathLength([a, b]) <= autonomy for a, b in zip(path, path[1:])))
+
+    def testUnreachable(self):
+        self.assertIsNone(self.graph.route((40.4, -3.7), (41.4, 2.2), 5))
+
+
+@override_settings(CHARGER_LINK_MAX_KM=100, CHARGER_PLANNER_MODE="links")
+class ChargerLinkTestCase(TestCase):
+    """
+    Test case for the maintenance of the stored reachability graph.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        chargersPlanCache.clear()
+        self.chargers = createChargers()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        invalidateChargerIndex()
+        invalidateChargerLinkGraph()
+        return super().tearDown()
+
+    def expectedLinks(self) -> set:
+        ids = sorted(self.chargers.values())
+        coords = [CHARGERS[name][:2] for name in sorted(self.chargers, key=self.chargers.get)]
+        distances = haversineMatrix(coords)
+        return {
+            (ids[i], ids[j])
+            for i in range(len(ids))
+            for j in range(i + 1, len(ids))
+            if distances[i, j] <= 100
+        }
+
+    def testRebuild(self):
+        ChargerLink.objects.all().delete()
+        self.assertEqual(rebuildChargerLinks(), len(self.expectedLinks()))
+        self.assertEqual(linkSet(), self.expectedLinks())
+
+    def testPatchedOnChanges(self):
+        """
+        Saving and deleting chargers keeps the links up to date.
+        """
+        self.assertEqual(linkSet(), self.expectedLinks())
+
+        LocationCharger.objects.filter(id=self.chargers["gir"]).delete()
+        del self.chargers["gir"]
+        self.assertEqual(linkSet(), self.expectedLinks())
+
+        charger = LocationCharger.objects.get(id=self.chargers["tgn"])
+        charger.latitud, charger.longitud = 41.60, 2.15
+        charger.save()
+        self.assertIn((self.chargers["bcn"], self.chargers["tgn"]), linkSet())
+
+    def testPaused(self):
+        with chargerLinksPaused():
+            LocationCharger.objects.all().delete()
+        self.assertEqual(len(linkSet()), len(self.expectedLinks()))
+
+    @override_settings(CHARGER_PLANNER_MODE="candidates")
+    def testNotPatchedByOtherPlanners(self):
+        """
+        The links are left alone when the planner does not use them.
+        """
+        links = linkSet()
+        LocationCharger.objects.filter(id=self.chargers["gir"]).delete()
+        charger = LocationCharger.objects.get(id=self.chargers["tgn"])
+        charger.latitud, charger.longitud = 41.60, 2.15
+        charger.save()
+        self.assertEqual(linkSet(), links)
+
+    def testChargersPath(self):
+        """
+        The planner finds the chargers of the path in the stored graph.
+        """
+        route = [(41.12, 1.25), (41.39, 2.17), (41.98, 2.82)]
+        path = computeChargersPath(route, 100, ["MENNEKES"])
+        self.assertEqual(
+            [point["charger"] for point in path], ["origin", self.chargers["bcn"], "destination"]
+        )
+        self.assertEqual((path[1]["latitude"], path[1]["longitude"]), CHARGERS["bcn"][:2])
+
+        with self.assertRaises(NoRouteFound):
+            computeChargersPath(route, 100, ["SCHUKO"])
@@ -0,0 +1,169 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import polyline
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from google.maps.routing_v2 import ComputeRoutesResponse
+
+from api.models import RoadLeg
+from api.service.cache import routeCache
+from api.service.providers import NoRouteFound
+from api.service.route import computeChargersRoute, computeMapsRoutePath, knownLegDistances
+
+ORIGIN = {"charger": "origin", "latitude": 41.3851, "longitude": 2.1734}
+CHARGER = {"charger": 7, "latitude": 41.6, "longitude": 2.3}
+DESTINATION = {"charger": "destination", "latitude": 41.9794, "longitude": 2.8214}
+PATH = [ORIGIN, CHARGER, DESTINATION]
+
+LEGS = [
+    {
+        "polyline": polyline.encode([(41.3851, 2.1734), (41.5, 2.2), (41.6, 2.3)]),
+        "duration": 1500,
+        "distance": 30000,
+    },
+    {
+        "polyline": polyline.encode([(41.6, 2.3), (41.9794, 2.8214)]),
+        "duration": 2700,
+        "distance": 62000,
+    },
+]
+
+
+def mapsResponse():
+    return ComputeRoutesResponse(
+        {
+            "routes": [
+                {
+                    "distance_meters": 92000,
+                    "duration": {"seconds": 4200},
+                    "polyline": {
+                        "encoded_polyline": polyline.encode(
+                            [(41.3851, 2.1734), (41.5, 2.2), (41.6, 2.3), (41.9794, 2.8214)]
+                        )
+                    },
+                    "legs": [
+                        {
+                            "distance_meters": leg["distance"],
+                            "duration": {"seconds": leg["duration"]},
+                            "polyline": {"encoded_polyline": leg["polyline"]},
+                        }
+                        for leg in LEGS
+                    ],
+                }
+            ]
+        }
+    )
+
+
+@override_settings(ROUTE_PROVIDER="google", ROUTE_LEG_CELL_PRECISION=7)
+class RoadLegTestCase(TestCase):
+    """
+    Test case for the road legs recorded from the routing provider.
+    """
+
+    def setUp(self) -> None:
+        cache.clear()
+        routeCache.clear()
+        return super().setUp()
+
+    def testPointKeys(self):
+        """
+        Chargers are keyed by id and the rest of points by their cell.
+        """
+        self.assertEqual(RoadLeg.pointKey(CHARGER), "charger:7")
+        self.assertEqual(RoadLeg.pointKey(ORIGIN), "cell:sp3e3my")
+        self.assertEqual(
+            RoadLeg.pointKey({**ORIGIN, "latitude": 41.3852}), RoadLeg.pointKey(ORIGIN)
+        )
+
+    def testRecordedFromProvider(self):
+        """
+        The legs of the provider response are stored and not returned with the route.
+        """
+        with patch("api.service.providers.getGoogleMapsRouteClient") as mockGetClient:
+            mockClient = mockGetClient.return_value
+            mockClient.compute_routes.return_value = mapsResponse()
+            routeData = computeMapsRoutePath(PATH)
+
+        self.assertNotIn("legs", routeData)
+        self.assertEqual(
+            set(RoadLeg.objects.values_list("origin", "destination", "distance")),
+            {("cell:sp3e3my", "charger:7", 30000), ("charger:7", "cell:sp6nb4n", 62000)},
+        )
+
+    def testRecordReplacesLegs(self):
+        RoadLeg.record(PATH, LEGS)
+        RoadLeg.record(PATH[:2], [{**LEGS[0], "distance": 31000}])
+        self.assertEqual(RoadLeg.objects.count(), 2)
+        self.assertEqual(RoadLeg.objects.get(origin="cell:sp3e3my").distance, 31000)
+
+    def testKnownDistances(self):
+        """
+        The planner gets the road distance of the known legs by the labels of their points.
+        """
+        RoadLeg.record(PATH, LEGS)
+        points = {
+            "origin": (ORIGIN["latitude"], ORIGIN["longitude"]),
+            7: (CHARGER["latitude"], CHARGER["longitude"]),
+            8: (41.7, 2.5),
+            "destination": (DESTINATION["latitude"], DESTINATION["longitude"]),
+        }
+        self.assertEqual(knownLegDistances(points), {("origin", 7): 30.0, (7, "destination"): 62.0})
+
+    def testRoadLongerThanAutonomy(self):
+        """
+        The planner does not take a leg whose road is longer than the autonomy.
+        """
+        points = {
+            "origin": (ORIGIN["latitude"], ORIGIN["longitude"]),
+            7: (CHARGER["latitude"], CHARGER["longitude"]),
+            8: (41.7, 2.5),
+            "destination": (DESTINATION["latitude"], DESTINATION["longitude"]),
+        }
+        path = [point["charger"] for point in computeChargersRoute(points, 70)]
+        self.assertEqual(path, ["origin", 8, "destination"])
+
+        charger = {"charger": 8, "latitude": 41.7, "longitude": 2.5}
+        RoadLeg.record([ORIGIN, charger], [{**LEGS[0], "distance": 75000}])
+        with self.assertRaises(NoRouteFound):
+            computeChargersRoute(points, 70)
+
+    def testStaleLegs(self):
+        """
+        Legs older than ROUTE_LEG_MAX_AGE days are not used.
+        """
+        RoadLeg.record(PATH, LEGS)
+        RoadLeg.objects.update(updatedAt=timezone.now() - timedelta(days=31))
+        with self.settings(ROUTE_LEG_MAX_AGE=30):
+            self.assertEqual(RoadLeg.knownDistances(["cell:sp3e3my", "charger:7"]), {})
+            self.assertIsNone(RoadLeg.assemble(PATH))
+
+    def testAssemble(self):
+        """
+        A path whose legs are known is joined from them.
+        """
+        RoadLeg.record(PATH, LEGS)
+        routeData = RoadLeg.assemble(PATH)
+        self.assertEqual(routeData["distance"], 92000)
+        self.assertEqual(routeData["duration"], 4200)
+        self.assertEqual(
+            polyline.decode(routeData["polyline"]),
+            [(41.3851, 2.1734), (41.5, 2.2), (41.6, 2.3), (41.9794, 2.8214)],
+        )
+        self.assertIsNone(RoadLeg.assemble([ORIGIN, {**CHARGER, "charger": 8}, DESTINATION]))
+
+    @override_settings(ROUTE_LEG_REUSE=True)
+    def testReusedWithoutProvider(self):
+        """
+        With ROUTE_LEG_REUSE a trip through known legs does not call the provider.
+        """
+        RoadLeg.record(PATH, LEGS)
+        nearby = [{**ORIGIN, "latitude": 41.3852}, CHARGER, DESTINATION]
+        with patch("api.service.providers.getGoogleMapsRouteClient") as mockGetClient:
+            mockClient = mockGetClient.return_value
+            routeData = computeMapsRoutePath(nearby)
+
+        mockClient.compute_routes.assert_not_called()
+        self.assertEqual(routeData["distance"], 92000)
@@ -0,0 +1,87 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.service.dijkstra import buildDistanceGraph, dijkstra
+from api.service.shortestpath import SparseGraph, sparseShortestPath
+
+from .test_dijkstra import POINTS
+
+
+def pathLength(graph: dict, path: list) -> float:
+    return sum(graph[a][b] for a, b in zip(path, path[1:]))
+
+
+class SparseShortestPathTestCase(SimpleTestCase):
+    """
+    Test case for the CSR shortest path engine.
+    """
+
+    def testPrunedEdges(self):
+        """
+        Only the edges within the maximum distance are in the graph.
+        """
+        graph = SparseGraph(list(POINTS.values()), 50)
+        self.assertEqual(graph.indptr.tolist(), [0, 1, 3, 5, 5, 6])
+        self.assertTrue((graph.weights <= 50).all())
+
+    def testSamePathAsDijkstra(self):
+        """
+        A* and Dijkstra find paths as short as the dict based dijkstra.
+        """
+        rng = np.random.default_rng(0)
+        coords = np.array((40.4, -3.7)) + rng.random((300, 1)) * np.array((1.0, 5.9))
+        coords += rng.normal(0, 0.1, coords.shape)
+        points = {
+            "origin": (40.4, -3.7),
+            **dict(enumerate(map(tuple, coords))),
+            "destination": (41.4, 2.2),
+        }
+
+        graph = buildDistanceGraph(points, 60)
+        expected = pathLength(graph, dijkstra(graph, "origin", "destination", 60))
+        for heuristic in (True, False):
+            path = sparseShortestPath(points, "origin", "destination", 60, heuristic)
+            self.assertEqual(path[0], "origin")
+            self.assertEqual(path[-1], "destination")
+            self.assertAlmostEqual(pathLength(graph, path), expected, places=6)
+
+    def testUnreachable(self):
+        """
+        An unreachable destination gives an empty path.
+        """
+        self.assertEqual(sparseShortestPath(POINTS, "origin", 3, 50), [])
+        self.assertEqual(sparseShortestPath(POINTS, "origin", "destination", 40), [])
+
+    def testRoadDistances(self):
+        """
+        Known road distances replace the great circle length of their legs.
+        """
+        points = {
+            "origin": (41.0, 2.0),
+            "a": (41.3, 2.0),
+            "b": (41.3, 2.1),
+            "destination": (41.6, 2.0),
+        }
+        self.assertEqual(sparseShortestPath(points, "origin", "destination", 40)[1], "a")
+
+        path = sparseShortestPath(
+            points, "origin", "destination", 40, legDistances={("origin", "a"): 39.0}
+        )
+        self.assertEqual(path, ["origin", "b", "destination"])
+
+    def testRoadLongerThanAutonomy(self):
+        """
+        Legs whose road is longer than the autonomy are not driven, even if the great circle
+        between their ends is within it.
+        """
+        points = {"origin": (41.0, 2.0), "a": (41.5, 2.0), "destination": (42.0, 2.0)}
+        self.assertEqual(sparseShortestPath(points, "origin", "destination", 80)[1], "a")
+
+        roads = {("origin", "a"): 140.0, ("a", "destination"): 150.0}
+        self.assertEqual(
+            sparseShortestPath(points, "origin", "destination", 80, legDistances=roads), []
+        )
+        roads = {("origin", "a"): 79.0, ("a", "destination"): 150.0}
+        self.assertEqual(
+            sparseShortestPath(points, "origin", "destination", 80, legDistances=roads), []
+        )
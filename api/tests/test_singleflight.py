@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from api.service.providers import NoRouteFound
+from api.service.route import computeOptimizedRoute, planFits, planningKey
+from api.service.singleflight import SingleFlight
+
+ENDPOINTS = [
+    {"charger": "origin", "latitude": 41.3851, "longitude": 2.1734},
+    {"charger": "destination", "latitude": 41.9794, "longitude": 2.8214},
+]
+# about 41 km from the origin and 44 km from the destination
+CHARGER = {"charger": 1, "latitude": 41.7, "longitude": 2.5}
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    """
+    Test case for the coalescing of identical computations.
+    """
+
+    def setUp(self) -> None:
+        self.flight = SingleFlight()
+        self.calls = 0
+        return super().setUp()
+
+    def compute(self, value):
+        self.calls += 1
+        time.sleep(0.1)
+        return value
+
+    def testConcurrentCallsAreCoalesced(self):
+        """
+        Threads asking for the same key while it is in flight share the result.
+        """
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.flight.do("key", self.compute, 1)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.coalesced, 4)
+
+    def testSequentialCallsAreNotCached(self):
+        self.flight.do("key", self.compute, 1)
+        self.flight.do("key", self.compute, 2)
+        self.assertEqual(self.calls, 2)
+
+    def testExceptionIsShared(self):
+        """
+        The waiters get the exception raised by the leader.
+        """
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError()
+
+        errors = []
+
+        def call():
+            try:
+                self.flight.do("key", fail)
+            except ValueError as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.flight.calls, {})
+
+    def testAsyncCallsAreCoalesced(self):
+        async def acompute(value):
+            self.calls += 1
+            await asyncio.sleep(0.1)
+            return value
+
+        async def run():
+            return await asyncio.gather(
+                self.flight.ado("key", acompute, 1),
+                self.flight.ado("key", acompute, 1),
+                self.flight.ado("other", acompute, 2),
+            )
+
+        self.assertEqual(async_to_sync(run)(), [1, 1, 2])
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.flight.tasks, {})
+
+
+class PlanCoalescingTestCase(SimpleTestCase):
+    """
+    Test case for the route plans shared by drivers with similar autonomies.
+    """
+
+    def setUp(self) -> None:
+        self.serializer = SimpleNamespace(
+            validated_data={
+                "originLat": ENDPOINTS[0]["latitude"],
+                "originLon": ENDPOINTS[0]["longitude"],
+                "destinationLat": ENDPOINTS[1]["latitude"],
+                "destinationLon": ENDPOINTS[1]["longitude"],
+            }
+        )
+        self.planned = []
+        return super().setUp()
+
+    def plan(self, endpoints, autonomy, chargerTypes):
+        # the trip is about 85 km long
+        self.planned.append(autonomy)
+        time.sleep(0.1)
+        if autonomy < 45:
+            raise NoRouteFound()
+        return {"distance": autonomy}, [] if autonomy >= 86 else [CHARGER]
+
+    def computeAll(self, autonomies: list[int]) -> list:
+        results = [None] * len(autonomies)
+
+        def compute(i):
+            try:
+                results[i] = computeOptimizedRoute(self.serializer, i)
+            except NoRouteFound as exc:
+                results[i] = exc
+
+        with patch("api.service.route.planOptimizedRoute", self.plan), patch(
+            "api.service.route.getDriverPlanningProfile",
+            side_effect=lambda driverId: (autonomies[driverId], []),
+        ):
+            threads = [threading.Thread(target=compute, args=(i,)) for i in range(len(autonomies))]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.02)
+            for thread in threads:
+                thread.join()
+        return results
+
+    def testBucketKey(self):
+        self.assertEqual(planningKey(ENDPOINTS, 104, []), planningKey(ENDPOINTS, 100, []))
+        self.assertNotEqual(planningKey(ENDPOINTS, 104, []), planningKey(ENDPOINTS, 99, []))
+
+    def testPlanFits(self):
+        self.assertTrue(planFits(ENDPOINTS, [CHARGER], 50))
+        self.assertFalse(planFits(ENDPOINTS, [CHARGER], 40))
+        # the destination is within the autonomy, the charger is not needed
+        self.assertFalse(planFits(ENDPOINTS, [CHARGER], 90))
+        self.assertTrue(planFits(ENDPOINTS, [], 90))
+        self.assertFalse(planFits(ENDPOINTS, [], 80))
+
+    def testPlannedWithExactAutonomy(self):
+        """
+        Drivers of the same bucket share the plan only when it is the one their autonomy gets.
+        """
+        results = self.computeAll([85, 89, 86])
+        # 89 and 86 need no charger, they can not use the plan of 85
+        self.assertEqual(sorted(self.planned), [85, 86, 89])
+        self.assertEqual([result[1] for result in results], [[CHARGER], [], []])
+
+    def testNoRouteFoundOfLessAutonomy(self):
+        """
+        Drivers with more autonomy than the one that found no route plan their own route.
+        """
+        results = self.computeAll([44, 40, 41])
+        self.assertEqual(self.planned, [44])
+        self.assertTrue(all(isinstance(result, NoRouteFound) for result in results))
+
+        self.planned.clear()
+        results = self.computeAll([44, 47])
+        self.assertEqual(self.planned, [44, 47])
+        self.assertIsInstance(results[0], NoRouteFound)
+        self.assertEqual(results[1][1], [CHARGER])
@@ -0,0 +1,120 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+
+import api
+from api.benchmarks.planner import syntheticPoints
+from api.models import PlannerVariant
+from api.service.providers import NoRouteFound
+from api.service.route import (
+    computeChargersRoute,
+    getVariantExecutor,
+    speculativeChargersRoute,
+)
+from api.service.speculative import PLANNER_VARIANTS, planVariant
+
+
+@override_settings(CHARGER_SPECULATIVE_PROCESSES=2, CHARGER_SPECULATIVE_DEADLINE=30)
+class SpeculativePlanningTestCase(TestCase):
+    """
+    Test case for the planning with the kPowerFinder parameter variants in parallel.
+    """
+
+    def setUp(self) -> None:
+        # the default parameters find no route for this trip, lowDeviation does
+        self.points = syntheticPoints(100, 0)
+        self.autonomy = 40
+        return super().setUp()
+
+    def testVariants(self):
+        variant, path, length = planVariant("default", self.points, self.autonomy)
+        self.assertEqual((variant, path, length), ("default", [], float("inf")))
+
+        variant, path, length = planVariant("lowDeviation", self.points, self.autonomy)
+        self.assertEqual((path[0], path[-1]), ("origin", "destination"))
+        self.assertLess(length, float("inf"))
+
+    def testRouteOfAnotherVariant(self):
+        """
+        A route is found when the default parameters find none, and the variant is recorded.
+        """
+        with self.assertRaises(NoRouteFound):
+            computeChargersRoute(self.points, self.autonomy)
+
+        path = speculativeChargersRoute(self.points, self.autonomy)
+        _, expected, _ = planVariant("lowDeviation", self.points, self.autonomy)
+        self.assertEqual([point["charger"] for point in path], expected)
+        self.assertEqual(
+            (path[1]["latitude"], path[1]["longitude"]), self.points[path[1]["charger"]]
+        )
+
+        variant = PlannerVariant.objects.get(name="lowDeviation")
+        self.assertEqual((variant.plans, variant.wins), (1, 1))
+        self.assertFalse(PlannerVariant.objects.filter(name="default").exists())
+
+    def testShortestRoute(self):
+        """
+        The shortest route of the variants is used, all of them that found one are recorded.
+        """
+        points = syntheticPoints(300, 0)
+        lengths = {variant: planVariant(variant, points, 60)[2] for variant in PLANNER_VARIANTS}
+        winner = min(lengths, key=lengths.get)
+
+        speculativeChargersRoute(points, 60)
+        self.assertEqual(
+            set(PlannerVariant.objects.values_list("name", flat=True)),
+            {variant for variant, length in lengths.items() if length < float("inf")},
+        )
+        self.assertEqual(PlannerVariant.objects.get(wins=1).name, winner)
+
+    def testUnreachable(self):
+        with self.assertRaises(NoRouteFound):
+            speculativeChargersRoute(self.points, 5)
+        self.assertFalse(PlannerVariant.objects.exists())
+
+    @override_settings(CHARGER_SPECULATIVE_DEADLINE=0)
+    def testDeadline(self):
+        """
+        Without any route by the deadline the default variant is waited for.
+        """
+        points = syntheticPoints(300, 0)
+        _, expected, _ = planVariant("default", points, 60)
+        path = speculativeChargersRoute(points, 60)
+        self.assertEqual([point["charger"] for point in path], expected)
+        self.assertEqual(PlannerVariant.objects.get(wins=1).name, "default")
+
+        with self.assertRaises(NoRouteFound):
+            speculativeChargersRoute(self.points, self.autonomy)
+
+    @override_settings(CHARGER_SPECULATIVE_MAX_PENDING=0)
+    def testBusyPool(self):
+        """
+        While the pool has too many plans pending routes are planned without it.
+        """
+        points = syntheticPoints(300, 0)
+        path = speculativeChargersRoute(points, 60)
+        self.assertEqual(path, computeChargersRoute(points, 60))
+        self.assertFalse(PlannerVariant.objects.exists())
+
+    def testForkserver(self):
+        self.assertEqual(getVariantExecutor()._mp_context.get_start_method(), "forkserver")
+
+    def testWorkerImports(self):
+        """
+        The worker processes plan the variants without Django nor Maps clients.
+        """
+        code = (
+            "import api, sys; from api.service.speculative import planVariant; "
+            "print(api._client, 'django.conf' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(api.__file__).parents[1],
+            env={},
+        ).stdout
+        self.assertEqual(output.split(), ["None", "False"])
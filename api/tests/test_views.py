@@ -1,16 +1,28 @@
 import datetime
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase
+from django.core.cache import caches
 from rest_framework.test import APITestCase
 from rest_framework import status
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
+from api.models import RouteGeometry
+from api.service.cache import PLAN_PREFIX, retrievePlan, routeCache, storePlan
+from api.service.providers import RoutingUnavailable
+from api.service.route import NoRouteFound
 from common.models.route import Route
-from common.models.user import Driver
+from common.models.user import Driver, User
+from routeApi.asgi import application
 
 from .payloads import CREATE_ROUTE_PAYLOAD
 from .payloads import CREATE_ROUTE_PREVIEW_RESPONSE
 from .payloads import CREATE_ROUTE_RESPONSE
 from .payloads import MAPS_COMPUTE_RESPONSE
 from .payloads import CREATE_ROUTE_PREVIEW_PAYLOAD
+from .test_filters import createRoute
+
+PREVIEW_FIELDS = ["originLat", "originLon", "destinationLat", "destinationLon"]
 
 
 class RouteCreateTestCase(APITestCase):
@@ -33,8 +45,8 @@ class RouteCreateTestCase(APITestCase):
         """
         data = CREATE_ROUTE_PAYLOAD
 
-        with patch("api.views.computeMapsRoute") as mock_computeRoute:
-            mock_computeRoute.return_value = MAPS_COMPUTE_RESPONSE
+        with patch("api.views.acomputeOptimizedRoute") as mock_computeRoute:
+            mock_computeRoute.return_value = (MAPS_COMPUTE_RESPONSE, [])
             response = self.client.post("/routes", data, format="json")
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
             self.assertEqual(response.data, CREATE_ROUTE_RESPONSE)
@@ -43,8 +55,8 @@ class RouteCreateTestCase(APITestCase):
         """
         Test case for creating a preview route.
         """
-        with patch("api.views.computeMapsRoute") as mock_computeRoute:
-            mock_computeRoute.return_value = MAPS_COMPUTE_RESPONSE
+        with patch("api.views.acomputeOptimizedRoute") as mock_computeRoute:
+            mock_computeRoute.return_value = (MAPS_COMPUTE_RESPONSE, [])
             response = self.client.post("/routes", CREATE_ROUTE_PREVIEW_PAYLOAD, format="json")
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertEqual(response.data, CREATE_ROUTE_PREVIEW_RESPONSE)
@@ -73,3 +85,323 @@ class RouteCreateTestCase(APITestCase):
         response = self.client.post("/routes", CREATE_ROUTE_PAYLOAD, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data.get("message"), "Route overlaps in time with another route")
+
+
+class RoutePlanTestCase(APITestCase):
+    """
+    Test case for reusing the route preview plan when creating a route.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        return super().setUp()
+
+    def preview(self):
+        with patch("api.views.acomputeOptimizedRoute") as mockCompute:
+            mockCompute.return_value = (CREATE_ROUTE_PREVIEW_RESPONSE, [])
+            response = self.client.post("/routes/preview", CREATE_ROUTE_PAYLOAD, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["planToken"]
+
+    def testCreateRouteWithPlan(self):
+        """
+        Creating a route with the preview plan token does not compute the route again.
+        """
+        planToken = self.preview()
+
+        with patch("api.views.acomputeOptimizedRoute") as mockCompute, patch(
+            "api.views.createChatRoom"
+        ):
+            response = self.client.post(
+                "/routes", {**CREATE_ROUTE_PAYLOAD, "planToken": planToken}, format="json"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mockCompute.assert_not_called()
+        self.assertEqual(response.data["polyline"], CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])
+
+    def testCreateRouteWithMismatchingPlan(self):
+        """
+        A plan computed for other coordinates is ignored.
+        """
+        planToken = self.preview()
+
+        with patch("api.views.acomputeOptimizedRoute") as mockCompute, patch(
+            "api.views.createChatRoom"
+        ):
+            mockCompute.return_value = (CREATE_ROUTE_PREVIEW_RESPONSE, [])
+            response = self.client.post(
+                "/routes",
+                {**CREATE_ROUTE_PAYLOAD, "originLat": 41.0, "planToken": planToken},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        mockCompute.assert_called_once()
+
+    def testPlanUsedOnce(self):
+        """
+        A plan is only returned once, also to requests that read it at the same time.
+        """
+        endpoints = [
+            {
+                "latitude": CREATE_ROUTE_PAYLOAD["originLat"],
+                "longitude": CREATE_ROUTE_PAYLOAD["originLon"],
+            },
+            {
+                "latitude": CREATE_ROUTE_PAYLOAD["destinationLat"],
+                "longitude": CREATE_ROUTE_PAYLOAD["destinationLon"],
+            },
+        ]
+        planToken = storePlan(self.driver.pk, endpoints, CREATE_ROUTE_PREVIEW_RESPONSE, [])
+        backend = caches[routeCache.alias]
+        plan = backend.get(f"{PLAN_PREFIX}:{planToken}")
+
+        self.assertEqual(
+            retrievePlan(planToken, self.driver.pk, endpoints), (CREATE_ROUTE_PREVIEW_RESPONSE, [])
+        )
+        self.assertIsNone(retrievePlan(planToken, self.driver.pk, endpoints))
+        # a request that read the plan before it was deleted
+        with patch.object(backend, "get", return_value=plan):
+            self.assertIsNone(retrievePlan(planToken, self.driver.pk, endpoints))
+
+
+class RouteDegradedPreviewTestCase(APITestCase):
+    """
+    Test case for the route preview when the routing service is not available.
+    """
+
+    def setUp(self) -> None:
+        routeCache.clear()
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        return super().setUp()
+
+    def preview(self):
+        with patch("api.views.acomputeOptimizedRoute") as mockCompute:
+            mockCompute.side_effect = RoutingUnavailable()
+            response = self.client.post("/routes/preview", CREATE_ROUTE_PAYLOAD, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["approximate"])
+        self.assertNotIn("planToken", response.data)
+        return response.data
+
+    def testStraightLineEstimate(self):
+        """
+        Without a cached route the preview is a straight line between the endpoints.
+        """
+        data = self.preview()
+        self.assertEqual(data["waypoints"], [])
+        self.assertGreater(data["distance"], 0)
+        self.assertGreater(data["duration"], 0)
+
+    def testCachedEstimate(self):
+        """
+        The cached route between the endpoints is preferred over the straight line.
+        """
+        routeCache.set(
+            [
+                (CREATE_ROUTE_PAYLOAD["originLat"], CREATE_ROUTE_PAYLOAD["originLon"]),
+                (CREATE_ROUTE_PAYLOAD["destinationLat"], CREATE_ROUTE_PAYLOAD["destinationLon"]),
+            ],
+            CREATE_ROUTE_PREVIEW_RESPONSE,
+        )
+        data = self.preview()
+        self.assertEqual(data["polyline"], CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])
+
+
+class RoutePolylineDetailTestCase(APITestCase):
+    """
+    Test case for the simplified polylines of a route.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        return super().setUp()
+
+    def createRoute(self):
+        with patch("api.views.acomputeOptimizedRoute") as mockCompute, patch(
+            "api.views.createChatRoom"
+        ):
+            mockCompute.return_value = (CREATE_ROUTE_PREVIEW_RESPONSE, [])
+            response = self.client.post("/routes", CREATE_ROUTE_PAYLOAD, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def testCreateStoresLevels(self):
+        """
+        The simplified polylines are stored when the route is created.
+        """
+        routeId = self.createRoute()
+        geometry = RouteGeometry.objects.get(routeId=routeId)
+        self.assertEqual(set(geometry.polylines), {"high", "medium", "low"})
+
+    def testRetrieveDetail(self):
+        """
+        The route is returned with the full polyline by default and the simplified one on demand.
+        """
+        routeId = self.createRoute()
+
+        response = self.client.get(f"/routes/{routeId}")
+        self.assertEqual(response.data["polyline"], CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])
+
+        response = self.client.get(f"/routes/{routeId}?detail=low")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["polyline"], RouteGeometry.objects.get(routeId=routeId).polylines["low"]
+        )
+        self.assertLess(
+            len(response.data["polyline"]), len(CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])
+        )
+
+    def testRetrieveComputesMissingLevels(self):
+        """
+        Routes created without simplified polylines get them computed, without writing them.
+        """
+        routeId = self.createRoute()
+        RouteGeometry.objects.all().delete()
+
+        response = self.client.get(f"/routes/{routeId}?detail=medium")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["polyline"],
+            RouteGeometry.simplify(CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])["medium"],
+        )
+        self.assertFalse(RouteGeometry.objects.exists())
+
+    def testInvalidDetail(self):
+        """
+        Unknown detail levels are rejected.
+        """
+        routeId = self.createRoute()
+        response = self.client.get(f"/routes/{routeId}?detail=ultra")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RouteBatchPreviewTestCase(APITestCase):
+    """
+    Test case for the batch route preview.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        return super().setUp()
+
+    def testBatchPreview(self):
+        """
+        Identical routes are computed once and every route gets its own result or error.
+        """
+        route = {key: CREATE_ROUTE_PAYLOAD[key] for key in PREVIEW_FIELDS}
+        unreachable = {**route, "destinationLat": 10.0}
+        invalid = {**route, "destinationLat": "north"}
+
+        async def compute(serializer, driverId):
+            if serializer.validated_data["destinationLat"] == 10.0:
+                raise NoRouteFound()
+            return CREATE_ROUTE_PREVIEW_RESPONSE, []
+
+        with patch(
+            "api.service.route.acomputeOptimizedRoute", AsyncMock(side_effect=compute)
+        ) as mockCompute:
+            response = self.client.post(
+                "/routes/preview/batch",
+                {"routes": [route, invalid, route, unreachable]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mockCompute.await_count, 2)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [200, 400, 200, 404])
+        self.assertEqual(results[0]["polyline"], CREATE_ROUTE_PREVIEW_RESPONSE["polyline"])
+        self.assertIn("destinationLat", results[1]["error"])
+
+
+class RouteQueriesTestCase(APITestCase):
+    """
+    Test case for the number of queries of the route lists and detail, which must not grow with
+    the routes and passengers.
+    """
+
+    def setUp(self) -> None:
+        self.driver = Driver.objects.create(
+            username="test", birthDate=datetime.date(1998, 10, 6), password="testpaswordvalid"
+        )
+        self.client.force_authenticate(self.driver)
+        passengers = [
+            User.objects.create(
+                username=f"passenger{i}",
+                email=f"passenger{i}@example.com",
+                birthDate=datetime.date(1998, 10, 6),
+            )
+            for i in range(3)
+        ]
+        self.routes = [createRoute(self.driver, (41.40, 2.17), (41.98, 2.80)) for _ in range(5)]
+        for route in self.routes:
+            route.passengers.set(passengers)
+        return super().setUp()
+
+    def testList(self):
+        # routes and their passengers, plus the count of the page number pagination
+        for url, params, queries in [
+            ("/routes", {}, 2),
+            ("/v2/routes", {}, 3),
+            ("/v2/routes", {"pagination": "cursor"}, 2),
+            ("/v2/routes", {"location": "41.3874,2.1686,41.9794,2.8214"}, 3),
+        ]:
+            with self.subTest(url=url, params=params), self.assertNumQueries(queries):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        routes = response.data["results"]
+        self.assertEqual(len(routes), len(self.routes))
+        self.assertEqual(routes[0]["driver"], {"id": self.driver.id, "username": "test"})
+        self.assertEqual(len(routes[0]["passengers"]), 3)
+
+    def testDetail(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/routes/{self.routes[0].id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["driver"]["username"], "test")
+        self.assertEqual(
+            {passenger["email"] for passenger in response.data["passengers"]},
+            {f"passenger{i}@example.com" for i in range(3)},
+        )
+
+
+class StaticFilesTestCase(SimpleTestCase):
+    """
+    Test case for the static files served by the ASGI application.
+    """
+
+    async def get(self, path: str) -> int:
+        communicator = ApplicationCommunicator(
+            application,
+            {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []},
+        )
+        await communicator.send_input({"type": "http.request", "body": b""})
+        response = await communicator.receive_output()
+        await communicator.wait()
+        return response["status"]
+
+    def testStaticFiles(self):
+        """
+        The assets of Swagger and the browsable API are served.
+        """
+        for path in (
+            "/static/rest_framework/css/bootstrap.min.css",
+            "/static/drf-yasg/swagger-ui-dist/swagger-ui.css",
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(async_to_sync(self.get)(path), status.HTTP_200_OK)
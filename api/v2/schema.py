@@ -1,4 +1,4 @@
-from drf_yasg.openapi import IN_QUERY, TYPE_ARRAY, Parameter
+from drf_yasg.openapi import IN_QUERY, TYPE_ARRAY, TYPE_STRING, Parameter
 
 listIncludeFilter = Parameter(
     "include",
@@ -7,3 +7,12 @@ listIncludeFilter = Parameter(
     items=["cancelled", "finalized"],  # this does not work
     type=TYPE_ARRAY,
 )
+
+paginationParameter = Parameter(
+    "pagination",
+    IN_QUERY,
+    description="'cursor' to paginate with the 'next' cursor links (ordered by departure time, or "
+    "by distance with the location filter) instead of page numbers, pages have no total count",
+    enum=["page", "cursor"],
+    type=TYPE_STRING,
+)
@@ -1,6 +1,11 @@
 from api.serializers import ListRouteSerializer
 from api.service.route_controller import RouteController
-from api.service.route_filters import BasePaginator, BaseRouteFilter
+from api.service.route_filters import (
+    BasePaginator,
+    BaseRouteFilter,
+    SelectablePaginationMixin,
+    statusFilter,
+)
 
 from drf_yasg.utils import swagger_auto_schema
 
@@ -10,7 +15,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.filters import OrderingFilter
 
-from .schema import listIncludeFilter
+from .schema import listIncludeFilter, paginationParameter
 
 routeController = RouteController()  # alias
 
@@ -32,7 +37,7 @@ class BaseRouteAPIView(APIView):
     # renderer classes set by default in settings
 
 
-class ListRoutes(BaseRouteAPIView, ListAPIView):
+class ListRoutes(SelectablePaginationMixin, BaseRouteAPIView, ListAPIView):
     """
     Retrieves a list of routes. Available filters:
     - originLat: Origin point latitude
@@ -44,6 +49,8 @@ class ListRoutes(BaseRouteAPIView, ListAPIView):
     - seats: Minimum number (inclusive) of free seats
     - user: The Id of a user that belongs to a routes either as driver or passenger
         - /v2/routes?user=<userId>
+    Pages are numbered unless the request asks for cursor pagination:
+        - /v2/routes?pagination=cursor
     """
 
     serializer_class = ListRouteSerializer
@@ -51,17 +58,12 @@ class ListRoutes(BaseRouteAPIView, ListAPIView):
 
     def get_queryset(self):
         # the query set is retrieved from the "domain"
-        # we get all the active routes and chain querysets
-        # depending on the url query param 'include'
-        qset = routeManager.active()
-        for value in self.request.GET.getlist("include", []):
-            if value == "cancelled":
-                qset = qset | routeManager.cancelled()
-            if value == "finalized":
-                qset = qset | routeManager.finalized()
-        return qset
+        # we get all the active routes plus the cancelled and finalized ones
+        # depending on the url query param 'include', in a single condition
+        qset = routeManager.filter(statusFilter(self.request.GET.getlist("include", [])))
+        return ListRouteSerializer.withRelated(qset)
 
-    @swagger_auto_schema(manual_parameters=[listIncludeFilter])
+    @swagger_auto_schema(manual_parameters=[listIncludeFilter, paginationParameter])
     def get(self, request, *args, **kwargs):
         # Filtering and pagination happen at 'view level' (whatever that means)
         return super().get(request, *args, **kwargs)
@@ -2,12 +2,15 @@
 This module contains the views for the API endpoints related to routes.
 """
 
+import asyncio
+import logging
 from datetime import datetime, timedelta
-from math import atan2, cos, radians, sin, sqrt
+from inspect import iscoroutinefunction
 from typing import Union
 
 import requests
 from api.serializers import (
+    BatchPreviewRouteSerializer,
     RouteSerializer,
     CreateRouteSerializer,
     DetaliedRouteSerializer,
@@ -17,7 +20,11 @@ from api.serializers import (
     PaymentMethodSerializer,
     PreviewRouteSerializer,
     UserSerializer,
+    polylineDetail,
 )
+from api.models import RouteGeometry
+from api.service.cache import retrievePlan, storePlan
+from api.service.chargers import getChargerIndex
 from api.service.licitacio import serializeLicitacio
 from api.service.notify import Notification, notifyDriver, notifyPassengers
 from common.models.achievement import *
@@ -28,12 +35,13 @@ from common.models.payment import *
 from common.models.route import *
 from common.models.user import *
 from common.models.valuation import *
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.generics import (
     CreateAPIView,
     GenericAPIView,
@@ -54,9 +62,13 @@ from rest_framework.status import (
 )
 from rest_framework.views import APIView
 
+from .service.providers import RoutingUnavailable
+from .service.route_filters import SelectablePaginationMixin
 from .service.route import (
-    computeMapsRoute,
-    computeOptimizedRoute,
+    acomputeOptimizedRoute,
+    acomputeOptimizedRoutes,
+    aestimateRoute,
+    buildRouteEndpoints,
     createChatRoom,
     forcedLeaveRoute,
     joinRoute,
@@ -65,6 +77,43 @@ from .service.route import (
 )
 
 
+class AsyncAPIViewMixin:
+    """
+    Serves the view as a coroutine so the requests to Google Maps do not hold a worker while they
+    are in flight when running under ASGI (routeApi/asgi.py).
+    DRF does not support async handlers, so authentication, permissions, throttling and any sync
+    handler of the view run in a thread.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
 class RouteRetrieveView(RetrieveAPIView):
     """
     Returns a detalied view of a route
@@ -75,13 +124,18 @@ class RouteRetrieveView(RetrieveAPIView):
     authentication_classes = [TokenAuthentication]
     # permission_classes = [IsAuthenticated]
 
-    queryset = Route.objects.all()
+    queryset = DetaliedRouteSerializer.withRelated(Route.objects.all())
     serializer_class = DetaliedRouteSerializer
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "detail": polylineDetail(self.request)}
+
 
-class RoutePreviewView(CreateAPIView):
+class RoutePreviewView(AsyncAPIViewMixin, CreateAPIView):
     """
-    Returns a preview of a route.
+    Returns a preview of a route. If the routing service is unavailable or the route takes longer
+    than ROUTE_PREVIEW_DEADLINE to compute, an estimate without chargers flagged as approximate
+    is returned instead.
     URI:
     - POST /routes/preview
     """
@@ -101,7 +155,7 @@ class RoutePreviewView(CreateAPIView):
             404: openapi.Response("Driver not found"),
         }
     )
-    def post(self, request: Request, *args, **kargs):
+    async def post(self, request: Request, *args, **kargs):
         serializer = self.get_serializer(
             data={"driver": request.user.id, **request.data}  # type: ignore
         )
@@ -109,17 +163,86 @@ class RoutePreviewView(CreateAPIView):
         if not serializer.is_valid(raise_exception=True):
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        # Compute the route and return it
-        routeData, waypoints = computeOptimizedRoute(serializer, request.user.id)
+        endpoints = buildRouteEndpoints(serializer)
+        try:
+            routeData, waypoints = await asyncio.wait_for(
+                acomputeOptimizedRoute(serializer, request.user.id),
+                timeout=settings.ROUTE_PREVIEW_DEADLINE,
+            )
+        except (RoutingUnavailable, asyncio.TimeoutError) as exc:
+            # Degraded mode, the approximate route has no plan to be reused on creation
+            logging.warning("Route preview degraded to an estimate: %r", exc)
+            routeData = await aestimateRoute(endpoints)
+            return Response({**routeData, "waypoints": [], "approximate": True}, status=HTTP_200_OK)
+
+        # Keep the computed route so the creation of the route can reuse it
+        planToken = await sync_to_async(storePlan)(request.user.id, endpoints, routeData, waypoints)
+
+        return Response(
+            {**routeData, "waypoints": waypoints, "planToken": planToken, "approximate": False},
+            status=HTTP_200_OK,
+        )
+
+
+class RouteBatchPreviewView(AsyncAPIViewMixin, CreateAPIView):
+    """
+    Returns the preview of several routes computed concurrently, identical routes are computed
+    once. Each route gets its own result or error, in the same order they were sent.
+    URI:
+    - POST /routes/preview/batch
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = BatchPreviewRouteSerializer
 
-        return Response({**routeData, "waypoints": waypoints}, status=HTTP_200_OK)
+    @swagger_auto_schema(
+        responses={
+            200: openapi.Response("Route previews or the error of each route"),
+            400: openapi.Response("Bad request"),
+        }
+    )
+    async def post(self, request: Request, *args, **kargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        routes = serializer.validated_data["routes"]
+        results: list[dict | None] = [None] * len(routes)
+        valid: list[tuple[int, PreviewRouteSerializer]] = []
+        for i, route in enumerate(routes):
+            routeSerializer = PreviewRouteSerializer(data={"driver": request.user.id, **route})
+            if routeSerializer.is_valid():
+                valid.append((i, routeSerializer))
+            else:
+                results[i] = {"status": HTTP_400_BAD_REQUEST, "error": routeSerializer.errors}
+
+        computed = await acomputeOptimizedRoutes([s for _, s in valid], request.user.id)
+        for (i, routeSerializer), result in zip(valid, computed):
+            results[i] = await self.previewResult(routeSerializer, result)
+
+        return Response({"results": results}, status=HTTP_200_OK)
+
+    async def previewResult(self, serializer: PreviewRouteSerializer, result):
+        if isinstance(result, APIException):
+            return {"status": result.status_code, "error": result.detail}
+        if isinstance(result, Exception):
+            logging.error("Route preview failed", exc_info=result)
+            return {"status": 500, "error": "The route could not be computed"}
+
+        routeData, waypoints = result
+        endpoints = buildRouteEndpoints(serializer)
+        planToken = await sync_to_async(storePlan)(
+            self.request.user.id, endpoints, routeData, waypoints
+        )
+        return {"status": HTTP_200_OK, **routeData, "waypoints": waypoints, "planToken": planToken}
 
 
-class RouteListCreateView(ListCreateAPIView):
+class RouteListCreateView(AsyncAPIViewMixin, SelectablePaginationMixin, ListCreateAPIView):
     """
     List and create routes.
     When creating a route, if the preview parameter is set to true, the route will not be saved in the
     database.
+    The list is not paginated unless the request asks for cursor pagination (?pagination=cursor).
     URIs:
     - GET  /routes
     - POST /routes
@@ -129,7 +252,7 @@ class RouteListCreateView(ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Route.objects.filter(cancelled=False)
+        return ListRouteSerializer.withRelated(Route.objects.filter(cancelled=False))
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -144,9 +267,9 @@ class RouteListCreateView(ListCreateAPIView):
             201: openapi.Response("Route created", DetaliedRouteSerializer),
         }
     )
-    def post(self, request: Request, *args, **kargs):
-        # TODO search for a cached route to not duplicate the route request to maps api
-        driver = get_object_or_404(Driver, pk=request.user.id)
+    async def post(self, request: Request, *args, **kargs):
+        detail = polylineDetail(request)
+        driver = await sync_to_async(get_object_or_404)(Driver, pk=request.user.id)
 
         serializer: CreateRouteSerializer = self.get_serializer(
             data={**request.data, "driver": request.user.id}  # type: ignore
@@ -154,9 +277,27 @@ class RouteListCreateView(ListCreateAPIView):
         if not serializer.is_valid():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        # Transform the recieved data into a format that the Google Maps API can understand and send the request
-        routeData, waypoints = computeOptimizedRoute(serializer, driver.pk)
+        # Reuse the plan computed by the preview if the client sends it back, otherwise transform
+        # the recieved data into a format that the Google Maps API can understand and send the request
+        planToken = serializer.validated_data.pop("planToken", None)
+        endpoints = buildRouteEndpoints(serializer)
+        plan = None
+        if planToken:
+            plan = await sync_to_async(retrievePlan)(planToken, driver.pk, endpoints)
+        routeData, waypoints = plan if plan else await acomputeOptimizedRoute(serializer, driver.pk)
+
+        data = await sync_to_async(self.createRoute)(
+            serializer, driver, routeData, waypoints, detail
+        )
+        return Response(data, status=HTTP_201_CREATED)
 
+    def createRoute(
+        self, serializer: CreateRouteSerializer, driver: Driver, routeData, waypoints, detail: str
+    ):
+        """
+        Saves the computed route with its simplified polylines and creates its chat room, returns
+        the serialized route with the polyline of the requested detail.
+        """
         # Create the route in the database by validating first the route data
         instance: Route = serializer.save(
             driver=driver,
@@ -165,8 +306,11 @@ class RouteListCreateView(ListCreateAPIView):
         )
         # HACK por alguna putisima razon el tipo de duration es datetime.timedelta?? una puta Djangada mas y me mato
         instance.duration = int(routeData["duration"])
+        RouteGeometry.objects.create(
+            routeId=instance.pk, polylines=RouteGeometry.simplify(instance.polyline)
+        )
         createChatRoom(instance.pk, driver.pk, instance.destinationAlias)
-        return Response(RouteSerializer(instance).data, status=HTTP_201_CREATED)
+        return RouteSerializer(instance, context={"detail": detail}).data
 
 
 class RouteValidateJoinView(CreateAPIView):
@@ -276,9 +420,7 @@ class RouteCancelView(CreateAPIView):
 class NearbyChargersView(ListAPIView):
     """
     Get the chargers around a latitude and longitude point with a radius
-    Formula used to compute the distance between two points: Haversine formula
-    For more computing precision:
-        See GDAL library, django.contrib.gis.geos, django.contrib.gis.db.models.functions
+    Distances are computed with the haversine formula by the in-memory charger index
     URI:
     - GET /chargers?latitud=&longitud=&radio_km=
     """
@@ -314,26 +456,14 @@ class NearbyChargersView(ListAPIView):
         longitud = float(params.get("longitud"))  # type: ignore
         radio = float(params.get("radio_km"))  # type: ignore
 
-        queryset = LocationCharger.objects.all()
-        cargadores_cercanos = []
-
-        for cargador in queryset:
-            # TODO can we get this out of the controller?
-            # Apply the haversine formula to calculate the distance between two points
-            lat1, lon1, lat2, lon2 = map(
-                radians, [latitud, longitud, cargador.latitud, cargador.longitud]
-            )
-            dlon = lon2 - lon1
-            dlat = lat2 - lat1
-            a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            distancia = 6371 * c  # Radio of the Earth in km
-
-            # If the charger is within the radius, add it to the list
-            if distancia <= radio:
-                cargadores_cercanos.append(cargador)
-
-        return cargadores_cercanos
+        # The charger index computes the haversine distances, the database only loads the chargers
+        index = getChargerIndex()
+        rows, _ = index.withinRadius((latitud, longitud), radio)
+        return (
+            LocationCharger.objects.filter(id__in=index.ids[rows].tolist())
+            .prefetch_related("connectionType", "velocities")
+            .order_by("id")
+        )
 
 
 class RoutePassengersList(RetrieveAPIView):
@@ -383,7 +513,7 @@ class FinishRoute(APIView):
         if route.driver == driver:
             route.finalized = True
             route.save()
-            serializer = DetaliedRouteSerializer(route)
+            serializer = DetaliedRouteSerializer(route, context={"detail": polylineDetail(request)})
             return Response(serializer.data, status=HTTP_200_OK)
         else:
             return Response(
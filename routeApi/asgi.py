@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "routeApi.settings")
 
-application = get_asgi_application()
+# uvicorn does not serve the static files of the admin, Swagger and the browsable API as
+# runserver does, they are served from the installed apps under STATIC_URL
+application = ASGIStaticFilesHandler(get_asgi_application())
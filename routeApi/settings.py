@@ -111,6 +111,105 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# Routing backend: "google" (Google Maps Routes API) or "local" (road graph in ROUTE_GRAPH_PATH)
+ROUTE_PROVIDER = os.environ.get("ROUTE_PROVIDER", "google")
+ROUTE_GRAPH_PATH = os.environ.get("ROUTE_GRAPH_PATH", BASE_DIR / "db/roadgraph.npz")
+# Deadline in seconds of every Maps call (retries included), the circuit opens after
+# ROUTE_BREAKER_THRESHOLD consecutive failures and tries again after ROUTE_BREAKER_RESET seconds
+ROUTE_PROVIDER_TIMEOUT = float(os.environ.get("ROUTE_PROVIDER_TIMEOUT", 5))
+ROUTE_BREAKER_THRESHOLD = int(os.environ.get("ROUTE_BREAKER_THRESHOLD", 5))
+ROUTE_BREAKER_RESET = float(os.environ.get("ROUTE_BREAKER_RESET", 30))
+# A route preview that takes longer than ROUTE_PREVIEW_DEADLINE seconds or can't reach the
+# routing provider returns an approximate route, straight lines are estimated with
+# ROUTE_DETOUR_FACTOR times their length at ROUTE_ESTIMATE_SPEED km/h
+ROUTE_PREVIEW_DEADLINE = float(os.environ.get("ROUTE_PREVIEW_DEADLINE", 15))
+ROUTE_DETOUR_FACTOR = float(os.environ.get("ROUTE_DETOUR_FACTOR", 1.3))
+ROUTE_ESTIMATE_SPEED = float(os.environ.get("ROUTE_ESTIMATE_SPEED", 80))
+
+# Concurrency of the route planning: threads for the chargers selection of the async views and
+# routes computed at the same time by a batch preview request
+ROUTE_PLANNER_WORKERS = int(os.environ.get("ROUTE_PLANNER_WORKERS", 8))
+ROUTE_BATCH_CONCURRENCY = int(os.environ.get("ROUTE_BATCH_CONCURRENCY", 8))
+ROUTE_BATCH_MAX_SIZE = int(os.environ.get("ROUTE_BATCH_MAX_SIZE", 20))
+# Autonomies are rounded down to multiples of this many kilometers to share route plans
+ROUTE_AUTONOMY_BUCKET = int(os.environ.get("ROUTE_AUTONOMY_BUCKET", 5))
+
+# Chargers considered by the route planner: "bbox" (every charger in the bounding box of the
+# route) or "corridor" (chargers at most CHARGER_CORRIDOR_BUFFER_KM away from the route)
+CHARGER_SELECTION_MODE = os.environ.get("CHARGER_SELECTION_MODE", "bbox")
+CHARGER_CORRIDOR_BUFFER_KM = float(os.environ.get("CHARGER_CORRIDOR_BUFFER_KM", 10))
+# Path between the chargers searched with A* (distance to the destination heuristic) or Dijkstra
+CHARGER_PATH_HEURISTIC = os.environ.get("CHARGER_PATH_HEURISTIC", "True") == "True"
+# Seconds between checks of the chargers dataset version by the in-memory charger index
+CHARGER_INDEX_CHECK_INTERVAL = float(os.environ.get("CHARGER_INDEX_CHECK_INTERVAL", 30))
+# Charger pairs at most CHARGER_LINK_MAX_KM apart are stored as the reachability graph of the
+# chargers. The planner searches it with CHARGER_PLANNER_MODE="links" instead of selecting the
+# candidate chargers of every route ("candidates"), drivers with a larger autonomy are planned with
+# the candidates. The graph is only rebuilt by seed and patched on charger changes in "links"
+# mode, run buildchargerlinks before switching to it
+CHARGER_LINK_MAX_KM = float(os.environ.get("CHARGER_LINK_MAX_KM", 250))
+CHARGER_PLANNER_MODE = os.environ.get("CHARGER_PLANNER_MODE", "candidates")
+# Chargers selected for a trip are cached by the geohash cells (CHARGER_PLAN_CELL_PRECISION
+# characters, 6 ~ 1.2 x 0.6 km) of its origin and destination, the autonomy rounded down to
+# CHARGER_PLAN_AUTONOMY_BAND km and the charger types. A cached plan is only used if its first
+# and last legs are within the autonomy from the actual origin and destination
+CHARGER_PLAN_CACHE = os.environ.get("CHARGER_PLAN_CACHE", "True") == "True"
+CHARGER_PLAN_CACHE_TTL = int(os.environ.get("CHARGER_PLAN_CACHE_TTL", 24 * 60 * 60))
+CHARGER_PLAN_CACHE_MAXSIZE = int(os.environ.get("CHARGER_PLAN_CACHE_MAXSIZE", 4096))
+CHARGER_PLAN_CELL_PRECISION = int(os.environ.get("CHARGER_PLAN_CELL_PRECISION", 6))
+CHARGER_PLAN_AUTONOMY_BAND = int(os.environ.get("CHARGER_PLAN_AUTONOMY_BAND", 5))
+# With CHARGER_SPECULATIVE_PLANNING the candidate chargers are searched with every parameter
+# variant of api.service.speculative at once in CHARGER_SPECULATIVE_PROCESSES processes, the
+# shortest plan found in CHARGER_SPECULATIVE_DEADLINE seconds is used ("best") or the first one
+# ("first"), without any the default variant is waited for. The variants of every plan are counted
+# in PlannerVariant. The processes are replaced after CHARGER_SPECULATIVE_TASKS_PER_PROCESS plans
+# and routes are planned without the pool while it has CHARGER_SPECULATIVE_MAX_PENDING plans pending
+CHARGER_SPECULATIVE_PLANNING = os.environ.get("CHARGER_SPECULATIVE_PLANNING", "False") == "True"
+CHARGER_SPECULATIVE_PROCESSES = int(os.environ.get("CHARGER_SPECULATIVE_PROCESSES", 4))
+CHARGER_SPECULATIVE_DEADLINE = float(os.environ.get("CHARGER_SPECULATIVE_DEADLINE", 2))
+CHARGER_SPECULATIVE_PICK = os.environ.get("CHARGER_SPECULATIVE_PICK", "best")
+CHARGER_SPECULATIVE_TASKS_PER_PROCESS = int(
+    os.environ.get("CHARGER_SPECULATIVE_TASKS_PER_PROCESS", 100)
+)
+CHARGER_SPECULATIVE_MAX_PENDING = int(os.environ.get("CHARGER_SPECULATIVE_MAX_PENDING", 10))
+
+# Tolerance in meters of the simplified polylines returned with ?detail=<level>, detail=full
+# returns the polyline as computed
+ROUTE_POLYLINE_LEVELS = {"high": 10, "medium": 50, "low": 250}
+
+# Computed routes cache, coordinates are rounded to ROUTE_CACHE_PRECISION decimals (4 ~ 11m)
+ROUTE_CACHE_TTL = int(os.environ.get("ROUTE_CACHE_TTL", 7 * 24 * 60 * 60))
+ROUTE_CACHE_MAXSIZE = int(os.environ.get("ROUTE_CACHE_MAXSIZE", 1024))
+ROUTE_CACHE_PRECISION = int(os.environ.get("ROUTE_CACHE_PRECISION", 4))
+# The hit/miss counters of the route and chargers plan caches are logged every
+# CACHE_STATS_INTERVAL lookups of each process, 0 disables them
+CACHE_STATS_INTERVAL = int(os.environ.get("CACHE_STATS_INTERVAL", 1000))
+# Lifetime of the plans returned by the route preview to be reused on creation
+ROUTE_PLAN_TTL = int(os.environ.get("ROUTE_PLAN_TTL", 30 * 60))
+# Road legs recorded from the provider responses, origins and destinations are grouped by their
+# geohash cell of ROUTE_LEG_CELL_PRECISION characters (7 ~ 150m) and legs are used for
+# ROUTE_LEG_MAX_AGE days. With ROUTE_LEG_REUSE paths whose legs are all known are joined from
+# them instead of calling the provider, their ends can be off by up to a cell
+ROUTE_LEG_CELL_PRECISION = int(os.environ.get("ROUTE_LEG_CELL_PRECISION", 7))
+ROUTE_LEG_MAX_AGE = int(os.environ.get("ROUTE_LEG_MAX_AGE", 30))
+ROUTE_LEG_REUSE = os.environ.get("ROUTE_LEG_REUSE", "False") == "True"
+# Origins and destinations of the routes are stored as their geohash cell of ROUTE_CELL_PRECISION
+# characters (4 ~ 39 x 20 km), `manage.py backfillroutecells` must run after changing it. With
+# ROUTE_CELL_SEARCH the location filter looks the routes up by the cells around the points
+ROUTE_CELL_PRECISION = int(os.environ.get("ROUTE_CELL_PRECISION", 4))
+ROUTE_CELL_SEARCH = os.environ.get("ROUTE_CELL_SEARCH", "False") == "True"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -161,4 +260,4 @@ AUTHENTICATION_BACKENDS = [
 # OAuth2 credentials
 CLIENT_ID = os.environ.get("CLIENT_ID")
 CLIENT_SECRET = os.environ.get("CLIENT_SECRET")
-REDIRECT_URI = os.environ.get("REDIRECT_URI")
\ No newline at end of file
+REDIRECT_URI = os.environ.get("REDIRECT_URI")
@@ -11,6 +11,7 @@ from api.views import (
     RoutePassengersList,
     RouteJoinView,
     RouteLeaveView,
+    RouteBatchPreviewView,
     RouteListCreateView,
     RoutePassengersList,
     RoutePreviewView,
@@ -23,6 +24,7 @@ from django.urls import path
 urlpatterns = [
     path("routes", RouteListCreateView.as_view(), name="route-list-create"),
     path("routes/preview", RoutePreviewView.as_view(), name="route-list-create"),
+    path("routes/preview/batch", RouteBatchPreviewView.as_view(), name="route-preview-batch"),
     path("routes/<int:pk>", RouteRetrieveView.as_view(), name="route-detail"),
     path(
         "routes/<int:pk>/validate_join", RouteValidateJoinView.as_view(), name="route-validate-join"